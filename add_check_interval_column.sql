@@ -0,0 +1,18 @@
+-- Добавление индивидуального интервала проверки для каждого сайта
+-- Используется планировщиком в режиме CHECK_EXECUTION_MODE=priority, а в режимах sequential и pool -
+-- для порядка проверок (короткий интервал первым) и сброса нагрузки.
+-- После выполнения включите ENABLE_SITE_INTERVALS=True: без флага колонка не выбирается
+-- NULL означает интервал по умолчанию (CHECK_INTERVAL, 5 минут)
+
+ALTER TABLE botmonitor_sites 
+ADD COLUMN check_interval INTEGER;
+
+-- Интервал не может быть меньше 10 секунд
+ALTER TABLE botmonitor_sites 
+ADD CONSTRAINT botmonitor_sites_check_interval_min CHECK (check_interval IS NULL OR check_interval >= 10);
+
+-- Добавляем комментарий к колонке
+COMMENT ON COLUMN botmonitor_sites.check_interval IS 'Интервал проверки доступности в секундах (например, 30 для критичных магазинов, 3600 для лендингов). NULL - интервал по умолчанию';
+
+-- Пример: частая проверка для критичного сайта
+-- UPDATE botmonitor_sites SET check_interval = 30 WHERE url = 'https://shop.example.com';
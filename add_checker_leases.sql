@@ -0,0 +1,82 @@
+-- Аренда шардов для нескольких узлов проверки (ENABLE_SHARD_LEASES=True)
+-- Сайты делятся на LEASE_SHARD_COUNT шардов по хешу id. Узел проверяет только шарды,
+-- которые он арендовал; аренда продлевается каждые LEASE_RENEW_INTERVAL секунд и истекает
+-- через LEASE_TTL секунд, после чего шарды упавшего узла забирают остальные узлы.
+-- Шард -1 - аренда Telegram-поллинга: поллинг ведет только один узел (нет TelegramConflictError).
+-- Время аренды считается по часам БД (now()), а не по часам узлов.
+
+CREATE TABLE IF NOT EXISTS botmonitor_checker_leases (
+    shard INTEGER PRIMARY KEY,
+    node_id TEXT NOT NULL,
+    expires_at TIMESTAMPTZ NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Живые узлы проверки (для равномерного распределения шардов)
+CREATE TABLE IF NOT EXISTS botmonitor_checker_nodes (
+    node_id TEXT PRIMARY KEY,
+    expires_at TIMESTAMPTZ NOT NULL
+);
+
+-- Захват или продление аренды: успешно, если шард свободен, аренда истекла или уже принадлежит узлу
+CREATE OR REPLACE FUNCTION claim_checker_lease(p_shard INTEGER, p_node_id TEXT, p_ttl_seconds INTEGER)
+RETURNS BOOLEAN AS $$
+DECLARE
+    claimed_shard INTEGER;
+BEGIN
+    INSERT INTO botmonitor_checker_leases (shard, node_id, expires_at, updated_at)
+    VALUES (p_shard, p_node_id, now() + make_interval(secs => p_ttl_seconds), now())
+    ON CONFLICT (shard) DO UPDATE
+        SET node_id = EXCLUDED.node_id,
+            expires_at = EXCLUDED.expires_at,
+            updated_at = now()
+        WHERE botmonitor_checker_leases.node_id = EXCLUDED.node_id
+           OR botmonitor_checker_leases.expires_at < now()
+    RETURNING shard INTO claimed_shard;
+    RETURN claimed_shard IS NOT NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Продление нескольких аренд узла одним запросом; возвращает шарды, которые остались за узлом
+CREATE OR REPLACE FUNCTION renew_checker_leases(p_shards INTEGER[], p_node_id TEXT, p_ttl_seconds INTEGER)
+RETURNS TABLE (shard INTEGER) AS $$
+    INSERT INTO botmonitor_checker_leases AS leases (shard, node_id, expires_at, updated_at)
+    SELECT requested.shard, p_node_id, now() + make_interval(secs => p_ttl_seconds), now()
+    FROM unnest(p_shards) AS requested(shard)
+    ON CONFLICT (shard) DO UPDATE
+        SET node_id = EXCLUDED.node_id,
+            expires_at = EXCLUDED.expires_at,
+            updated_at = now()
+        WHERE leases.node_id = EXCLUDED.node_id
+           OR leases.expires_at < now()
+    RETURNING leases.shard;
+$$ LANGUAGE sql;
+
+-- Освобождение аренды (только своей)
+CREATE OR REPLACE FUNCTION release_checker_lease(p_shard INTEGER, p_node_id TEXT)
+RETURNS VOID AS $$
+    DELETE FROM botmonitor_checker_leases WHERE shard = p_shard AND node_id = p_node_id;
+$$ LANGUAGE sql;
+
+-- Сигнал жизни узла
+CREATE OR REPLACE FUNCTION checker_node_heartbeat(p_node_id TEXT, p_ttl_seconds INTEGER)
+RETURNS VOID AS $$
+    INSERT INTO botmonitor_checker_nodes (node_id, expires_at)
+    VALUES (p_node_id, now() + make_interval(secs => p_ttl_seconds))
+    ON CONFLICT (node_id) DO UPDATE SET expires_at = EXCLUDED.expires_at;
+$$ LANGUAGE sql;
+
+-- Количество живых узлов
+CREATE OR REPLACE FUNCTION count_live_checker_nodes()
+RETURNS INTEGER AS $$
+    SELECT count(*)::INTEGER FROM botmonitor_checker_nodes WHERE expires_at >= now();
+$$ LANGUAGE sql;
+
+-- Текущие аренды с признаком истечения
+CREATE OR REPLACE FUNCTION list_checker_leases()
+RETURNS TABLE (shard INTEGER, node_id TEXT, expired BOOLEAN) AS $$
+    SELECT shard, node_id, expires_at < now() FROM botmonitor_checker_leases;
+$$ LANGUAGE sql;
+
+COMMENT ON TABLE botmonitor_checker_leases IS 'Аренда шардов сайтов узлами проверки (шард -1 - Telegram-поллинг)';
+COMMENT ON TABLE botmonitor_checker_nodes IS 'Сигналы жизни узлов проверки';
@@ -0,0 +1,49 @@
+-- Добавление отпечатка содержимого страницы для обнаружения изменений (дефейс, сломанный деплой)
+-- content_fingerprint - включает отслеживание: тело страницы читается целиком (в пределах лимитов тела) и хэшируется
+-- content_strip_rules - регулярные выражения, удаляемые из каждой строки перед хэшированием (динамические фрагменты)
+-- content_hash - отпечаток последней полностью прочитанной страницы
+-- После выполнения включите ENABLE_CONTENT_FINGERPRINT=True: без флага колонки не выбираются и не заполняются
+
+ALTER TABLE botmonitor_sites 
+ADD COLUMN content_fingerprint BOOLEAN DEFAULT FALSE;
+
+ALTER TABLE botmonitor_sites 
+ADD COLUMN content_strip_rules TEXT[];
+
+ALTER TABLE botmonitor_sites 
+ADD COLUMN content_hash TEXT;
+
+-- Добавляем комментарии к колонкам
+COMMENT ON COLUMN botmonitor_sites.content_fingerprint IS 'Отслеживать изменение содержимого страницы по отпечатку тела';
+COMMENT ON COLUMN botmonitor_sites.content_strip_rules IS 'Регулярные выражения динамических фрагментов, удаляемых перед хэшированием';
+COMMENT ON COLUMN botmonitor_sites.content_hash IS 'Отпечаток содержимого последней проверки (BLAKE2b, 128 бит)';
+
+-- Изменение content_fingerprint и content_strip_rules - изменение настроек сайта: обновляем
+-- updated_at, чтобы реестр сайтов (ENABLE_SITE_REGISTRY) получил новое значение без полной пересинхронизации.
+-- Функция из add_sites_updated_at.sql пересоздается с новыми колонками; колонки других
+-- миграций читаются через to_jsonb, поэтому порядок выполнения миграций не важен
+CREATE OR REPLACE FUNCTION botmonitor_sites_touch_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT'
+       OR NEW.url IS DISTINCT FROM OLD.url
+       OR NEW.original_url IS DISTINCT FROM OLD.original_url
+       OR NEW.chat_id IS DISTINCT FROM OLD.chat_id
+       OR NEW.is_reserve_domain IS DISTINCT FROM OLD.is_reserve_domain
+       OR NEW.check_interval IS DISTINCT FROM OLD.check_interval
+       OR to_jsonb(NEW) -> 'probe_method' IS DISTINCT FROM to_jsonb(OLD) -> 'probe_method'
+       OR to_jsonb(NEW) -> 'probe_engine' IS DISTINCT FROM to_jsonb(OLD) -> 'probe_engine'
+       OR NEW.content_fingerprint IS DISTINCT FROM OLD.content_fingerprint
+       OR NEW.content_strip_rules IS DISTINCT FROM OLD.content_strip_rules THEN
+        NEW.updated_at = now();
+    ELSE
+        NEW.updated_at = OLD.updated_at;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Пример: отслеживание главной страницы без CSRF-токена и времени генерации
+-- UPDATE botmonitor_sites SET content_fingerprint = TRUE,
+--     content_strip_rules = ARRAY['name="csrf_token" value="[^"]*"', 'Сгенерировано за [0-9.]+ мс']
+-- WHERE url = 'https://shop.example.com';
@@ -0,0 +1,44 @@
+-- Добавление движка проверки доступности для каждого сайта
+-- auto - aiohttp, curl_cffi только если обычный клиент заблокирован защитой от ботов
+-- curl - curl_cffi с имперсонацией браузера (для сайтов с защитой от ботов)
+-- aiohttp - обычный HTTP-клиент, дешевле curl
+-- tcp - только TCP-подключение к порту сайта, без HTTP-кода и заголовка страницы
+-- NULL означает движок по умолчанию (PROBE_ENGINE_DEFAULT, auto)
+-- После выполнения включите ENABLE_SITE_PROBE_ENGINE=True: без флага колонка не выбирается
+
+ALTER TABLE botmonitor_sites 
+ADD COLUMN probe_engine TEXT;
+
+ALTER TABLE botmonitor_sites 
+ADD CONSTRAINT botmonitor_sites_probe_engine_values CHECK (probe_engine IS NULL OR probe_engine IN ('auto', 'curl', 'aiohttp', 'tcp'));
+
+-- Добавляем комментарий к колонке
+COMMENT ON COLUMN botmonitor_sites.probe_engine IS 'Движок проверки доступности: auto, curl, aiohttp или tcp. NULL - движок по умолчанию';
+
+-- Изменение probe_engine - изменение настроек сайта: обновляем updated_at, чтобы реестр
+-- сайтов (ENABLE_SITE_REGISTRY) получил новое значение без полной пересинхронизации.
+-- Функция из add_sites_updated_at.sql пересоздается с новыми колонками; колонки других
+-- миграций читаются через to_jsonb, поэтому порядок выполнения миграций не важен
+CREATE OR REPLACE FUNCTION botmonitor_sites_touch_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT'
+       OR NEW.url IS DISTINCT FROM OLD.url
+       OR NEW.original_url IS DISTINCT FROM OLD.original_url
+       OR NEW.chat_id IS DISTINCT FROM OLD.chat_id
+       OR NEW.is_reserve_domain IS DISTINCT FROM OLD.is_reserve_domain
+       OR NEW.check_interval IS DISTINCT FROM OLD.check_interval
+       OR to_jsonb(NEW) -> 'probe_method' IS DISTINCT FROM to_jsonb(OLD) -> 'probe_method'
+       OR NEW.probe_engine IS DISTINCT FROM OLD.probe_engine
+       OR to_jsonb(NEW) -> 'content_fingerprint' IS DISTINCT FROM to_jsonb(OLD) -> 'content_fingerprint'
+       OR to_jsonb(NEW) -> 'content_strip_rules' IS DISTINCT FROM to_jsonb(OLD) -> 'content_strip_rules' THEN
+        NEW.updated_at = now();
+    ELSE
+        NEW.updated_at = OLD.updated_at;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Пример: сайт без защиты от ботов проверяется без имперсонации браузера
+-- UPDATE botmonitor_sites SET probe_engine = 'aiohttp' WHERE url = 'https://landing.example.com';
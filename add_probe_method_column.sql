@@ -0,0 +1,42 @@
+-- Добавление метода HTTP-проверки для каждого сайта
+-- head - запрос HEAD без загрузки тела (GET, только если сервер отклоняет HEAD), заголовок страницы не отслеживается
+-- get - полный GET с отслеживанием заголовка страницы
+-- NULL означает метод по умолчанию (PROBE_METHOD_DEFAULT, get)
+-- После выполнения включите ENABLE_SITE_PROBE_METHOD=True: без флага колонка не выбирается
+
+ALTER TABLE botmonitor_sites 
+ADD COLUMN probe_method TEXT;
+
+ALTER TABLE botmonitor_sites 
+ADD CONSTRAINT botmonitor_sites_probe_method_values CHECK (probe_method IS NULL OR probe_method IN ('get', 'head'));
+
+-- Добавляем комментарий к колонке
+COMMENT ON COLUMN botmonitor_sites.probe_method IS 'Метод проверки доступности: head (без загрузки тела и отслеживания заголовка) или get. NULL - метод по умолчанию';
+
+-- Изменение probe_method - изменение настроек сайта: обновляем updated_at, чтобы реестр
+-- сайтов (ENABLE_SITE_REGISTRY) получил новое значение без полной пересинхронизации.
+-- Функция из add_sites_updated_at.sql пересоздается с новыми колонками; колонки других
+-- миграций читаются через to_jsonb, поэтому порядок выполнения миграций не важен
+CREATE OR REPLACE FUNCTION botmonitor_sites_touch_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT'
+       OR NEW.url IS DISTINCT FROM OLD.url
+       OR NEW.original_url IS DISTINCT FROM OLD.original_url
+       OR NEW.chat_id IS DISTINCT FROM OLD.chat_id
+       OR NEW.is_reserve_domain IS DISTINCT FROM OLD.is_reserve_domain
+       OR NEW.check_interval IS DISTINCT FROM OLD.check_interval
+       OR to_jsonb(NEW) -> 'probe_engine' IS DISTINCT FROM to_jsonb(OLD) -> 'probe_engine'
+       OR to_jsonb(NEW) -> 'content_fingerprint' IS DISTINCT FROM to_jsonb(OLD) -> 'content_fingerprint'
+       OR to_jsonb(NEW) -> 'content_strip_rules' IS DISTINCT FROM to_jsonb(OLD) -> 'content_strip_rules'
+       OR NEW.probe_method IS DISTINCT FROM OLD.probe_method THEN
+        NEW.updated_at = now();
+    ELSE
+        NEW.updated_at = OLD.updated_at;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Пример: лендинг, для которого заголовок не важен
+-- UPDATE botmonitor_sites SET probe_method = 'head' WHERE url = 'https://landing.example.com';
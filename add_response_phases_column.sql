@@ -0,0 +1,14 @@
+-- Добавление разбивки времени ответа по фазам
+-- Заполняется при каждой проверке доступности: тайминги libcurl (curl_cffi) или события TraceConfig (aiohttp)
+-- Пример значения: {"dns": 0.012, "connect": 0.031, "tls": 0.058, "ttfb": 0.240, "download": 0.004, "total": 0.345}
+-- NULL - HTTP-запрос не выполнился (сайт проверен только по TCP или недоступен)
+-- После выполнения включите ENABLE_RESPONSE_PHASES=True: без флага колонка не заполняется
+
+ALTER TABLE botmonitor_sites 
+ADD COLUMN response_phases JSONB;
+
+-- Добавляем комментарий к колонке
+COMMENT ON COLUMN botmonitor_sites.response_phases IS 'Фазы времени последней проверки в секундах: dns, connect, tls, ttfb, download, total';
+
+-- Пример: сайты с самым долгим TLS-рукопожатием
+-- SELECT url, (response_phases->>'tls')::float AS tls FROM botmonitor_sites WHERE response_phases IS NOT NULL ORDER BY tls DESC LIMIT 20;
@@ -0,0 +1,66 @@
+-- Инкрементальная синхронизация реестра сайтов (ENABLE_SITE_REGISTRY=True)
+-- Бот загружает список сайтов один раз при старте, а затем запрашивает только
+-- строки, у которых изменился updated_at, и удаленные сайты из botmonitor_sites_deleted.
+-- Выполните этот скрипт в Supabase SQL Editor после add_check_interval_column.sql
+
+-- 1. Колонка времени последнего изменения настроек сайта
+ALTER TABLE botmonitor_sites 
+ADD COLUMN updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+
+CREATE INDEX IF NOT EXISTS idx_botmonitor_sites_updated_at ON botmonitor_sites (updated_at);
+
+COMMENT ON COLUMN botmonitor_sites.updated_at IS 'Время последнего изменения настроек сайта (не меняется при записи результатов проверок)';
+
+-- 2. updated_at меняется только при изменении настроек, а не статуса проверки,
+-- иначе каждая проверка вызывала бы повторную загрузку строки.
+-- Настройки из других миграций (probe_method, probe_engine, content_*) читаются через to_jsonb:
+-- колонки может еще не быть. Эти миграции пересоздают функцию с тем же списком колонок
+CREATE OR REPLACE FUNCTION botmonitor_sites_touch_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT'
+       OR NEW.url IS DISTINCT FROM OLD.url
+       OR NEW.original_url IS DISTINCT FROM OLD.original_url
+       OR NEW.chat_id IS DISTINCT FROM OLD.chat_id
+       OR NEW.is_reserve_domain IS DISTINCT FROM OLD.is_reserve_domain
+       OR NEW.check_interval IS DISTINCT FROM OLD.check_interval
+       OR to_jsonb(NEW) -> 'probe_method' IS DISTINCT FROM to_jsonb(OLD) -> 'probe_method'
+       OR to_jsonb(NEW) -> 'probe_engine' IS DISTINCT FROM to_jsonb(OLD) -> 'probe_engine'
+       OR to_jsonb(NEW) -> 'content_fingerprint' IS DISTINCT FROM to_jsonb(OLD) -> 'content_fingerprint'
+       OR to_jsonb(NEW) -> 'content_strip_rules' IS DISTINCT FROM to_jsonb(OLD) -> 'content_strip_rules' THEN
+        NEW.updated_at = now();
+    ELSE
+        NEW.updated_at = OLD.updated_at;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_botmonitor_sites_touch_updated_at ON botmonitor_sites;
+CREATE TRIGGER trg_botmonitor_sites_touch_updated_at
+    BEFORE INSERT OR UPDATE ON botmonitor_sites
+    FOR EACH ROW EXECUTE FUNCTION botmonitor_sites_touch_updated_at();
+
+-- 3. Журнал удаленных сайтов для инкрементального удаления из реестра
+CREATE TABLE IF NOT EXISTS botmonitor_sites_deleted (
+    site_id BIGINT NOT NULL,
+    deleted_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_botmonitor_sites_deleted_at ON botmonitor_sites_deleted (deleted_at);
+
+CREATE OR REPLACE FUNCTION botmonitor_sites_log_delete()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO botmonitor_sites_deleted (site_id) VALUES (OLD.id);
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_botmonitor_sites_log_delete ON botmonitor_sites;
+CREATE TRIGGER trg_botmonitor_sites_log_delete
+    AFTER DELETE ON botmonitor_sites
+    FOR EACH ROW EXECUTE FUNCTION botmonitor_sites_log_delete();
+
+-- Старые записи журнала можно периодически очищать:
+-- DELETE FROM botmonitor_sites_deleted WHERE deleted_at < now() - interval '7 days';
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Сравнение пропускной способности движков проверки (curl, aiohttp, tcp).
+
+По умолчанию запросы идут к локальному HTTP-серверу, поэтому измеряются накладные
+расходы самих движков, а не сеть. Можно указать внешний URL:
+    python benchmark_probe_engines.py --url https://example.com --requests 100
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from urllib.parse import urlparse
+
+from aiohttp import web
+
+# Исправление для Windows Proactor event loop предупреждения
+if sys.platform == "win32":
+    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+# Добавляем путь к основному файлу для импорта
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from http_sessions import AiohttpSessionManager, CurlSessionPool
+from net_probes import tcp_probe
+from probe_engines import AiohttpProbeEngine, CurlProbeEngine, TcpProbeEngine, benchmark_engine
+from probe_timings import CURL_TIMING_INFOS, aiohttp_trace_config
+
+PAGE = "<html><head><title>Benchmark</title></head><body>" + "x" * 20000 + "</body></html>"
+
+
+async def start_local_server():
+    async def handler(request):
+        return web.Response(text=PAGE, content_type='text/html')
+
+    app = web.Application()
+    app.router.add_get('/', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/"
+
+
+async def tcp_connect(url):
+    """Неблокирующее TCP-подключение к порту сайта"""
+    parsed = urlparse(url)
+    port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+    result = await tcp_probe(parsed.hostname, port, timeout=5)
+    return result.reachable, result.elapsed
+
+
+async def main(url, requests, concurrency):
+    runner = None
+    if url is None:
+        runner, url = await start_local_server()
+
+    curl_pool = CurlSessionPool(size=2, max_clients=concurrency, curl_infos=CURL_TIMING_INFOS)
+    sessions = AiohttpSessionManager(limit=concurrency, limit_per_host=concurrency, trace_configs=[aiohttp_trace_config()])
+    engines = [
+        CurlProbeEngine(curl_pool),
+        AiohttpProbeEngine(sessions),
+        TcpProbeEngine(tcp_connect),
+    ]
+    print(f"URL: {url}, запросов: {requests}, конкурентность: {concurrency}")
+    try:
+        for engine in engines:
+            # Прогрев: соединения и сессии создаются до замера
+            await benchmark_engine(engine, url, requests=concurrency, concurrency=concurrency)
+            stats = await benchmark_engine(engine, url, requests=requests, concurrency=concurrency)
+            print(f"{stats['engine']:>8}: {stats['rps']:8.1f} запросов/с, "
+                  f"время {stats['elapsed']:.2f}с, ошибок {stats['errors']}")
+    finally:
+        await curl_pool.close()
+        await sessions.close()
+        if runner is not None:
+            await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сравнение движков проверки сайтов")
+    parser.add_argument('--url', help="URL для проверки (по умолчанию локальный сервер)")
+    parser.add_argument('--requests', type=int, default=500, help="Число запросов на движок")
+    parser.add_argument('--concurrency', type=int, default=20, help="Одновременных запросов")
+    args = parser.parse_args()
+    asyncio.run(main(args.url, args.requests, args.concurrency))
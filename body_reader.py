@@ -0,0 +1,194 @@
+"""
+Извлечение заголовка страницы из начала ответа без загрузки всего документа.
+
+Тело читается по частям до первого "</title>" или до лимита байт, после чего
+передача прерывается. Кодировка берется из заголовка Content-Type, затем из
+<meta charset> / <meta http-equiv="Content-Type"> в прочитанном начале документа,
+затем из BOM; по умолчанию используется UTF-8.
+
+Независимо от лимита поиска заголовка каждая проверка ограничена жесткими лимитами
+(BodyLimits): байт, загруженных из сети, и байт после распаковки gzip/deflate.
+Распаковка идет частями не больше DECODE_CHUNK_SIZE, поэтому "gzip-бомба" не
+разворачивается в памяти целиком.
+"""
+
+import codecs
+import re
+import zlib
+from typing import AsyncIterable, AsyncIterator, Callable, Dict, Optional
+
+# Сколько байт тела читать в поисках заголовка по умолчанию
+DEFAULT_TITLE_READ_LIMIT = 64 * 1024
+# Жесткие лимиты тела одной проверки по умолчанию
+DEFAULT_MAX_DOWNLOAD_BYTES = 1024 * 1024
+DEFAULT_MAX_DECOMPRESSED_BYTES = 4 * 1024 * 1024
+# Наибольшая часть, получаемая за один шаг распаковки
+DECODE_CHUNK_SIZE = 16 * 1024
+# Кодировки сжатия, которые распаковываются самостоятельно (их и запрашивает aiohttp-движок)
+DECODED_ENCODINGS = ('gzip', 'x-gzip', 'deflate')
+
+TITLE_RE = re.compile(rb'<title[^>]*>([^<]+)</title', re.IGNORECASE)
+TITLE_END_RE = re.compile(rb'</title|</head|<body', re.IGNORECASE)
+META_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([a-zA-Z0-9_.:-]+)', re.IGNORECASE)
+HEADER_CHARSET_RE = re.compile(r'charset\s*=\s*["\']?\s*([a-zA-Z0-9_.:-]+)', re.IGNORECASE)
+
+BOMS = (
+    (codecs.BOM_UTF8, 'utf-8'),
+    (codecs.BOM_UTF16_LE, 'utf-16-le'),
+    (codecs.BOM_UTF16_BE, 'utf-16-be'),
+)
+
+
+def _known_encoding(name: Optional[str]) -> Optional[str]:
+    if not name:
+        return None
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        return None
+
+
+def detect_charset(content_type: Optional[str], head: bytes) -> str:
+    """Кодировка документа по заголовку Content-Type, meta-тегу или BOM"""
+    if content_type:
+        match = HEADER_CHARSET_RE.search(content_type)
+        encoding = _known_encoding(match.group(1)) if match else None
+        if encoding:
+            return encoding
+    match = META_CHARSET_RE.search(head)
+    encoding = _known_encoding(match.group(1).decode('ascii', 'ignore')) if match else None
+    if encoding:
+        return encoding
+    for bom, name in BOMS:
+        if head.startswith(bom):
+            return name
+    return 'utf-8'
+
+
+def find_title(body: bytes, content_type: Optional[str] = None) -> Optional[str]:
+    """Заголовок страницы из (начала) документа или None"""
+    match = TITLE_RE.search(body)
+    if not match:
+        return None
+    encoding = detect_charset(content_type, body[:match.start()])
+    title = match.group(1).decode(encoding, errors='replace').strip()
+    return title or None
+
+
+async def read_title(chunks: AsyncIterable[bytes], content_type: Optional[str] = None,
+                     limit: int = DEFAULT_TITLE_READ_LIMIT) -> Optional[str]:
+    """
+    Читает части тела, пока не встретится конец заголовка (или начало <body>),
+    либо пока не будет прочитано limit байт. Прерывать передачу должен вызывающий код.
+    """
+    buffer = bytearray()
+    async for chunk in chunks:
+        # Ищем конец заголовка с небольшим перекрытием на случай разрыва тега между частями
+        search_from = max(0, len(buffer) - 8)
+        buffer.extend(chunk)
+        if TITLE_END_RE.search(buffer, search_from) or len(buffer) >= limit:
+            break
+    return find_title(bytes(buffer[:limit]), content_type)
+
+
+class BodyBudget:
+    """
+    Счетчики тела одной проверки. Части сверх лимита не отдаются: последняя часть
+    обрезается, чтение останавливается, а truncated указывает сработавший лимит
+    ('download' или 'decompressed').
+    """
+
+    def __init__(self, max_download: int, max_decompressed: int,
+                 downloaded: Optional[Callable[[], int]] = None):
+        self.max_download = max_download
+        self.max_decompressed = max_decompressed
+        # Источник числа загруженных байт, если распаковку выполняет HTTP-клиент (libcurl)
+        self._downloaded = downloaded
+        self.downloaded = 0
+        self.decompressed = 0
+        self.truncated: Optional[str] = None
+
+    def _take(self, chunk: bytes) -> bytes:
+        """Учитывает распакованную часть; возвращает ее, обрезанную по лимиту"""
+        remaining = self.max_decompressed - self.decompressed
+        if len(chunk) > remaining:
+            chunk = chunk[:remaining]
+            self.truncated = 'decompressed'
+        self.decompressed += len(chunk)
+        return chunk
+
+    async def chunks(self, chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+        """Уже распакованные части (распаковку выполнил HTTP-клиент)"""
+        async for chunk in chunks:
+            self.downloaded = self._downloaded() if self._downloaded is not None else self.downloaded + len(chunk)
+            if self.downloaded > self.max_download:
+                self.truncated = 'download'
+                return
+            chunk = self._take(chunk)
+            if chunk:
+                yield chunk
+            if self.truncated:
+                return
+
+    async def decode(self, raw_chunks: AsyncIterable[bytes], content_encoding: Optional[str] = None) -> AsyncIterator[bytes]:
+        """Сжатые части из сети: распаковка по DECODE_CHUNK_SIZE с учетом обоих лимитов"""
+        encoding = (content_encoding or '').strip().lower()
+        decompressor = None
+        async for raw in raw_chunks:
+            remaining = self.max_download - self.downloaded
+            if len(raw) > remaining:
+                raw = raw[:remaining]
+                self.truncated = 'download'
+            self.downloaded += len(raw)
+            if encoding not in DECODED_ENCODINGS:
+                chunk = self._take(raw)
+                if chunk:
+                    yield chunk
+            else:
+                if decompressor is None:
+                    # deflate бывает как с заголовком zlib, так и "сырым"
+                    if encoding == 'deflate':
+                        wbits = zlib.MAX_WBITS if raw[:1] and raw[0] & 0x0F == 8 else -zlib.MAX_WBITS
+                    else:
+                        wbits = 16 + zlib.MAX_WBITS
+                    decompressor = zlib.decompressobj(wbits)
+                data = raw
+                while data:
+                    # На байт больше остатка лимита - чтобы отличить ровно исчерпанный лимит от превышения
+                    size = min(DECODE_CHUNK_SIZE, self.max_decompressed - self.decompressed + 1)
+                    chunk = decompressor.decompress(data, size)
+                    data = decompressor.unconsumed_tail
+                    chunk = self._take(chunk)
+                    if chunk:
+                        yield chunk
+                    if self.truncated:
+                        return
+            if self.truncated:
+                return
+
+
+class BodyLimits:
+    """Жесткие лимиты тела для всех проверок и счетчик проверок, где они сработали"""
+
+    def __init__(self, max_download: int = DEFAULT_MAX_DOWNLOAD_BYTES,
+                 max_decompressed: int = DEFAULT_MAX_DECOMPRESSED_BYTES):
+        self.max_download = max_download
+        self.max_decompressed = max_decompressed
+        self.truncated: Dict[str, int] = {'download': 0, 'decompressed': 0}
+
+    def budget(self, downloaded: Optional[Callable[[], int]] = None) -> BodyBudget:
+        return BodyBudget(self.max_download, self.max_decompressed, downloaded)
+
+    def record(self, budget: BodyBudget):
+        if budget.truncated:
+            self.truncated[budget.truncated] += 1
+
+    def take_truncated(self) -> Dict[str, int]:
+        """Число прерванных загрузок с момента предыдущего вызова"""
+        truncated = dict(self.truncated)
+        self.truncated = {name: 0 for name in self.truncated}
+        return truncated
+
+    def summary(self) -> str:
+        truncated = self.take_truncated()
+        return f"по загрузке {truncated['download']}, по распаковке {truncated['decompressed']}"
@@ -0,0 +1,36 @@
+"""
+Словари ограниченного размера для кэшей и журналов по хосту или URL.
+
+Запись ключа переносит его в конец порядка вставки, а при превышении лимита
+удаляются ключи, записанные раньше всех. Так размер памяти кэша не растет вместе
+с числом когда-либо проверенных хостов.
+"""
+
+from typing import Any, Hashable
+
+
+class BoundedDict(dict):
+    """
+    dict не более чем с max_entries ключами. Лимит соблюдается при записи через
+    d[key] = value; update и setdefault его не проверяют и здесь не используются.
+    """
+
+    def __init__(self, max_entries: int):
+        super().__init__()
+        self.max_entries = max_entries
+
+    def __setitem__(self, key: Hashable, value: Any):
+        super().pop(key, None)
+        super().__setitem__(key, value)
+        while len(self) > self.max_entries:
+            super().__delitem__(next(iter(self)))
+
+
+class BoundedLog(BoundedDict):
+    """Последнее записанное значение по ключу: record(key, value) и get(key)"""
+
+    def __init__(self, max_entries: int = 10000):
+        super().__init__(max_entries)
+
+    def record(self, key: Hashable, value: Any):
+        self[key] = value
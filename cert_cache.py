@@ -0,0 +1,89 @@
+"""
+Кэш SSL-сертификатов с расписанием повторной проверки по сроку действия.
+
+Сертификат, действующий еще 80 дней, не нужно проверять каждые несколько минут.
+Запись кэша хранит сертификат хоста (с его отпечатком SHA-256) и время следующей
+проверки: чем ближе истечение, тем чаще проверка (REFRESH_SCHEDULE). Если HTTP-проверка
+получила от сервера сертификат с другим отпечатком, запись устаревает сразу.
+"""
+
+import time
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+from bounded_map import BoundedDict
+from net_probes import CertificateInfo
+
+# (дней до истечения не меньше, интервал повторной проверки в секундах) - от дальних сроков к ближним
+REFRESH_SCHEDULE: Tuple[Tuple[int, float], ...] = (
+    (30, 24 * 3600),
+    (14, 6 * 3600),
+    (7, 3600),
+    (1, 15 * 60),
+)
+# Истекает в течение суток или уже истек - проверяется при каждом обращении после паузы
+MIN_REFRESH_INTERVAL = 5 * 60
+
+
+def refresh_interval(days_left: int, schedule: Sequence[Tuple[int, float]] = REFRESH_SCHEDULE) -> float:
+    """Через сколько секунд проверять сертификат повторно"""
+    for min_days, interval in schedule:
+        if days_left >= min_days:
+            return interval
+    return MIN_REFRESH_INTERVAL
+
+
+class CertificateCache:
+    """Сертификаты по (хост, порт) с временем следующей проверки"""
+
+    def __init__(self, schedule: Sequence[Tuple[int, float]] = REFRESH_SCHEDULE, max_hosts: int = 10000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.schedule = schedule
+        self.clock = clock
+        self._entries: Dict[Tuple[str, int], Tuple[CertificateInfo, float]] = BoundedDict(max_hosts)
+        self.hits = 0
+        self.inspections = 0
+        self.changes = 0
+
+    def get(self, host: str, port: int = 443, fingerprint: Optional[str] = None) -> Optional[CertificateInfo]:
+        """
+        Сертификат из кэша, если его еще рано проверять. fingerprint - отпечаток сертификата,
+        полученного проверкой: при несовпадении запись считается устаревшей.
+        """
+        entry = self._entries.get((host.lower(), port))
+        if entry is None:
+            return None
+        info, refresh_at = entry
+        if self.clock() >= refresh_at or (fingerprint is not None and fingerprint != info.fingerprint):
+            return None
+        self.hits += 1
+        return info
+
+    def store(self, host: str, port: int, info: CertificateInfo) -> bool:
+        """Сохраняет результат проверки; True - сертификат хоста сменился"""
+        key = (host.lower(), port)
+        previous = self._entries.get(key)
+        # Следующая проверка не позже истечения сертификата
+        interval = min(refresh_interval(info.days_left(), self.schedule),
+                       max(MIN_REFRESH_INTERVAL, info.days_left() * 86400))
+        self._entries[key] = (info, self.clock() + interval)
+        self.inspections += 1
+        changed = previous is not None and previous[0].fingerprint != info.fingerprint
+        if changed:
+            self.changes += 1
+        return changed
+
+    def next_refresh(self, host: str, port: int = 443) -> Optional[float]:
+        """Секунд до следующей проверки сертификата хоста (None - хоста нет в кэше)"""
+        entry = self._entries.get((host.lower(), port))
+        return max(0.0, entry[1] - self.clock()) if entry is not None else None
+
+    def take_stats(self) -> Dict[str, int]:
+        """Статистика с момента предыдущего вызова"""
+        stats = {'hits': self.hits, 'inspections': self.inspections, 'changes': self.changes, 'hosts': len(self._entries)}
+        self.hits = self.inspections = self.changes = 0
+        return stats
+
+    def summary(self) -> str:
+        stats = self.take_stats()
+        return (f"из кэша {stats['hits']}, проверено {stats['inspections']}, "
+                f"сменилось {stats['changes']}, хостов {stats['hosts']}")
@@ -0,0 +1,183 @@
+"""
+Пул воркеров для параллельной проверки сайтов с ограничением конкурентности
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+
+class CycleStats:
+    """Статистика пропускной способности одного цикла проверки"""
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+        self.total = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.durations: List[float] = []
+        self.slowest_key: Optional[str] = None
+        self.slowest_duration = 0.0
+
+    def record(self, key: str, duration: float, ok: bool):
+        self.total += 1
+        if ok:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+        self.durations.append(duration)
+        if duration > self.slowest_duration:
+            self.slowest_duration = duration
+            self.slowest_key = key
+
+    def finish(self):
+        self.finished_at = time.monotonic()
+
+    @property
+    def elapsed(self) -> float:
+        end = self.finished_at if self.finished_at is not None else time.monotonic()
+        return end - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        """Количество проверок в секунду"""
+        return self.total / self.elapsed if self.elapsed > 0 else 0.0
+
+    def percentile(self, pct: float) -> float:
+        if not self.durations:
+            return 0.0
+        ordered = sorted(self.durations)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'total': self.total,
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'elapsed': round(self.elapsed, 3),
+            'throughput': round(self.throughput, 3),
+            'p50': round(self.percentile(50), 3),
+            'p95': round(self.percentile(95), 3),
+            'slowest': self.slowest_key,
+            'slowest_duration': round(self.slowest_duration, 3),
+        }
+
+    def summary(self) -> str:
+        return (
+            f"проверено {self.total} (успешно: {self.succeeded}, ошибок: {self.failed}) "
+            f"за {self.elapsed:.2f} сек, {self.throughput:.2f} проверок/сек, "
+            f"p50={self.percentile(50):.2f}с, p95={self.percentile(95):.2f}с, "
+            f"самый медленный: {self.slowest_key} ({self.slowest_duration:.2f}с)"
+        )
+
+
+class CheckWorkerPool:
+    """
+    Пул воркеров, выполняющих проверки сайтов параллельно.
+
+    Глобальное ограничение задается общим семафором пула, ограничение на хост -
+    семафором для каждого хоста. Семафор хоста берется до глобального слота, поэтому
+    проверки, ждущие занятого хоста, не занимают слоты проверок других хостов.
+    Время цикла определяется самым медленным сайтом, а не суммой времени проверки всех сайтов.
+
+    check_func, которая сама обрабатывает свои ошибки, сообщает о неудаче, возвращая False.
+    """
+
+    def __init__(self, concurrency: int = 20, per_host_limit: int = 2):
+        self.concurrency = max(1, concurrency)
+        self.per_host_limit = max(1, per_host_limit)
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._host_users: Dict[str, int] = {}
+        self._global_semaphore = asyncio.Semaphore(self.concurrency)
+        self._tasks = set()
+
+    def _acquire_host(self, host: str) -> asyncio.Semaphore:
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.per_host_limit)
+            self._host_semaphores[host] = semaphore
+        self._host_users[host] = self._host_users.get(host, 0) + 1
+        return semaphore
+
+    def _release_host(self, host: str):
+        # Удаляем семафоры хостов, которые больше никем не используются
+        users = self._host_users.get(host, 1) - 1
+        if users <= 0:
+            self._host_users.pop(host, None)
+            self._host_semaphores.pop(host, None)
+        else:
+            self._host_users[host] = users
+
+    async def run_one(self, item: Any, check_func: Callable[[Any], Awaitable[Any]],
+                      host: str, key: str, stats: CycleStats) -> Any:
+        """Выполняет одну проверку: сначала слот хоста, затем глобальный слот пула"""
+        semaphore = self._acquire_host(host)
+        try:
+            async with semaphore, self._global_semaphore:
+                started = time.monotonic()
+                ok = False
+                try:
+                    result = await check_func(item)
+                    ok = result is not False
+                    return result
+                except Exception as e:
+                    logging.error(f"Ошибка при проверке {key}: {e}")
+                finally:
+                    stats.record(key, time.monotonic() - started, ok)
+        finally:
+            self._release_host(host)
+
+    def dispatch(self, item: Any, check_func: Callable[[Any], Awaitable[Any]], host: str, key: str,
+                 stats: CycleStats, on_done: Optional[Callable[[Any], None]] = None) -> asyncio.Task:
+        """
+        Запускает проверку в фоне для непрерывного режима (планировщик).
+        Глобальный лимит обеспечивается общим семафором пула.
+        """
+        async def runner():
+            try:
+                return await self.run_one(item, check_func, host, key, stats)
+            finally:
+                if on_done:
+                    on_done(item)
+
+        task = asyncio.create_task(runner())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    @property
+    def active_count(self) -> int:
+        """Количество проверок, запущенных через dispatch и еще не завершенных"""
+        return len(self._tasks)
+
+    async def run_cycle(self, items: List[Any], check_func: Callable[[Any], Awaitable[Any]],
+                        host_func: Callable[[Any], str],
+                        key_func: Callable[[Any], str] = str) -> CycleStats:
+        """
+        Проверяет все элементы с ограничением конкурентности.
+
+        Args:
+            items: Элементы для проверки (записи сайтов)
+            check_func: Корутина проверки одного элемента
+            host_func: Функция получения хоста элемента (для ограничения на хост)
+            key_func: Функция получения имени элемента для статистики
+
+        Returns:
+            CycleStats: Статистика цикла
+        """
+        stats = CycleStats()
+        # Задача на каждый элемент: ожидание занятого хоста не держит глобальный слот,
+        # свободные слоты достаются проверкам других хостов в порядке списка
+        tasks = [asyncio.create_task(self.run_one(item, check_func, host_func(item), key_func(item), stats))
+                 for item in items]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            stats.finish()
+        return stats
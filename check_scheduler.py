@@ -0,0 +1,416 @@
+"""
+Планировщик проверок сайтов на основе очереди с приоритетом (min-heap по времени следующей проверки)
+"""
+
+import hashlib
+import heapq
+import itertools
+import math
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+# Минимально допустимый интервал проверки сайта в секундах
+MIN_SITE_INTERVAL = 10
+
+# Уровни сброса нагрузки (каждый следующий включает предыдущие)
+SHED_NONE = 0  # Нормальная работа
+SHED_RESERVE = 1  # Откладываются резервные домены
+SHED_ENRICHMENT = 2  # Не обновляются заголовок страницы и SSL
+SHED_SLOW = 3  # Откладываются сайты с длинным интервалом
+
+
+def parse_timestamp(value: Any) -> Optional[float]:
+    """Преобразует ISO-строку или datetime из БД в UNIX-время"""
+    if not value:
+        return None
+    try:
+        if isinstance(value, datetime):
+            dt = value
+        else:
+            dt = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return dt.timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def phase_fraction(site_id: Any) -> float:
+    """
+    Стабильная доля интервала [0, 1) для сайта.
+    Не зависит от перезапусков процесса (в отличие от встроенного hash()).
+    """
+    digest = hashlib.md5(str(site_id).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') / float(1 << 64)
+
+
+class AdaptiveIntervalPolicy:
+    """
+    Адаптивный интервал проверки по состоянию сайта.
+
+    Базовый интервал (check_interval или интервал по умолчанию) сокращается для сайтов,
+    которые недоступны, недавно меняли статус или отвечают заметно медленнее обычного,
+    и увеличивается для стабильных сайтов: вдвое за каждое удвоение срока стабильной работы
+    (stable_after, 2*stable_after, 4*stable_after ...). Результат ограничен min_interval/max_interval.
+    """
+
+    def __init__(self, min_interval: int = 60, max_interval: int = 3600,
+                 down_factor: float = 0.25, recent_change_window: int = 3600,
+                 recent_change_factor: float = 0.5, slow_response_ratio: float = 1.5,
+                 slow_response_factor: float = 0.5, stable_after: int = 86400):
+        self.min_interval = max(MIN_SITE_INTERVAL, min_interval)
+        self.max_interval = max(self.min_interval, max_interval)
+        self.down_factor = down_factor
+        self.recent_change_window = recent_change_window
+        self.recent_change_factor = recent_change_factor
+        self.slow_response_ratio = slow_response_ratio
+        self.slow_response_factor = slow_response_factor
+        self.stable_after = stable_after
+
+    def factor(self, site: Dict[str, Any], now: float) -> float:
+        """Множитель базового интервала для текущего состояния сайта"""
+        if site.get('is_up') is False:
+            return self.down_factor
+
+        changed_at = parse_timestamp(site.get('last_status_change'))
+        stable_for = now - changed_at if changed_at is not None else None
+        if stable_for is not None and stable_for < self.recent_change_window:
+            return self.recent_change_factor
+
+        # Рост времени ответа: последнее значение заметно выше скользящего среднего
+        response_time = site.get('response_time') or 0.0
+        avg_response_time = site.get('avg_response_time') or 0.0
+        if response_time > 0 and avg_response_time > 0 and response_time > avg_response_time * self.slow_response_ratio:
+            return self.slow_response_factor
+
+        if stable_for is not None and stable_for >= self.stable_after:
+            return float(2 ** (int(math.log2(stable_for / self.stable_after)) + 1))
+        return 1.0
+
+    def interval(self, site: Dict[str, Any], base_interval: int, now: float) -> int:
+        """
+        Адаптивный интервал сайта.
+        Границы не отменяют явно заданный интервал: сайт с check_interval меньше min_interval
+        не замедляется, а с check_interval больше max_interval не ускоряется в стабильном состоянии.
+        """
+        lower = min(self.min_interval, base_interval)
+        upper = max(self.max_interval, base_interval)
+        interval = int(base_interval * self.factor(site, now))
+        return max(lower, min(upper, interval))
+
+
+class LoadShedder:
+    """
+    Сброс низкоприоритетной работы при отставании проверок от расписания.
+
+    Уровень определяется лагом (насколько самая старая ожидающая проверка опоздала):
+    lag >= lag_threshold - SHED_RESERVE, >= 2x - SHED_ENRICHMENT, >= 4x - SHED_SLOW.
+    Уровень снижается только когда лаг падает ниже половины порога текущего уровня,
+    чтобы сброс не включался и не выключался на каждой итерации.
+    """
+
+    def __init__(self, lag_threshold: float = 30, slow_interval: int = 900, enabled: bool = True):
+        self.lag_threshold = max(1.0, lag_threshold)
+        self.slow_interval = slow_interval
+        self.enabled = enabled
+        self.level = SHED_NONE
+        self.lag = 0.0
+
+    def _threshold(self, level: int) -> float:
+        return self.lag_threshold * (2 ** (level - 1))
+
+    def update(self, lag: float) -> int:
+        """Учитывает текущий лаг и возвращает уровень сброса"""
+        self.lag = max(0.0, lag)
+        if not self.enabled:
+            return self.level
+
+        level = self.level
+        while level < SHED_SLOW and self.lag >= self._threshold(level + 1):
+            level += 1
+        while level > SHED_NONE and self.lag < self._threshold(level) / 2:
+            level -= 1
+
+        if level != self.level:
+            if level > self.level:
+                logging.warning(f"Проверки отстают от расписания на {self.lag:.1f}с, уровень сброса нагрузки {self.level} -> {level}")
+            else:
+                logging.info(f"Отставание проверок снизилось до {self.lag:.1f}с, уровень сброса нагрузки {self.level} -> {level}")
+            self.level = level
+        return self.level
+
+    @property
+    def skip_enrichment(self) -> bool:
+        """Пропускать обновление заголовка страницы и SSL"""
+        return self.level >= SHED_ENRICHMENT
+
+    def should_defer(self, site: Dict[str, Any], interval: int) -> bool:
+        """Отложить проверку сайта до следующего интервала"""
+        if self.level >= SHED_RESERVE and site.get('is_reserve_domain', False):
+            return True
+        return self.level >= SHED_SLOW and interval >= self.slow_interval
+
+
+class SiteScheduler:
+    """
+    Очередь проверок с индивидуальным интервалом для каждого сайта.
+
+    Хранит min-heap из (время_следующей_проверки, порядковый_номер, id_сайта).
+    Выдает только сайты, у которых подошло время проверки. Пока сайт проверяется,
+    он не выдается повторно; после завершения проверки он планируется заново.
+    Устаревшие записи кучи отбрасываются лениво при извлечении.
+
+    С политикой адаптивных интервалов (policy) интервал сайта пересчитывается
+    после каждой проверки по его текущему состоянию.
+
+    В режиме сглаживания (smoothing=True) проверки сайта привязываются к сетке
+    времени со стабильным сдвигом фазы: t = k * interval + phase. Сайты равномерно
+    распределяются по интервалу, и нагрузка становится ровной вместо всплесков.
+    Функция phase_key задает ключ фазы по записи сайта (по умолчанию id): записи
+    с одинаковым ключом, например одним URL, попадают в один слот сетки.
+    pop_due_groups выдает такие записи одной группой, чтобы проверить их одним запросом.
+    """
+
+    def __init__(self, default_interval: int = 300, min_interval: int = MIN_SITE_INTERVAL,
+                 smoothing: bool = False, policy: Optional[AdaptiveIntervalPolicy] = None,
+                 phase_key: Optional[Callable[[Dict[str, Any]], Any]] = None):
+        self.default_interval = default_interval
+        self.min_interval = min_interval
+        self.smoothing = smoothing
+        self.policy = policy
+        self.phase_key = phase_key
+        self._heap: List[tuple] = []
+        self._entries: Dict[Any, Dict[str, Any]] = {}
+        # Записи по ключу phase_key: ключ -> id сайтов, id сайта -> ключ
+        self._members: Dict[Any, set] = {}
+        self._key_of: Dict[Any, Any] = {}
+        self._counter = itertools.count()
+        self._lag_count = 0
+        self._lag_total = 0.0
+        self._lag_max = 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, site_id):
+        return site_id in self._entries
+
+    def interval_for(self, site: Dict[str, Any], now: Optional[float] = None) -> int:
+        """Интервал проверки сайта: колонка check_interval или интервал по умолчанию"""
+        interval = site.get('check_interval') or self.default_interval
+        try:
+            interval = int(interval)
+        except (TypeError, ValueError):
+            interval = self.default_interval
+        interval = max(self.min_interval, interval)
+        if self.policy is not None:
+            interval = max(self.min_interval, self.policy.interval(site, interval, time.time() if now is None else now))
+        return interval
+
+    def _push(self, site_id, due: float):
+        entry = self._entries[site_id]
+        entry['due'] = due
+        heapq.heappush(self._heap, (due, next(self._counter), site_id))
+
+    def _index(self, site_id, site: Dict[str, Any]):
+        if self.phase_key is None:
+            return
+        key = self.phase_key(site)
+        old_key = self._key_of.get(site_id)
+        if old_key == key and site_id in self._key_of:
+            return
+        self._unindex(site_id)
+        self._key_of[site_id] = key
+        self._members.setdefault(key, set()).add(site_id)
+
+    def _unindex(self, site_id):
+        if site_id not in self._key_of:
+            return
+        key = self._key_of.pop(site_id)
+        members = self._members.get(key)
+        if members is not None:
+            members.discard(site_id)
+            if not members:
+                del self._members[key]
+
+    def phase_offset(self, site_id: Any, interval: int) -> float:
+        """Сдвиг фазы сайта внутри его интервала в секундах"""
+        entry = self._entries.get(site_id)
+        key = self.phase_key(entry['site']) if self.phase_key and entry else site_id
+        return phase_fraction(key) * interval
+
+    def _next_slot(self, site_id: Any, interval: int, earliest: float) -> float:
+        """Ближайший момент сетки сайта, не раньше earliest"""
+        phase = self.phase_offset(site_id, interval)
+        k = math.ceil((earliest - phase) / interval)
+        return k * interval + phase
+
+    def _initial_due(self, site: Dict[str, Any], interval: int, now: float) -> float:
+        # После перезапуска не проверяем заново весь парк: учитываем время последней проверки
+        last_check = parse_timestamp(site.get('last_check'))
+        if self.smoothing:
+            earliest = now if last_check is None else max(now, last_check + interval / 2)
+            return self._next_slot(site['id'], interval, earliest)
+        if last_check is None:
+            return now
+        return max(now, last_check + interval)
+
+    def add_or_update(self, site: Dict[str, Any], now: Optional[float] = None):
+        """Добавляет сайт в расписание или обновляет его данные и интервал"""
+        now = time.time() if now is None else now
+        site_id = site['id']
+        interval = self.interval_for(site, now)
+        entry = self._entries.get(site_id)
+
+        if entry is None:
+            self._entries[site_id] = {'site': site, 'interval': interval, 'due': None, 'in_flight': False}
+            self._index(site_id, site)
+            self._push(site_id, self._initial_due(site, interval, now))
+            return
+
+        # Идущая проверка запишет свои результаты (статус, счетчики) в текущую запись сайта;
+        # строка из БД, прочитанная до этого, их не содержит, поэтому не подменяет ее
+        if not entry['in_flight']:
+            entry['site'] = site
+        self._index(site_id, site)
+        if interval != entry['interval']:
+            old_interval = entry['interval']
+            entry['interval'] = interval
+            # При изменении интервала пересчитываем время следующей проверки
+            if not entry['in_flight'] and entry['due'] is not None:
+                if self.smoothing:
+                    self._push(site_id, self._next_slot(site_id, interval, now))
+                else:
+                    self._push(site_id, max(now, entry['due'] - old_interval + interval))
+
+    def remove(self, site_id):
+        """Удаляет сайт из расписания (запись в куче станет устаревшей)"""
+        self._entries.pop(site_id, None)
+        self._unindex(site_id)
+
+    def sync(self, sites: List[Dict[str, Any]], now: Optional[float] = None):
+        """Синхронизирует расписание с полным списком сайтов из БД"""
+        now = time.time() if now is None else now
+        seen = set()
+        for site in sites:
+            seen.add(site['id'])
+            self.add_or_update(site, now)
+        for site_id in list(self._entries):
+            if site_id not in seen:
+                self.remove(site_id)
+
+    def pop_due(self, now: Optional[float] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Извлекает сайты, время проверки которых наступило, и помечает их как проверяемые"""
+        now = time.time() if now is None else now
+        due_sites = []
+        while self._heap and self._heap[0][0] <= now:
+            if limit is not None and len(due_sites) >= limit:
+                break
+            due, _, site_id = heapq.heappop(self._heap)
+            entry = self._entries.get(site_id)
+            if entry is None or entry['in_flight'] or entry['due'] != due:
+                continue  # Устаревшая запись
+            entry['in_flight'] = True
+            due_sites.append(entry['site'])
+            # Лаг запуска: насколько проверка опоздала относительно своего времени
+            lag = max(0.0, now - due)
+            self._lag_count += 1
+            self._lag_total += lag
+            self._lag_max = max(self._lag_max, lag)
+        return due_sites
+
+    def pop_due_groups(self, now: Optional[float] = None, limit: Optional[int] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Как pop_due, но записи с одинаковым phase_key выдаются одной группой: вместе с
+        записью, время которой наступило, досрочно выдаются остальные записи того же ключа,
+        которые сейчас не проверяются. limit ограничивает число групп.
+        Без phase_key каждая запись - отдельная группа.
+        """
+        now = time.time() if now is None else now
+        groups: List[List[Dict[str, Any]]] = []
+        by_key: Dict[Any, List[Dict[str, Any]]] = {}
+        while limit is None or len(groups) < limit:
+            due_sites = self.pop_due(now, limit=1)
+            if not due_sites:
+                break
+            site = due_sites[0]
+            if self.phase_key is None:
+                groups.append([site])
+                continue
+            key = self._key_of.get(site['id'])
+            group = by_key.get(key)
+            if group is None:
+                group = by_key[key] = [site]
+                groups.append(group)
+            else:
+                group.append(site)
+            for member_id in self._members.get(key, ()):
+                entry = self._entries[member_id]
+                if entry['in_flight']:
+                    continue
+                # Запись проверяется досрочно вместе с группой: следующая проверка
+                # планируется от текущего момента, а ее запись в куче становится устаревшей
+                entry['in_flight'] = True
+                entry['due'] = now
+                group.append(entry['site'])
+        return groups
+
+    def complete(self, site_id, now: Optional[float] = None):
+        """Отмечает завершение проверки и планирует следующую"""
+        now = time.time() if now is None else now
+        entry = self._entries.get(site_id)
+        if entry is None:
+            return
+        entry['in_flight'] = False
+        if self.policy is not None:
+            # Состояние сайта изменилось по итогам проверки - пересчитываем интервал
+            entry['interval'] = self.interval_for(entry['site'], now)
+        # Сохраняем ритм проверок, но не планируем в прошлое, если проверка затянулась
+        previous_due = entry['due'] if entry['due'] is not None else now
+        if self.smoothing:
+            # Следующий слот сетки строго после предыдущего (пропущенные слоты не догоняем)
+            self._push(site_id, self._next_slot(site_id, entry['interval'], max(now, previous_due + 1)))
+        else:
+            self._push(site_id, max(now, previous_due + entry['interval']))
+
+    def seconds_until_next(self, now: Optional[float] = None) -> Optional[float]:
+        """Время до ближайшей проверки (None, если расписание пусто)"""
+        now = time.time() if now is None else now
+        while self._heap:
+            due, _, site_id = self._heap[0]
+            entry = self._entries.get(site_id)
+            if entry is None or entry['in_flight'] or entry['due'] != due:
+                heapq.heappop(self._heap)
+                continue
+            return max(0.0, due - now)
+        return None
+
+    def lag(self, now: Optional[float] = None) -> float:
+        """Насколько опаздывает самая старая ожидающая проверка (0, если отставания нет)"""
+        now = time.time() if now is None else now
+        until_next = self.seconds_until_next(now)
+        if until_next is None or until_next > 0:
+            return 0.0
+        return max(0.0, now - self._heap[0][0])
+
+    def take_lag_stats(self) -> Dict[str, float]:
+        """Статистика лага запуска проверок с момента предыдущего вызова"""
+        stats = {
+            'count': self._lag_count,
+            'avg': self._lag_total / self._lag_count if self._lag_count else 0.0,
+            'max': self._lag_max,
+        }
+        self._lag_count = 0
+        self._lag_total = 0.0
+        self._lag_max = 0.0
+        return stats
+
+    def interval_of(self, site_id) -> Optional[int]:
+        """Текущий интервал проверки сайта в расписании"""
+        entry = self._entries.get(site_id)
+        return entry['interval'] if entry else None
+
+    def in_flight_count(self) -> int:
+        return sum(1 for entry in self._entries.values() if entry['in_flight'])
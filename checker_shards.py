@@ -0,0 +1,143 @@
+"""
+Многопроцессный режим проверок: сайты делятся на шарды по хешу id,
+каждый шард проверяется в отдельном процессе со своим циклом событий.
+
+Процесс бота только запускает процессы-проверяльщики, следит за ними и отправляет
+уведомления, которые процессы передают через общую очередь multiprocessing.
+"""
+
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import queue
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Типы сообщений от процессов-проверяльщиков
+MESSAGE_NOTIFY = 'notify'
+MESSAGE_ADMIN = 'admin'
+
+# Как часто проверять, что процессы-проверяльщики живы (сек)
+SHARD_HEALTH_INTERVAL = 5
+
+
+def shard_of(site_id: Any, shard_count: int) -> int:
+    """
+    Номер шарда сайта.
+    Стабилен между перезапусками процессов (в отличие от встроенного hash()).
+    """
+    if shard_count <= 1:
+        return 0
+    digest = hashlib.md5(str(site_id).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % shard_count
+
+
+def filter_shard(sites: Iterable[Dict[str, Any]], shard: Optional[Tuple[int, int]]) -> List[Dict[str, Any]]:
+    """Оставляет только сайты заданного шарда (index, count); без шарда возвращает все сайты"""
+    if shard is None:
+        return list(sites)
+    index, count = shard
+    return [site for site in sites if shard_of(site.get('id'), count) == index]
+
+
+class ShardNotificationSink:
+    """Передает уведомления из процесса-проверяльщика в процесс бота"""
+
+    def __init__(self, message_queue, shard_index: int):
+        self.queue = message_queue
+        self.shard_index = shard_index
+
+    def notify(self, chat_id: Any, text: str):
+        self.queue.put((MESSAGE_NOTIFY, self.shard_index, chat_id, text))
+
+    def notify_admin(self, text: str):
+        self.queue.put((MESSAGE_ADMIN, self.shard_index, None, text))
+
+
+class CheckerShardPool:
+    """
+    Процессы-проверяльщики на стороне бота.
+
+    target(shard_index, shard_count, message_queue) выполняется в дочернем процессе
+    (метод запуска spawn: дочерний процесс не наследует цикл событий и соединения бота).
+    Упавший процесс перезапускается с тем же номером шарда.
+    """
+
+    def __init__(self, shard_count: int,
+                 target: Callable[[int, int, Any], None],
+                 on_notify: Callable[[Any, str], Awaitable[None]],
+                 on_admin: Callable[[str], Awaitable[None]]):
+        self.shard_count = max(1, shard_count)
+        self.target = target
+        self.on_notify = on_notify
+        self.on_admin = on_admin
+        self._context = multiprocessing.get_context('spawn')
+        self._queue = self._context.Queue()
+        self._processes: Dict[int, Any] = {}
+        self.restarts = 0
+
+    def _start_shard(self, index: int):
+        process = self._context.Process(
+            target=self.target,
+            args=(index, self.shard_count, self._queue),
+            name=f"checker-shard-{index}",
+            daemon=True
+        )
+        process.start()
+        self._processes[index] = process
+        logging.info(f"Запущен процесс проверки шарда {index + 1}/{self.shard_count} (pid {process.pid})")
+
+    def start(self):
+        for index in range(self.shard_count):
+            self._start_shard(index)
+
+    def stop(self):
+        for process in self._processes.values():
+            if process.is_alive():
+                process.terminate()
+        for process in self._processes.values():
+            process.join(timeout=5)
+        self._processes.clear()
+
+    def alive_count(self) -> int:
+        return sum(1 for process in self._processes.values() if process.is_alive())
+
+    async def _check_health(self):
+        for index, process in list(self._processes.items()):
+            if process.is_alive():
+                continue
+            self.restarts += 1
+            error_msg = f"⚠️ Процесс проверки шарда {index + 1}/{self.shard_count} завершился (код {process.exitcode}), перезапуск"
+            logging.error(error_msg)
+            self._start_shard(index)
+            try:
+                await self.on_admin(error_msg)
+            except Exception as e:
+                logging.error(f"Не удалось отправить уведомление о перезапуске шарда: {e}")
+
+    async def _dispatch(self, message: Tuple):
+        kind, shard_index, chat_id, text = message
+        try:
+            if kind == MESSAGE_NOTIFY:
+                await self.on_notify(chat_id, text)
+            elif kind == MESSAGE_ADMIN:
+                await self.on_admin(text)
+            else:
+                logging.warning(f"Неизвестное сообщение от шарда {shard_index}: {kind}")
+        except Exception as e:
+            logging.error(f"Ошибка отправки уведомления от шарда {shard_index}: {e}")
+
+    async def run(self):
+        """Цикл процесса бота: пересылает уведомления шардов и перезапускает упавшие процессы"""
+        loop = asyncio.get_running_loop()
+        next_health_check = loop.time() + SHARD_HEALTH_INTERVAL
+        while True:
+            try:
+                message = await asyncio.to_thread(self._queue.get, True, 1.0)
+            except queue.Empty:
+                message = None
+            if message is not None:
+                await self._dispatch(message)
+            if loop.time() >= next_health_check:
+                await self._check_health()
+                next_health_check = loop.time() + SHARD_HEALTH_INTERVAL
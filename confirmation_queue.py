@@ -0,0 +1,262 @@
+"""
+Неблокирующее подтверждение недоступности сайтов.
+
+Неудачная проверка не держит вызывающий код на время asyncio.sleep между попытками:
+сайт передается в отдельную очередь подтверждения, которая повторяет проверку
+по собственному таймеру, а итоговое решение (доступен/недоступен) передается
+в callback после завершения подтверждения.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+# Решения по результату очередной попытки
+DECISION_UP = 'up'
+DECISION_DOWN = 'down'
+DECISION_RETRY = 'retry'
+DECISION_ALTERNATIVE = 'alternative'
+
+
+class RetryTracker:
+    """
+    Состояние повторных проверок одного сайта.
+    Реализует логику принятия решения из check_site_with_retries, но без ожиданий:
+    вызывающий код сам решает, как и когда выполнить следующую попытку.
+    """
+
+    def __init__(self, url: str, max_attempts: int, retry_interval: int,
+                 dns_error_multiplier: int = 2, enable_alternative: bool = True,
+                 probe_options: Optional[Dict[str, Any]] = None):
+        self.url = url
+        # Аргументы повторных попыток: метод, заголовок страницы, движок проверки сайта и т.п.
+        self.probe_options = probe_options or {}
+        self.max_attempts = max_attempts
+        self.retry_interval = retry_interval
+        self.dns_error_multiplier = dns_error_multiplier
+        self.enable_alternative = enable_alternative
+        self.attempts = 0
+        self.dns_errors_count = 0
+        self.network_unreachable_count = 0
+        self.last_status_code = 0
+        self.last_response_time = 0.0
+        self.last_page_title = None
+        self.last_final_url = url
+        self._result: Optional[Tuple] = None
+
+    def record(self, check_result: Tuple) -> str:
+        """
+        Учитывает результат попытки check_site_availability.
+
+        Returns:
+            str: DECISION_UP, DECISION_DOWN, DECISION_RETRY или DECISION_ALTERNATIVE
+        """
+        is_available, status_code, response_time, page_title, final_url, check_type = check_result
+        self.attempts += 1
+        self.last_status_code = status_code
+        self.last_response_time = response_time
+        self.last_page_title = page_title
+        self.last_final_url = final_url
+
+        # Если сайт доступен (включая TCP-доступность при 403/401), решение принято сразу
+        if is_available:
+            check_info = f" (тип проверки: {check_type})" if check_type != "http" else ""
+            logging.info(f"Сайт {self.url} доступен с попытки {self.attempts} (статус: {status_code}, время: {response_time:.2f}s){check_info}")
+            self._result = (True, status_code, self.attempts, response_time, page_title, final_url)
+            return DECISION_UP
+
+        if status_code == 0 and check_type != "tcp_down":
+            # Это ошибка подключения/DNS (у движка tcp кода ответа нет никогда)
+            self.dns_errors_count += 1
+
+            # Проверяем на ошибку "Network is unreachable" [Errno 101]
+            if "Network is unreachable" in str(page_title) or "[Errno 101]" in str(page_title):
+                self.network_unreachable_count += 1
+                logging.warning(f"Обнаружена ошибка 'Network is unreachable' для {self.url} (попытка {self.attempts})")
+
+                # Если это повторная ошибка сети, прекращаем попытки
+                if self.network_unreachable_count >= 2:
+                    logging.error(f"Сеть недоступна для {self.url}, прекращаем попытки проверки")
+                    self._result = (False, -101, self.attempts, 0.0, "Network is unreachable", self.url)
+                    return DECISION_DOWN
+
+            # Если это DNS-ошибка и у нас еще есть попытки, нужна дополнительная проверка
+            if self.dns_errors_count >= 2 and self.attempts < self.max_attempts and self.enable_alternative:
+                logging.info(f"Обнаружены множественные DNS-ошибки для {self.url}, выполняю альтернативную проверку...")
+                return DECISION_ALTERNATIVE
+
+        return self._retry_or_down()
+
+    def record_alternative(self, alt_available: bool, alt_result: str) -> str:
+        """Учитывает результат альтернативной проверки (после DECISION_ALTERNATIVE)"""
+        if alt_available:
+            logging.info(f"Альтернативная проверка подтвердила доступность {self.url} ({alt_result})")
+            # Возвращаем успешный результат с данными последней проверки
+            self._result = (True, 200, self.attempts, self.last_response_time, self.last_page_title, self.last_final_url)
+            return DECISION_UP
+        logging.warning(f"Альтернативная проверка подтвердила недоступность {self.url} ({alt_result})")
+        return self._retry_or_down()
+
+    def _retry_or_down(self) -> str:
+        if self.attempts < self.max_attempts:
+            logging.info(f"Сайт {self.url} недоступен (статус: {self.last_status_code}), попытка {self.attempts}/{self.max_attempts}, повторная проверка через {self.next_interval()} сек")
+            return DECISION_RETRY
+
+        # Если все попытки неудачны
+        logging.warning(f"Сайт {self.url} недоступен после {self.attempts} попыток (последний статус: {self.last_status_code}, DNS-ошибок: {self.dns_errors_count}, время ответа: {self.last_response_time:.2f}с)")
+        self._result = (False, self.last_status_code, self.attempts, self.last_response_time, self.last_page_title, self.last_final_url)
+        return DECISION_DOWN
+
+    def next_interval(self) -> int:
+        """Интервал до следующей попытки (увеличивается при DNS-ошибках)"""
+        return self.retry_interval * (self.dns_error_multiplier if self.dns_errors_count > 0 else 1)
+
+    def result(self) -> Optional[Tuple]:
+        """
+        Итоговый результат в формате check_site_with_retries:
+        (is_available, status_code, attempts_made, response_time, page_title, final_url)
+        """
+        return self._result
+
+
+class ConfirmationQueue:
+    """
+    Очередь подтверждения недоступности с собственным таймером.
+
+    Сайты с неудачной первой попыткой ставятся в min-heap по времени следующей попытки.
+    Повторные проверки выполняются в фоне с ограничением конкурентности, основной цикл
+    проверок при этом не ждет. По завершении подтверждения вызывается on_complete(site, result).
+    Если defer_func(site) возвращает True (сброс нагрузки), попытка переносится на следующий
+    интервал и не засчитывается.
+    """
+
+    def __init__(self,
+                 probe_func: Callable[[str], Awaitable[Tuple]],
+                 alternative_func: Callable[[str], Awaitable[Tuple[bool, str]]],
+                 on_complete: Callable[[Dict[str, Any], Tuple], Awaitable[None]],
+                 concurrency: int = 10,
+                 defer_func: Optional[Callable[[Dict[str, Any]], bool]] = None):
+        self.probe_func = probe_func
+        self.alternative_func = alternative_func
+        self.on_complete = on_complete
+        self.defer_func = defer_func
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        self._heap = []
+        self._counter = itertools.count()
+        self._pending: Dict[Any, Dict[str, Any]] = {}
+        self._wakeup = asyncio.Event()
+        self._runner: Optional[asyncio.Task] = None
+        self._tasks = set()
+
+    @property
+    def running(self) -> bool:
+        return self._runner is not None and not self._runner.done()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def is_pending(self, key: Any) -> bool:
+        """Находится ли сайт в процессе подтверждения"""
+        return key in self._pending
+
+    def start(self):
+        if not self.running:
+            self._runner = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._runner:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+        for task in list(self._tasks):
+            task.cancel()
+
+    def submit(self, key: Any, site: Dict[str, Any], tracker: RetryTracker, decision: str) -> bool:
+        """
+        Ставит сайт на подтверждение после неудачной попытки.
+
+        Args:
+            key: Ключ сайта (id)
+            site: Запись сайта, передается в on_complete
+            tracker: Состояние попыток после первой проверки
+            decision: Решение после первой попытки (DECISION_RETRY или DECISION_ALTERNATIVE)
+
+        Returns:
+            bool: False, если сайт уже находится на подтверждении
+        """
+        if key in self._pending:
+            return False
+        loop = asyncio.get_running_loop()
+        run_alternative = decision == DECISION_ALTERNATIVE
+        delay = 0 if run_alternative else tracker.next_interval()
+        self._pending[key] = {'site': site, 'tracker': tracker, 'run_alternative': run_alternative}
+        self._schedule(key, loop.time() + delay)
+        return True
+
+    def _schedule(self, key: Any, due: float):
+        heapq.heappush(self._heap, (due, next(self._counter), key))
+        self._wakeup.set()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            while self._heap and self._heap[0][0] <= now:
+                _, _, key = heapq.heappop(self._heap)
+                if key in self._pending:
+                    task = asyncio.create_task(self._confirm(key))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+
+            timeout = self._heap[0][0] - now if self._heap else None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run_alternative(self, tracker: RetryTracker) -> str:
+        try:
+            alt_available, alt_result = await self.alternative_func(tracker.url)
+        except Exception as e:
+            logging.error(f"Ошибка в альтернативной проверке {tracker.url}: {e}")
+            alt_available, alt_result = False, "error"
+        return tracker.record_alternative(alt_available, alt_result)
+
+    async def _confirm(self, key: Any):
+        job = self._pending.get(key)
+        if job is None:
+            return
+        tracker: RetryTracker = job['tracker']
+        if self.defer_func is not None and self.defer_func(job['site']):
+            self._schedule(key, asyncio.get_running_loop().time() + tracker.next_interval())
+            return
+        async with self._semaphore:
+            try:
+                if job['run_alternative']:
+                    job['run_alternative'] = False
+                    decision = await self._run_alternative(tracker)
+                else:
+                    decision = tracker.record(await self.probe_func(tracker.url, **tracker.probe_options))
+                    if decision == DECISION_ALTERNATIVE:
+                        decision = await self._run_alternative(tracker)
+            except Exception as e:
+                # Исключение засчитывается как неудачная попытка, чтобы подтверждение не зациклилось
+                logging.error(f"Ошибка при подтверждении статуса {tracker.url}: {e}")
+                decision = tracker.record((False, 0, 0.0, None, tracker.url, "down"))
+                if decision == DECISION_ALTERNATIVE:
+                    decision = tracker.record_alternative(False, "error")
+
+        if decision == DECISION_RETRY:
+            self._schedule(key, asyncio.get_running_loop().time() + tracker.next_interval())
+            return
+
+        self._pending.pop(key, None)
+        try:
+            await self.on_complete(job['site'], tracker.result())
+        except Exception as e:
+            logging.error(f"Ошибка обработки результата подтверждения для {tracker.url}: {e}", exc_info=True)
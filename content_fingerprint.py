@@ -0,0 +1,95 @@
+"""
+Отпечаток содержимого страницы для обнаружения изменений (дефейс, сломанный деплой).
+
+Хэш считается потоково по частям тела по мере их получения - без второго прохода и
+без буферизации документа. Правила очистки (регулярные выражения) удаляют динамические
+фрагменты (токены CSRF, время генерации, счетчики) до хэширования. Правила применяются
+к строкам, поэтому при их наличии буферизуется только незавершенная строка
+(не больше MAX_PENDING_LINE байт); без правил части хэшируются сразу.
+"""
+
+import hashlib
+import logging
+import re
+from typing import Iterable, List, Optional, Tuple, Union
+
+from bounded_map import BoundedLog
+
+# Наибольшая незавершенная строка; более длинная хэшируется частями (правила внутри нее могут не сработать)
+MAX_PENDING_LINE = 64 * 1024
+
+
+class StripRules:
+    """Скомпилированные правила очистки сайта (колонка content_strip_rules)"""
+
+    def __init__(self, patterns: Iterable[str] = ()):
+        self.patterns: Tuple[str, ...] = ()
+        self._compiled: List['re.Pattern[bytes]'] = []
+        valid = []
+        for pattern in patterns:
+            try:
+                self._compiled.append(re.compile(pattern.encode('utf-8')))
+                valid.append(pattern)
+            except re.error as e:
+                logging.warning(f"Некорректное правило очистки содержимого {pattern!r}: {e}")
+        self.patterns = tuple(valid)
+
+    @classmethod
+    def parse(cls, value: Union[None, str, Iterable[str]]) -> 'StripRules':
+        """Правила из записи сайта: массив строк или текст с правилом на каждой строке"""
+        if not value:
+            return cls()
+        if isinstance(value, str):
+            value = value.splitlines()
+        return cls(pattern for pattern in value if pattern and pattern.strip())
+
+    @property
+    def key(self) -> Tuple[str, ...]:
+        """Ключ для дедупликации проверок: одинаковые правила дают одинаковый отпечаток"""
+        return self.patterns
+
+    def apply(self, line: bytes) -> bytes:
+        for pattern in self._compiled:
+            line = pattern.sub(b'', line)
+        return line
+
+    def __bool__(self):
+        return bool(self._compiled)
+
+
+class ContentFingerprint:
+    """Инкрементальный хэш тела одной проверки"""
+
+    def __init__(self, rules: Optional[StripRules] = None):
+        self.rules = rules or StripRules()
+        self._hash = hashlib.blake2b(digest_size=16)
+        self._pending = b''
+        self.size = 0
+
+    def update(self, chunk: bytes):
+        self.size += len(chunk)
+        if not self.rules:
+            self._hash.update(chunk)
+            return
+        data = self._pending + chunk
+        end = data.rfind(b'\n') + 1
+        if end == 0 and len(data) > MAX_PENDING_LINE:
+            end = len(data)
+        if end:
+            for line in data[:end].splitlines(keepends=True):
+                self._hash.update(self.rules.apply(line))
+        self._pending = data[end:]
+
+    def hexdigest(self) -> str:
+        """Отпечаток прочитанного тела (незавершенная последняя строка учитывается)"""
+        if self._pending:
+            self._hash.update(self.rules.apply(self._pending))
+            self._pending = b''
+        return self._hash.hexdigest()
+
+
+class FingerprintLog(BoundedLog):
+    """
+    Отпечаток последней проверки каждого URL с учетом правил очистки. Как и фазы времени
+    (ProbePhaseLog), передается мимо кортежа результата проверки.
+    """
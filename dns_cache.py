@@ -0,0 +1,206 @@
+"""
+Общий асинхронный DNS-резолвер с кэшем для всех проверок (HTTP через aiohttp, TCP, TLS).
+
+- Положительный кэш хранит адреса столько, сколько разрешает TTL записи (в пределах
+  min_ttl..max_ttl). TTL известен при разрешении через aiodns (c-ares); без aiodns
+  используется loop.getaddrinfo и default_ttl.
+- Отрицательный кэш: несуществующее имя (NXDOMAIN) не запрашивается повторно negative_ttl секунд.
+  Временные ошибки (таймаут, SERVFAIL) не кэшируются.
+- Одновременные запросы одного имени объединяются в один DNS-запрос.
+
+Ошибки разрешения пробрасываются как socket.gaierror, как у системного резолвера.
+"""
+
+import asyncio
+import ipaddress
+import socket
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from aiohttp.abc import AbstractResolver
+
+from bounded_map import BoundedDict
+
+try:
+    import aiodns
+    AIODNS_AVAILABLE = True
+    # Коды c-ares: имя не существует / у имени нет записей запрошенного типа
+    ARES_ENOTFOUND = getattr(aiodns.error, 'ARES_ENOTFOUND', 4)
+    ARES_ENODATA = getattr(aiodns.error, 'ARES_ENODATA', 1)
+except ImportError:
+    aiodns = None
+    AIODNS_AVAILABLE = False
+
+# Адрес хоста: (семейство, IP)
+Address = Tuple[int, str]
+
+
+class DnsEntry:
+    """Запись кэша: адреса или ошибка несуществующего имени и момент устаревания"""
+
+    def __init__(self, addresses: List[Address], expires_at: float, error: Optional[str] = None):
+        self.addresses = addresses
+        self.expires_at = expires_at
+        self.error = error
+
+
+class DnsResolverCache:
+    """Кэширующий резолвер, общий для всех проверок процесса"""
+
+    def __init__(self, default_ttl: float = 300, negative_ttl: float = 60, min_ttl: float = 10,
+                 max_ttl: float = 3600, max_hosts: int = 10000, nameservers: Optional[Sequence[str]] = None,
+                 use_aiodns: bool = True, timeout: float = 5.0, clock: Callable[[], float] = time.monotonic):
+        self.default_ttl = default_ttl
+        self.negative_ttl = negative_ttl
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.nameservers = list(nameservers) if nameservers else None
+        self.use_aiodns = use_aiodns and AIODNS_AVAILABLE
+        self.timeout = timeout
+        self.clock = clock
+        self._entries: Dict[str, DnsEntry] = BoundedDict(max_hosts)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Резолвер c-ares привязан к циклу событий, создается при первом запросе в цикле
+        self._aiodns = None
+        self._loop = None
+        self.hits = 0
+        self.lookups = 0
+        self.negative_hits = 0
+        self.coalesced = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _resolver(self):
+        loop = asyncio.get_running_loop()
+        if self._aiodns is None or self._loop is not loop:
+            self._aiodns = aiodns.DNSResolver(nameservers=self.nameservers, timeout=self.timeout, loop=loop)
+            self._loop = loop
+        return self._aiodns
+
+    async def resolve(self, host: str) -> List[Address]:
+        """Адреса хоста (IPv4, затем IPv6); socket.gaierror, если имя не разрешается"""
+        host = host.lower().rstrip('.')
+        try:
+            ip = ipaddress.ip_address(host)
+            return [(socket.AF_INET6 if ip.version == 6 else socket.AF_INET, host)]
+        except ValueError:
+            pass
+
+        entry = self._entries.get(host)
+        if entry is not None and self.clock() < entry.expires_at:
+            if entry.error is not None:
+                self.negative_hits += 1
+                raise socket.gaierror(socket.EAI_NONAME, entry.error)
+            self.hits += 1
+            return list(entry.addresses)
+
+        # Запрос выполняется отдельной задачей: отмена одного из ожидающих не отменяет его для остальных
+        task = self._inflight.get(host)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(self._lookup(host))
+            self._inflight[host] = task
+            task.add_done_callback(lambda done: self._lookup_done(host, done))
+        return list(await asyncio.shield(task))
+
+    def _lookup_done(self, host: str, task: asyncio.Future):
+        if self._inflight.get(host) is task:
+            del self._inflight[host]
+        # Ошибку получают ожидающие; если все они отменены, она не должна считаться "неполученной"
+        if not task.cancelled():
+            task.exception()
+
+    async def lookup(self, host: str) -> List[Address]:
+        """Запрос к DNS мимо кэша (подтверждение недоступности); результат в кэш не попадает"""
+        host = host.lower().rstrip('.')
+        addresses, _ = await self._query(host)
+        return addresses
+
+    async def _query(self, host: str) -> Tuple[List[Address], float]:
+        if self.use_aiodns and '.' in host:
+            return await self._lookup_aiodns(host)
+        return await self._lookup_system(host)
+
+    async def _lookup(self, host: str) -> List[Address]:
+        self.lookups += 1
+        try:
+            addresses, ttl = await self._query(host)
+        except socket.gaierror as e:
+            if e.errno == socket.EAI_NONAME:
+                self._entries[host] = DnsEntry([], self.clock() + self.negative_ttl, str(e))
+            raise
+        ttl = min(self.max_ttl, max(self.min_ttl, ttl))
+        self._entries[host] = DnsEntry(addresses, self.clock() + ttl)
+        return addresses
+
+    async def _lookup_aiodns(self, host: str) -> Tuple[List[Address], float]:
+        """A и AAAA параллельно; TTL записи - наименьший из ответов"""
+        resolver = self._resolver()
+        answers = await asyncio.gather(resolver.query(host, 'A'), resolver.query(host, 'AAAA'), return_exceptions=True)
+        addresses: List[Address] = []
+        ttls = []
+        not_found = True
+        for family, answer in zip((socket.AF_INET, socket.AF_INET6), answers):
+            if isinstance(answer, aiodns.error.DNSError):
+                code = answer.args[0] if answer.args else None
+                if code not in (ARES_ENOTFOUND, ARES_ENODATA):
+                    not_found = False
+                continue
+            if isinstance(answer, BaseException):
+                raise answer
+            for record in answer:
+                addresses.append((family, record.host))
+                ttls.append(record.ttl)
+        if addresses:
+            return addresses, min(ttls)
+        if not_found:
+            raise socket.gaierror(socket.EAI_NONAME, f"{host}: имя не найдено")
+        raise socket.gaierror(socket.EAI_AGAIN, f"{host}: DNS-сервер не ответил")
+
+    async def _lookup_system(self, host: str) -> Tuple[List[Address], float]:
+        """Системный резолвер в пуле потоков; TTL неизвестен - используется default_ttl"""
+        loop = asyncio.get_running_loop()
+        infos = await asyncio.wait_for(loop.getaddrinfo(host, None, type=socket.SOCK_STREAM), timeout=self.timeout)
+        addresses: List[Address] = []
+        for family, _, _, _, sockaddr in infos:
+            if family in (socket.AF_INET, socket.AF_INET6) and (family, sockaddr[0]) not in addresses:
+                addresses.append((family, sockaddr[0]))
+        addresses.sort(key=lambda address: address[0] != socket.AF_INET)
+        if not addresses:
+            raise socket.gaierror(socket.EAI_NONAME, f"{host}: нет адресов")
+        return addresses, self.default_ttl
+
+    async def getaddrinfo(self, host: str, port: int) -> List[Tuple[int, tuple]]:
+        """Адреса в формате (семейство, sockaddr) для подключения к порту"""
+        return [(family, (ip, port)) for family, ip in await self.resolve(host)]
+
+    def take_stats(self) -> Dict[str, int]:
+        """Статистика с момента предыдущего вызова"""
+        stats = {'hits': self.hits, 'lookups': self.lookups, 'negative_hits': self.negative_hits,
+                 'coalesced': self.coalesced, 'hosts': len(self._entries)}
+        self.hits = self.lookups = self.negative_hits = self.coalesced = 0
+        return stats
+
+    def summary(self) -> str:
+        stats = self.take_stats()
+        return (f"запросов {stats['lookups']}, из кэша {stats['hits']}, NXDOMAIN из кэша {stats['negative_hits']}, "
+                f"объединено {stats['coalesced']}, хостов {stats['hosts']}")
+
+
+class CachedAiohttpResolver(AbstractResolver):
+    """Резолвер TCPConnector поверх DnsResolverCache (кэш самого коннектора отключается)"""
+
+    def __init__(self, cache: DnsResolverCache):
+        self.cache = cache
+
+    async def resolve(self, host: str, port: int = 0, family: int = socket.AF_INET) -> List[Dict[str, Any]]:
+        addresses = await self.cache.resolve(host)
+        if family in (socket.AF_INET, socket.AF_INET6):
+            addresses = [address for address in addresses if address[0] == family] or addresses
+        return [{'hostname': host, 'host': ip, 'port': port, 'family': address_family,
+                 'proto': 0, 'flags': socket.AI_NUMERICHOST} for address_family, ip in addresses]
+
+    async def close(self) -> None:
+        pass
@@ -0,0 +1,313 @@
+"""
+Долгоживущие HTTP-сессии для проверок доступности.
+
+Сессия curl_cffi держит multi-хендл libcurl, пул easy-хендлов, открытые соединения
+и кэш TLS-сессий. Создание сессии на каждую проверку повторяет всю эту подготовку
+и дает шум "Curlm already closed" при закрытии. Пул держит несколько сессий
+на весь срок работы процесса и пересоздает сессию только после ошибки libcurl.
+
+Для проверок через aiohttp используется одна общая сессия с настроенным TCPConnector.
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+
+import aiohttp
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from bounded_map import BoundedDict
+
+# Коды ответа, которыми сервер отклоняет метод HEAD (405 Method Not Allowed, 501 Not Implemented)
+HEAD_REJECTED_STATUSES = {405, 501}
+
+# Коды ошибок libcurl, после которых сессию нельзя использовать дальше
+# (2 - CURLE_FAILED_INIT, 27 - CURLE_OUT_OF_MEMORY, 43 - CURLE_BAD_FUNCTION_ARGUMENT)
+BROKEN_SESSION_CURL_CODES = {2, 27, 43}
+
+
+def is_session_error(error: Exception) -> bool:
+    """Ошибка самой сессии (multi-хендла), а не конкретного запроса"""
+    message = str(error)
+    if "Curlm" in message or "already closed" in message.lower():
+        return True
+    return getattr(error, 'code', None) in BROKEN_SESSION_CURL_CODES
+
+
+async def close_stream(response):
+    """
+    Прерывает потоковый ответ curl_cffi (stream=True): libcurl останавливает передачу
+    на следующей порции данных, после чего хендл возвращается в сессию.
+    """
+    quit_now = getattr(response, 'quit_now', None)
+    if quit_now is not None:
+        quit_now.set()
+    await response.aclose()
+
+
+class CurlSessionPool:
+    """
+    Ограниченный пул сессий curl_cffi с имперсонацией браузера.
+
+    Запросы распределяются по сессиям по кругу; каждая сессия сама ограничивает
+    конкурентность (max_clients easy-хендлов) и переиспользует соединения.
+    Сессии привязаны к циклу событий, поэтому при смене цикла (процесс-проверяльщик,
+    тесты) пул создает их заново. При size=0 сессия создается на каждый запрос.
+    """
+
+    def __init__(self, size: int = 2, max_clients: int = 10, impersonate: str = "chrome120",
+                 session_factory: Optional[Callable[..., Any]] = None, curl_infos: Optional[list] = None):
+        self.size = size
+        self.max_clients = max_clients
+        self.impersonate = impersonate
+        self.session_factory = session_factory
+        # Поля CURLINFO, которые сессия сохраняет в response.infos (тайминги фаз)
+        self.curl_infos = curl_infos or []
+        self._sessions: List[Any] = []
+        self._loop = None
+        self._counter = itertools.count()
+        self.requests = 0
+        self.rebuilds = 0
+
+    def _new_session(self):
+        if self.session_factory is None:
+            from curl_cffi import requests as curl_requests
+            self.session_factory = curl_requests.AsyncSession
+        if self.curl_infos:
+            return self.session_factory(impersonate=self.impersonate, max_clients=self.max_clients,
+                                        curl_infos=self.curl_infos)
+        return self.session_factory(impersonate=self.impersonate, max_clients=self.max_clients)
+
+    def _session(self, index: int):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Сессии прежнего цикла событий закрыть из нового цикла нельзя - просто забываем их
+            self._loop = loop
+            self._sessions = [None] * self.size
+        if self._sessions[index] is None:
+            self._sessions[index] = self._new_session()
+        return self._sessions[index]
+
+    async def _close_session(self, session):
+        try:
+            await session.close()
+        except Exception as close_error:
+            logging.debug(f"Ошибка при закрытии сессии curl_cffi: {close_error}")
+
+    async def request(self, method: str, url: str, **kwargs):
+        """Выполняет запрос через одну из сессий пула"""
+        self.requests += 1
+        if self.size <= 0:
+            session = self._new_session()
+            try:
+                response = await session.request(method, url, **kwargs)
+            except Exception:
+                await self._close_session(session)
+                raise
+            stream_task = getattr(response, 'stream_task', None)
+            if stream_task is not None and not stream_task.done():
+                # Потоковый ответ: сессию можно закрыть только после окончания передачи
+                stream_task.add_done_callback(lambda _: asyncio.ensure_future(self._close_session(session)))
+            else:
+                await self._close_session(session)
+            return response
+
+        index = next(self._counter) % self.size
+        session = self._session(index)
+        try:
+            return await session.request(method, url, **kwargs)
+        except Exception as e:
+            if is_session_error(e):
+                await self.reset(index, session, e)
+            raise
+
+    async def get(self, url: str, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    async def reset(self, index: int, session, error: Exception = None):
+        """Пересоздает сессию после ошибки libcurl (новая сессия создается при следующем запросе)"""
+        if index < len(self._sessions) and self._sessions[index] is session:
+            self._sessions[index] = None
+            self.rebuilds += 1
+            logging.warning(f"Сессия curl_cffi #{index} пересоздается после ошибки: {error}")
+            await self._close_session(session)
+
+    async def close(self):
+        """Закрывает все сессии (при остановке)"""
+        if self._loop is not asyncio.get_running_loop():
+            self._sessions = []
+            return
+        sessions = [session for session in self._sessions if session is not None]
+        self._sessions = [None] * self.size
+        for session in sessions:
+            await self._close_session(session)
+
+
+class AiohttpSessionManager:
+    """
+    Общая сессия aiohttp для всех проверок через aiohttp (fallback без curl_cffi и check_site).
+
+    TCPConnector ограничивает число соединений (limit, limit_per_host), держит keep-alive
+    между циклами и кэширует DNS (ttl_dns_cache), поэтому повторная проверка сайта не
+    повторяет DNS-запрос и TCP/TLS-рукопожатие. Заголовки и таймауты передаются в запросе.
+    С resolver (dns_cache.CachedAiohttpResolver) имена разрешаются через общий кэш с TTL
+    записей, собственный кэш коннектора отключается.
+    """
+
+    def __init__(self, limit: int = 100, limit_per_host: int = 4, ttl_dns_cache: int = 300,
+                 keepalive_timeout: float = 30, trace_configs: Optional[list] = None, resolver=None):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.ttl_dns_cache = ttl_dns_cache
+        self.keepalive_timeout = keepalive_timeout
+        self.trace_configs = trace_configs
+        self.resolver = resolver
+        self._session = None
+        self._loop = None
+        self.requests = 0
+
+    @property
+    def active(self) -> bool:
+        return self._session is not None and not self._session.closed
+
+    def session(self):
+        """Сессия текущего цикла событий (создается при первом обращении)"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.ttl_dns_cache,
+                use_dns_cache=self.resolver is None,
+                resolver=self.resolver,
+                keepalive_timeout=self.keepalive_timeout
+            )
+            self._session = aiohttp.ClientSession(connector=connector, trace_configs=self.trace_configs)
+            self._loop = loop
+        return self._session
+
+    def request(self, method: str, url: str, **kwargs):
+        """Запрос через общую сессию (использовать как async with)"""
+        self.requests += 1
+        return self.session().request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def stats(self) -> dict:
+        """Состояние пула соединений"""
+        if not self.active:
+            return {'requests': self.requests, 'in_use': 0, 'idle': 0, 'dns_cached_hosts': 0}
+        connector = self._session.connector
+        # Внутренние структуры TCPConnector: занятые и свободные соединения, кэш DNS
+        in_use = len(getattr(connector, '_acquired', ()))
+        idle = sum(len(conns) for conns in getattr(connector, '_conns', {}).values())
+        if self.resolver is not None:
+            dns_cached_hosts = len(getattr(self.resolver, 'cache', ()))
+        else:
+            dns_cache = getattr(connector, '_cached_hosts', None)
+            dns_cached_hosts = len(getattr(dns_cache, '_addrs_rrobin', {})) if dns_cache is not None else 0
+        return {'requests': self.requests, 'in_use': in_use, 'idle': idle, 'dns_cached_hosts': dns_cached_hosts}
+
+    def summary(self) -> str:
+        stats = self.stats()
+        return (f"запросов {stats['requests']}, соединений занято {stats['in_use']}, "
+                f"свободно {stats['idle']}, хостов в кэше DNS {stats['dns_cached_hosts']}")
+
+    async def close(self):
+        """Закрывает общую сессию (при остановке)"""
+        if self.active and self._loop is asyncio.get_running_loop():
+            await self._session.close()
+        self._session = None
+
+
+class ProbeMethodMemory:
+    """
+    Метод HTTP, которым удалось проверить хост.
+
+    Хосты, отклонившие HEAD (HEAD_REJECTED_STATUSES), проверяются через GET; через ttl секунд
+    HEAD пробуется снова (сервер могли перенастроить). Запись о хосте обновляется при
+    каждой успешной проверке, самые старые записи вытесняются при превышении max_hosts.
+    """
+
+    def __init__(self, ttl: float = 86400, max_hosts: int = 10000, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self._methods: Dict[str, Tuple[str, float]] = BoundedDict(max_hosts)
+
+    def method_for(self, host: str, preferred: str = 'HEAD') -> str:
+        """Метод для проверки хоста: запомненный GET, если хост отклонял HEAD, иначе preferred"""
+        remembered = self._methods.get(host)
+        if remembered is None:
+            return preferred
+        method, remembered_at = remembered
+        if method == 'GET' and self.clock() - remembered_at >= self.ttl:
+            del self._methods[host]
+            return preferred
+        return method
+
+    def remember(self, host: str, method: str):
+        """Запоминает метод, которым хост был успешно проверен"""
+        previous = self._methods.get(host)
+        if previous is None or previous[0] != method:
+            logging.debug(f"Метод проверки хоста {host}: {method}")
+        self._methods[host] = (method, self.clock())
+
+    def stats(self) -> Dict[str, int]:
+        methods = [method for method, _ in self._methods.values()]
+        return {'head': methods.count('HEAD'), 'get': methods.count('GET')}
+
+
+class ValidatorCache:
+    """
+    Валидаторы ответа (ETag, Last-Modified) и результат последней полной загрузки страницы.
+
+    Для URL с сохраненными валидаторами проверка отправляет If-None-Match / If-Modified-Since;
+    ответ 304 означает, что страница не изменилась, и заголовок берется из сохраненной записи
+    без загрузки тела. Страницы без валидаторов не сохраняются.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self._entries: Dict[str, Dict[str, Any]] = BoundedDict(max_entries)
+        self.not_modified = 0
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """Сохраненная запись URL или None"""
+        return self._entries.get(key)
+
+    @staticmethod
+    def request_headers(entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        """Заголовки условного запроса по записи (пустые, если записи нет)"""
+        headers = {}
+        if entry is not None:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store(self, key: str, response_headers, status_code: int, page_title: Optional[str], final_url: str):
+        """Сохраняет валидаторы и результат ответа с телом (2xx)"""
+        etag = response_headers.get('ETag')
+        last_modified = response_headers.get('Last-Modified')
+        self._entries.pop(key, None)
+        if not etag and not last_modified:
+            return
+        self._entries[key] = {
+            'etag': etag,
+            'last_modified': last_modified,
+            'status_code': status_code,
+            'page_title': page_title,
+            'final_url': final_url,
+        }
+
+    def record_not_modified(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Учитывает ответ 304 и возвращает сохраненную запись"""
+        self.not_modified += 1
+        return entry
+
+    def take_not_modified(self) -> int:
+        """Число ответов 304 с момента предыдущего вызова"""
+        count, self.not_modified = self.not_modified, 0
+        return count
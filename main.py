@@ -1,13 +1,10 @@
 import asyncio
-import aiohttp
+import importlib.util
 import logging
 import idna  # для работы с Punycode
-import ssl
 import socket
-import OpenSSL
 import os
 import time
-import re
 import sys
 from datetime import datetime, timedelta, timezone
 from dateutil.relativedelta import relativedelta
@@ -25,6 +22,22 @@ from urllib.parse import urlparse
 import whois_integration  # Импортируем модуль WHOIS интеграции
 from whois_watchdog import get_whois_expiry_date, extract_domain_from_url  # Импортируем функцию для получения WHOIS данных и извлечения домена
 from utils import safe_supabase_operation, send_admin_notification  # Импортируем общие функции
+from check_pool import CheckWorkerPool, CycleStats  # Пул воркеров для параллельной проверки сайтов
+from check_scheduler import SiteScheduler, AdaptiveIntervalPolicy, LoadShedder  # Планировщик проверок с индивидуальными интервалами
+from checker_shards import CheckerShardPool, ShardNotificationSink, filter_shard  # Многопроцессный режим проверок
+from site_registry import SiteRegistry  # Реестр сайтов с инкрементальной синхронизацией
+from shard_leases import ShardLeaseManager, SupabaseLeaseStore  # Аренда шардов для нескольких узлов проверки
+from probe_coalescer import ProbeCoalescer, ProbeGroup, group_sites, normalize_url  # Дедупликация проверок одного URL
+from body_reader import BodyLimits  # Жесткие лимиты тела ответа
+from cert_cache import CertificateCache  # Кэш SSL-сертификатов по сроку действия
+from dns_cache import AIODNS_AVAILABLE, CachedAiohttpResolver, DnsResolverCache  # Общий DNS-кэш с TTL записей
+from net_probes import FAILURE_DNS, confirm_host, PeerCertificateLog, tcp_probe, tls_probe  # Неблокирующие TCP- и TLS-проверки
+from content_fingerprint import ContentFingerprint, FingerprintLog, StripRules  # Отпечаток содержимого страницы
+from probe_timings import CURL_TIMING_INFOS, ProbePhaseLog, aiohttp_trace_config  # Фазы времени проверки
+from probe_engines import AdaptiveProbeEngine, AiohttpProbeEngine, CurlProbeEngine, ImpersonationPins, ProbeEngineRegistry, TcpProbeEngine  # Движки проверки
+from confirmation_queue import (  # Неблокирующее подтверждение недоступности
+    ConfirmationQueue, RetryTracker, DECISION_UP, DECISION_DOWN, DECISION_ALTERNATIVE
+)
 
 # Исправление для Windows Proactor event loop предупреждения
 if sys.platform == "win32":
@@ -34,12 +47,12 @@ if sys.platform == "win32":
 import warnings
 warnings.filterwarnings("ignore", message=".*Curlm alread closed.*", module="curl_cffi")
 
-try:
-    from curl_cffi import requests as curl_requests
-    CURL_CFFI_AVAILABLE = True
-except ImportError:
+# Сам curl_cffi импортирует пул сессий (http_sessions), здесь только проверяется, что он установлен
+CURL_CFFI_AVAILABLE = importlib.util.find_spec('curl_cffi') is not None
+if not CURL_CFFI_AVAILABLE:
     logging.warning("curl_cffi не установлен, будет использоваться aiohttp")
-    CURL_CFFI_AVAILABLE = False
+
+from http_sessions import CurlSessionPool, AiohttpSessionManager, ProbeMethodMemory, ValidatorCache  # Долгоживущие HTTP-сессии для проверок
 
 # Загружаем переменные окружения из .env файла
 load_dotenv()
@@ -94,6 +107,120 @@ DOWN_CHECK_ATTEMPTS = int(os.getenv('DOWN_CHECK_ATTEMPTS', '3'))  # Количе
 DOWN_CHECK_INTERVAL = int(os.getenv('DOWN_CHECK_INTERVAL', '10'))  # Интервал между попытками в секундах
 DNS_ERROR_MULTIPLIER = int(os.getenv('DNS_ERROR_MULTIPLIER', '2'))  # Множитель интервала при DNS-ошибках
 ENABLE_ALTERNATIVE_CHECK = os.getenv('ENABLE_ALTERNATIVE_CHECK', 'True') == 'True'  # Включить альтернативные проверки
+# Альтернативная проверка при DNS-ошибках: разрешение имени через системный резолвер и эти DNS-серверы
+# (нужен aiodns), затем TCP-подключение к портам 80/443
+ALTERNATIVE_DNS_SERVERS = [ns.strip() for ns in os.getenv('ALTERNATIVE_DNS_SERVERS', '1.1.1.1,8.8.8.8').split(',') if ns.strip()]
+ALTERNATIVE_CHECK_TIMEOUT = int(os.getenv('ALTERNATIVE_CHECK_TIMEOUT', '10'))  # Общий таймаут альтернативной проверки (сек)
+# Неблокирующее подтверждение: повторные попытки выполняются в отдельной очереди, цикл проверок не ждет
+NON_BLOCKING_CONFIRMATION = os.getenv('NON_BLOCKING_CONFIRMATION', 'False') == 'True'
+CONFIRMATION_CONCURRENCY = int(os.getenv('CONFIRMATION_CONCURRENCY', '10'))  # Лимит одновременных повторных проверок
+
+# Режим выполнения проверок: sequential - по одному сайту, pool - параллельно через пул воркеров,
+# priority - планировщик с индивидуальным интервалом каждого сайта (колонка check_interval)
+CHECK_EXECUTION_MODE = os.getenv('CHECK_EXECUTION_MODE', 'sequential')
+# Индивидуальные интервалы проверки из колонки check_interval (требует add_check_interval_column.sql).
+# Без них все сайты проверяются с интервалом CHECK_INTERVAL, в том числе в режиме priority
+ENABLE_SITE_INTERVALS = os.getenv('ENABLE_SITE_INTERVALS', 'False') == 'True'
+CHECK_CONCURRENCY = int(os.getenv('CHECK_CONCURRENCY', '20'))  # Глобальный лимит одновременных проверок
+CHECK_PER_HOST_LIMIT = int(os.getenv('CHECK_PER_HOST_LIMIT', '2'))  # Лимит одновременных проверок одного хоста
+# Как часто планировщик перечитывает список сайтов. Без ENABLE_SITE_REGISTRY каждое обновление - полная
+# выборка таблицы (при 60 с это в 5 раз чаще, чем цикл раз в CHECK_INTERVAL); с реестром - инкрементальная
+SITES_REFRESH_INTERVAL = int(os.getenv('SITES_REFRESH_INTERVAL', '60'))
+# Сглаживание нагрузки: проверки каждого сайта равномерно распределяются по его интервалу
+# со стабильным сдвигом фазы (работает в режиме priority)
+CHECK_SMOOTHING = os.getenv('CHECK_SMOOTHING', 'False') == 'True'
+# Адаптивная частота проверок (режим priority): чаще для недоступных, недавно менявших статус
+# и замедлившихся сайтов, реже для стабильных - в пределах ADAPTIVE_MIN_INTERVAL..ADAPTIVE_MAX_INTERVAL
+ADAPTIVE_INTERVALS = os.getenv('ADAPTIVE_INTERVALS', 'False') == 'True'
+ADAPTIVE_MIN_INTERVAL = int(os.getenv('ADAPTIVE_MIN_INTERVAL', '60'))  # Нижняя граница интервала (сек)
+ADAPTIVE_MAX_INTERVAL = int(os.getenv('ADAPTIVE_MAX_INTERVAL', '3600'))  # Верхняя граница интервала (сек)
+ADAPTIVE_STABLE_AFTER = int(os.getenv('ADAPTIVE_STABLE_AFTER', '86400'))  # Через сколько секунд без смены статуса сайт считается стабильным
+# Сброс нагрузки при отставании от расписания: сначала откладываются резервные домены,
+# затем не обновляются заголовок и SSL, затем откладываются сайты с длинным интервалом
+ENABLE_LOAD_SHEDDING = os.getenv('ENABLE_LOAD_SHEDDING', 'False') == 'True'
+LOAD_SHED_LAG = int(os.getenv('LOAD_SHED_LAG', '30'))  # Лаг (сек), с которого начинается сброс; уровни - 1x, 2x, 4x
+LOAD_SHED_SLOW_INTERVAL = int(os.getenv('LOAD_SHED_SLOW_INTERVAL', '900'))  # Сайты с интервалом от этого значения считаются низкоприоритетными
+# Пул долгоживущих сессий curl_cffi: соединения и TLS-сессии переиспользуются между проверками.
+# 0 - новая сессия на каждую проверку (прежнее поведение)
+CURL_SESSION_POOL_SIZE = int(os.getenv('CURL_SESSION_POOL_SIZE', '2'))
+CURL_SESSION_MAX_CLIENTS = int(os.getenv('CURL_SESSION_MAX_CLIENTS', '10'))  # Одновременных запросов на сессию
+# Сколько байт тела страницы читать в поисках <title>; остаток ответа не загружается
+TITLE_READ_LIMIT = int(os.getenv('TITLE_READ_LIMIT', '65536'))
+# Жесткие лимиты тела одной проверки: загрузка прерывается, сайт считается доступным с обрезанным телом
+PROBE_MAX_DOWNLOAD_BYTES = int(os.getenv('PROBE_MAX_DOWNLOAD_BYTES', '1048576'))  # Байт из сети (до распаковки)
+PROBE_MAX_DECOMPRESSED_BYTES = int(os.getenv('PROBE_MAX_DECOMPRESSED_BYTES', '4194304'))  # Байт после распаковки
+# Общий таймаут TCP-проверки (разрешение имени и подключение ко всем адресам хоста)
+TCP_CHECK_TIMEOUT = float(os.getenv('TCP_CHECK_TIMEOUT', '5'))
+# Метод проверки по умолчанию для сайтов без probe_method: get - GET с отслеживанием заголовка,
+# head - HEAD без загрузки тела (GET только если сервер отклоняет HEAD)
+PROBE_METHOD_DEFAULT = os.getenv('PROBE_METHOD_DEFAULT', 'get').lower()
+# Метод проверки для каждого сайта из колонки probe_method (требует add_probe_method_column.sql)
+ENABLE_SITE_PROBE_METHOD = os.getenv('ENABLE_SITE_PROBE_METHOD', 'False') == 'True'
+PROBE_METHOD_MEMORY_TTL = int(os.getenv('PROBE_METHOD_MEMORY_TTL', '86400'))  # Через сколько секунд снова пробовать HEAD
+# Условные запросы (If-None-Match / If-Modified-Since): неизменившаяся страница не загружается повторно
+CONDITIONAL_REQUESTS = os.getenv('CONDITIONAL_REQUESTS', 'True') == 'True'
+# Движок проверки по умолчанию для сайтов без probe_engine: auto (aiohttp, имперсонация браузера
+# только для хостов с защитой от ботов), curl (всегда имперсонация), aiohttp или tcp
+PROBE_ENGINE_DEFAULT = os.getenv('PROBE_ENGINE_DEFAULT', 'auto').lower()
+# Движок проверки для каждого сайта из колонки probe_engine (требует add_probe_engine_column.sql)
+ENABLE_SITE_PROBE_ENGINE = os.getenv('ENABLE_SITE_PROBE_ENGINE', 'False') == 'True'
+# Отпечаток содержимого страницы для сайтов с content_fingerprint (требует add_content_fingerprint_columns.sql)
+ENABLE_CONTENT_FINGERPRINT = os.getenv('ENABLE_CONTENT_FINGERPRINT', 'False') == 'True'
+# Запись фаз времени ответа в колонку response_phases (требует add_response_phases_column.sql)
+ENABLE_RESPONSE_PHASES = os.getenv('ENABLE_RESPONSE_PHASES', 'False') == 'True'
+# Через сколько секунд хост, закрепленный за имперсонацией, снова проверяется обычным клиентом
+IMPERSONATION_PIN_TTL = int(os.getenv('IMPERSONATION_PIN_TTL', '21600'))
+# Общая сессия aiohttp для проверок без curl_cffi: пул соединений с keep-alive и кэшем DNS
+AIOHTTP_POOL_LIMIT = int(os.getenv('AIOHTTP_POOL_LIMIT', '100'))  # Всего соединений
+AIOHTTP_POOL_LIMIT_PER_HOST = int(os.getenv('AIOHTTP_POOL_LIMIT_PER_HOST', '4'))  # Соединений к одному хосту
+AIOHTTP_DNS_CACHE_TTL = int(os.getenv('AIOHTTP_DNS_CACHE_TTL', '300'))  # Время жизни кэша DNS (сек)
+# Общий DNS-кэш проверок aiohttp, TCP и TLS: адреса живут по TTL записи (с aiodns), иначе DNS_CACHE_DEFAULT_TTL
+DNS_CACHE_DEFAULT_TTL = int(os.getenv('DNS_CACHE_DEFAULT_TTL', str(AIOHTTP_DNS_CACHE_TTL)))
+DNS_CACHE_MAX_TTL = int(os.getenv('DNS_CACHE_MAX_TTL', '3600'))  # Верхняя граница TTL записи (сек)
+DNS_NEGATIVE_TTL = int(os.getenv('DNS_NEGATIVE_TTL', '60'))  # Сколько секунд помнить несуществующее имя (NXDOMAIN)
+DNS_NAMESERVERS = [ns.strip() for ns in os.getenv('DNS_NAMESERVERS', '').split(',') if ns.strip()]  # Пусто - системные
+# Дедупликация: записи с одинаковым URL (разные чаты, дубликаты) проверяются одним запросом,
+# результат раздается всем записям. TTL должен быть меньше минимального интервала проверки
+PROBE_DEDUP = os.getenv('PROBE_DEDUP', 'False') == 'True'
+PROBE_DEDUP_TTL = int(os.getenv('PROBE_DEDUP_TTL', '30'))  # Сколько секунд переиспользуется результат проверки URL
+
+# Реестр сайтов в памяти с инкрементальной синхронизацией (требует add_check_interval_column.sql
+# и add_sites_updated_at.sql).
+# Включается значением ENABLE_SITE_REGISTRY=True (с заглавной буквы, как остальные флаги)
+ENABLE_SITE_REGISTRY = os.getenv('ENABLE_SITE_REGISTRY', 'False') == 'True'
+SITE_REGISTRY_FULL_RESYNC = int(os.getenv('SITE_REGISTRY_FULL_RESYNC', '3600'))  # Полная сверка реестра с БД (сек)
+
+# Многопроцессный режим: число процессов-проверяльщиков, каждый проверяет свой шард сайтов
+# (по хешу id). Процесс бота только пересылает уведомления. 0 - проверки в процессе бота
+CHECKER_PROCESSES = int(os.getenv('CHECKER_PROCESSES', '0'))
+
+# Несколько узлов проверки: узел проверяет только арендованные шарды сайтов (требует add_checker_leases.sql).
+# Telegram-поллинг и уведомления о сроках ведет один узел - владелец аренды поллинга
+ENABLE_SHARD_LEASES = os.getenv('ENABLE_SHARD_LEASES', 'False') == 'True'
+CHECKER_NODE_ID = os.getenv('CHECKER_NODE_ID') or f"{socket.gethostname()}-{os.getpid()}"  # Уникальный id узла
+LEASE_SHARD_COUNT = int(os.getenv('LEASE_SHARD_COUNT', '64'))  # Число шардов (одинаковое на всех узлах)
+LEASE_TTL = int(os.getenv('LEASE_TTL', '30'))  # Срок аренды (сек): через столько шарды упавшего узла переходят другим
+LEASE_RENEW_INTERVAL = int(os.getenv('LEASE_RENEW_INTERVAL', '10'))  # Интервал продления аренды (сек)
+
+# Состояние процесса-проверяльщика (задается в run_checker_shard, в процессе бота - None)
+CHECKER_SHARD = None  # (номер шарда, число шардов)
+SHARD_NOTIFICATION_SINK = None  # Очередь уведомлений в процесс бота
+SHARD_LEASES = None  # Аренда шардов узлом (ShardLeaseManager при ENABLE_SHARD_LEASES)
+
+# Поля сайта, необходимые для проверки доступности. Колонки из миграций выбираются только при
+# включенной функции, поэтому без миграций проверки работают как раньше
+# (check_interval - порядок проверок и сброс нагрузки в цикле)
+SITE_CHECK_FIELDS = 'id, url, original_url, chat_id, is_up, has_ssl, ssl_expires_at, is_reserve_domain, status_code, response_time, avg_response_time, page_title, final_url, total_checks, successful_checks'
+if ENABLE_SITE_PROBE_METHOD:
+    SITE_CHECK_FIELDS += ', probe_method'
+if ENABLE_SITE_PROBE_ENGINE:
+    SITE_CHECK_FIELDS += ', probe_engine'
+if ENABLE_CONTENT_FINGERPRINT:
+    SITE_CHECK_FIELDS += ', content_fingerprint, content_strip_rules, content_hash'
+if ENABLE_SITE_INTERVALS:
+    SITE_CHECK_FIELDS += ', check_interval'
+SCHEDULER_SITE_FIELDS = f"{SITE_CHECK_FIELDS}, last_check, last_status_change"
+REGISTRY_SITE_FIELDS = f"{SCHEDULER_SITE_FIELDS}, updated_at"
 
 
 
@@ -114,6 +241,11 @@ async def send_notification(chat_id: int, text: str):
     Отправляет уведомление либо в исходный чат, либо админу,
     в зависимости от настройки ONLY_ADMIN_PUSH.
     """
+    # В процессе-проверяльщике уведомление отправляет процесс бота
+    if SHARD_NOTIFICATION_SINK is not None:
+        SHARD_NOTIFICATION_SINK.notify(chat_id, text)
+        return
+
     target_chat_id = ADMIN_CHAT_ID if ONLY_ADMIN_PUSH else chat_id
     
     # Если отправляем админу, добавим информацию об исходном чате для ясности
@@ -129,6 +261,19 @@ async def send_notification(chat_id: int, text: str):
     except Exception as e:
         logging.error(f"Ошибка отправки уведомления в чат {target_chat_id}: {e}")
 
+async def notify_admin(text: str):
+    """Уведомление администратору из цикла проверок (в процессе-проверяльщике - через процесс бота)"""
+    if SHARD_NOTIFICATION_SINK is not None:
+        SHARD_NOTIFICATION_SINK.notify_admin(text)
+        return
+    await send_admin_notification(text)
+
+def shard_sites(sites):
+    """Сайты, которые проверяет этот процесс: арендованные шарды узла или шард процесса"""
+    if SHARD_LEASES is not None and SHARD_LEASES.claim_shards:
+        return SHARD_LEASES.filter_sites(sites)
+    return filter_shard(sites, CHECKER_SHARD)
+
 async def safe_send_message(chat_id: int, text: str, parse_mode: str = None, max_retries: int = 3):
     """Безопасная отправка сообщения с retry механизмом"""
     for attempt in range(max_retries):
@@ -354,51 +499,44 @@ def extract_domain_from_url(url):
 
 # Функция проверки SSL сертификата
 async def check_ssl_certificate(url):
+    """
+    Сведения о SSL-сертификате сайта (порт 443).
+    Сертификат берется из кэша (CERTIFICATE_CACHE), пока не подошел срок повторной проверки
+    и проверка не получила от сервера другой сертификат. Иначе используется сертификат из
+    TLS-соединения только что выполненной HTTP-проверки (PEER_CERTIFICATES), а если его нет -
+    отдельное неблокирующее TLS-подключение (net_probes.tls_probe).
+    """
     try:
         # Извлекаем домен из URL
-        protocol_end = url.find('://')
-        if protocol_end != -1:
-            remaining = url[protocol_end + 3:]
-            path_start = remaining.find('/')
-            if path_start != -1:
-                domain = remaining[:path_start]
+        domain = urlparse(url if '://' in url else f"https://{url}").hostname
+
+        peer = PEER_CERTIFICATES.get(domain, 443)
+        info = CERTIFICATE_CACHE.get(domain, 443, fingerprint=peer.fingerprint if peer is not None else None)
+        if info is None:
+            if peer is not None:
+                logging.debug(f"SSL сертификат для {domain} взят из соединения HTTP-проверки")
+                info = peer
             else:
-                domain = remaining
-
-        logging.debug(f"Начинаю проверку SSL сертификата для домена: {domain}")
-        
-        # Создаем контекст SSL
-        context = ssl.create_default_context()
+                logging.debug(f"Начинаю проверку SSL сертификата для домена: {domain}")
+                info = await tls_probe(domain, 443, timeout=10, resolver=DNS_CACHE)
+            if CERTIFICATE_CACHE.store(domain, 443, info):
+                logging.info(f"SSL сертификат {domain} сменился: издатель={info.issuer}, действует до {info.not_after:%d.%m.%Y}")
 
-        # Устанавливаем соединение с таймаутом
-        with socket.create_connection((domain, 443), timeout=10) as sock:
-            with context.wrap_socket(sock, server_hostname=domain) as ssock:
-                cert = ssock.getpeercert(binary_form=True)
-                x509 = OpenSSL.crypto.load_certificate(OpenSSL.crypto.FILETYPE_ASN1, cert)
+        days_left = info.days_left()
+        logging.debug(f"SSL сертификат для {domain}: издатель={info.issuer}, субъект={info.subject}, дней до истечения={days_left}")
 
-                # Получаем срок действия сертификата
-                expiry_date = datetime.strptime(x509.get_notAfter().decode('ascii'), '%Y%m%d%H%M%SZ')
-                # FIX: Make expiry_date timezone-aware (UTC)
-                expiry_date = expiry_date.replace(tzinfo=timezone.utc)
-                issuer = dict(x509.get_issuer().get_components())
-                issuer_name = issuer.get(b'CN', b'Unknown').decode('utf-8')
-                subject = dict(x509.get_subject().get_components())
-                subject_name = subject.get(b'CN', b'Unknown').decode('utf-8')
-
-                days_left = (expiry_date - datetime.now(timezone.utc)).days
-                
-                logging.debug(f"SSL сертификат для {domain}: издатель={issuer_name}, субъект={subject_name}, дней до истечения={days_left}")
-
-                return {
-                    'has_ssl': True,
-                    'expiry_date': expiry_date,
-                    'days_left': days_left,
-                    'issuer': issuer_name,
-                    'subject': subject_name,
-                    'expires_soon': days_left <= SSL_WARNING_DAYS,
-                    'expired': days_left <= 0
-                }
-    except socket.timeout as e:
+        return {
+            'has_ssl': True,
+            'expiry_date': info.not_after,
+            'days_left': days_left,
+            'issuer': info.issuer,
+            'subject': info.subject,
+            'sans': info.sans,
+            'fingerprint': info.fingerprint,
+            'expires_soon': days_left <= SSL_WARNING_DAYS,
+            'expired': days_left <= 0
+        }
+    except asyncio.TimeoutError as e:
         logging.warning(f"Таймаут при проверке SSL сертификата для {url}: {e}")
         return {
             'has_ssl': False,
@@ -1802,156 +1940,62 @@ async def handle_group_mention(message: Message):
 # Функция проверки доступности сайта
 async def check_site(url):
     """
-    Улучшенная функция проверки доступности сайта с расширенной диагностикой.
+    Проверка доступности сайта движком aiohttp (без TCP-проверки и повторных попыток).
     
     Returns:
         tuple: (is_available, status_code, response_time, page_title, final_url)
     """
-    import time
     start_time = time.time()
-    
     try:
-        # Настраиваем ClientSession с custom User-Agent и поддержкой редиректов
-        headers = {
-            'User-Agent': 'vokforever_site_monitor_bot'
-        }
-        
-        logging.debug(f"Начинаю запрос к {url}")
-        
-        # Устанавливаем жесткий таймаут в 30 секунд для всех сетевых операций
-        timeout = aiohttp.ClientTimeout(total=30, connect=10)
-        async with aiohttp.ClientSession(headers=headers, timeout=timeout) as session:
-            # allow_redirects=True по умолчанию, max_redirects=10 по умолчанию
-            # Устанавливаем max_redirects=7 как у конкурента
-            async with session.get(url, allow_redirects=True, max_redirects=7) as response:
-                # Замеряем время ответа
-                response_time = time.time() - start_time
-                
-                # Получаем финальный URL после редиректов
-                final_url = str(response.url)
-                
-                logging.debug(f"Ответ от {url}: статус={response.status}, время={response_time:.2f}с, финальный_url={final_url}")
-                
-                # Получаем заголовок страницы с таймаутом
-                page_title = None
-                if response.status < 400:
-                    try:
-                        # Устанавливаем таймаут на чтение контента
-                        html_content = await asyncio.wait_for(response.text(), timeout=10)
-                        # Простой парсинг заголовка из HTML
-                        import re
-                        title_match = re.search(r'<title[^>]*>([^<]+)</title>', html_content, re.IGNORECASE)
-                        if title_match:
-                            page_title = title_match.group(1).strip()
-                        logging.debug(f"Заголовок страницы {url}: {page_title}")
-                    except asyncio.TimeoutError:
-                        logging.warning(f"Таймаут при получении контента для {url}")
-                    except Exception as title_error:
-                        logging.debug(f"Не удалось извлечь заголовок для {url}: {title_error}")
-                
-                is_available = response.status < 400
-                return is_available, response.status, response_time, page_title, final_url
-               
+        result = await PROBE_ENGINES.get('aiohttp').probe(url)
+        return result.status_code < 400, result.status_code, result.response_time, result.page_title, result.final_url
     except asyncio.TimeoutError:
-        total_time = time.time() - start_time
-        logging.warning(f"Таймаут при проверке {url} (общее время: {total_time:.2f}с)")
+        logging.warning(f"Таймаут при проверке {url} (общее время: {time.time() - start_time:.2f}с)")
         return False, 0, 30.0, None, url
-    except aiohttp.ClientError as e:
-        total_time = time.time() - start_time
-        error_msg = str(e)
-        if "No address associated with hostname" in error_msg or "Temporary failure in name resolution" in error_msg:
-            logging.warning(f"DNS ошибка при проверке {url}: {error_msg} (время: {total_time:.2f}с)")
-        else:
-            logging.warning(f"Ошибка подключения к {url}: {error_msg} (время: {total_time:.2f}с)")
-        return False, 0, 0.0, None, url
     except Exception as e:
-        total_time = time.time() - start_time
-        logging.error(f"Неожиданная ошибка при проверке {url}: {e} (время: {total_time:.2f}с)")
+        logging.warning(f"Ошибка при проверке {url}: {e} (время: {time.time() - start_time:.2f}с)")
         return False, 0, 0.0, None, url
 
+
 async def check_site_alternative(url):
-    """Альтернативная функция проверки через другой метод (для подтверждения)"""
-    import re
+    """
+    Альтернативная проверка для подтверждения (при повторных DNS-ошибках), без запуска внешних программ.
+    Имя разрешается мимо DNS-кэша одновременно системным резолвером и ALTERNATIVE_DNS_SERVERS,
+    затем проверяются TCP-подключения к порту из URL или к 80/443 по всем найденным адресам.
     
+    Returns:
+        tuple: (is_available, result) - result: tcp_success, tcp_failed, dns_failed, dns_timeout или error
+    """
     try:
-        # Извлекаем домен из URL
-        from urllib.parse import urlparse
-        parsed = urlparse(url)
-        domain = parsed.netloc
+        parsed = urlparse(url if '://' in url else f"http://{url}")
+        domain = parsed.hostname
+        ports = (parsed.port,) if parsed.port else (80, 443)
         
         logging.debug(f"Начинаю альтернативную проверку для домена: {domain}")
+        confirmation = await confirm_host(domain, ALTERNATIVE_RESOLVERS, ports=ports, timeout=ALTERNATIVE_CHECK_TIMEOUT)
         
-        # Пробуем ping (только для подтверждения DNS-резолвинга)
-        try:
-            # Используем ping с таймаутом 5 секунд и 1 пакетом
-            # Для Windows используем -n вместо -c и -w вместо -W
-            import platform
-            is_windows = platform.system().lower() == 'windows'
-            
-            if is_windows:
-                ping_cmd = ['ping', '-n', '1', '-w', '5000', domain]
-            else:
-                ping_cmd = ['ping', '-c', '1', '-W', '5', domain]
-            
-            logging.debug(f"Выполняю ping для домена {domain}")
-            
-            # Используем asyncio.create_subprocess_exec для неблокирующего выполнения
-            proc = await asyncio.create_subprocess_exec(
-                *ping_cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            
-            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=10)
-            
-            if proc.returncode == 0:
-                # Ping прошел успешно, значит DNS работает
-                logging.info(f"Альтернативная проверка {url}: ping успешен")
-                return True, "ping_success"
-            else:
-                logging.warning(f"Альтернативная проверка {url}: ping неуспешен")
-                return False, "ping_failed"
-        except asyncio.TimeoutError:
-            logging.warning(f"Альтернативная проверка {url}: ping таймаут")
-            return False, "ping_timeout"
-        except Exception as e:
-            logging.warning(f"Альтернативная проверка {url}: ошибка ping - {e}")
-            
-        # Если ping не сработал, пробуем nslookup
-        try:
-            # Для Windows используем nslookup, для Linux - dig или nslookup
-            nslookup_cmd = ['nslookup', domain]
-            
-            logging.debug(f"Выполняю nslookup для домена {domain}")
-            
-            # Используем asyncio.create_subprocess_exec для неблокирующего выполнения
-            proc = await asyncio.create_subprocess_exec(
-                *nslookup_cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            
-            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=10)
-            stdout_text = stdout.decode('utf-8', errors='ignore')
-            
-            if proc.returncode == 0 and ("Address:" in stdout_text or "address:" in stdout_text):
-                logging.info(f"Альтернативная проверка {url}: DNS резолвинг успешен")
-                return True, "dns_success"
-            else:
-                logging.warning(f"Альтернативная проверка {url}: DNS резолвинг неуспешен")
-                return False, "dns_failed"
-        except asyncio.TimeoutError:
-            logging.warning(f"Альтернативная проверка {url}: nslookup таймаут")
-            return False, "dns_timeout"
-        except Exception as e:
-            logging.warning(f"Альтернативная проверка {url}: ошибка nslookup - {e}")
-            return False, "dns_error"
+        if confirmation.available:
+            logging.info(f"Альтернативная проверка {url}: {confirmation.describe()}")
+        else:
+            logging.warning(f"Альтернативная проверка {url}: {confirmation.describe()}")
+        return confirmation.available, confirmation.verdict
             
     except Exception as e:
         logging.error(f"Ошибка в альтернативной проверке {url}: {e}")
         return False, "error"
 
-async def check_site_with_retries(url, max_attempts=DOWN_CHECK_ATTEMPTS, retry_interval=DOWN_CHECK_INTERVAL):
+
+def build_alternative_resolvers():
+    """Резолверы альтернативной проверки: системный и публичные DNS-серверы (если установлен aiodns)"""
+    resolvers = {'system': DnsResolverCache(use_aiodns=False)}
+    if AIODNS_AVAILABLE:
+        for server in ALTERNATIVE_DNS_SERVERS:
+            resolvers[server] = DnsResolverCache(nameservers=[server])
+    elif ALTERNATIVE_DNS_SERVERS:
+        logging.warning("aiodns не установлен: альтернативная проверка использует только системный резолвер")
+    return resolvers
+
+async def check_site_with_retries(url, max_attempts=DOWN_CHECK_ATTEMPTS, retry_interval=DOWN_CHECK_INTERVAL, extract_title=True, method='GET', engine=None, fingerprint_rules=None):
     """
     Улучшенная функция проверки доступности сайта с несколькими попытками.
     Использует "Layered Health Check" для борьбы с ложными отключениями.
@@ -1960,170 +2004,113 @@ async def check_site_with_retries(url, max_attempts=DOWN_CHECK_ATTEMPTS, retry_i
         url: URL сайта для проверки
         max_attempts: Максимальное количество попыток
         retry_interval: Интервал между попытками в секундах
+        extract_title: Извлекать заголовок страницы (отключается при сбросе нагрузки)
+        method: Метод HTTP-проверки ('HEAD' или 'GET', см. check_site_availability)
+        engine: Движок проверки (None - PROBE_ENGINE_DEFAULT)
+        fingerprint_rules: Правила очистки для отпечатка содержимого (None - отпечаток не считается)
     
     Returns:
         tuple: (is_available, status_code, attempts_made, response_time, page_title, final_url)
     """
-    attempts = 0
-    last_status_code = 0
-    dns_errors_count = 0
-    network_unreachable_count = 0
-    last_response_time = 0.0
-    last_page_title = None
-    last_final_url = url
-    last_check_type = None
+    tracker = RetryTracker(url, max_attempts, retry_interval, DNS_ERROR_MULTIPLIER, ENABLE_ALTERNATIVE_CHECK)
     
     logging.debug(f"Начинаю проверку сайта {url} (макс. попыток: {max_attempts}, интервал: {retry_interval} сек)")
     
-    while attempts < max_attempts:
-        attempts += 1
-        is_available, status_code, response_time, page_title, final_url, check_type = await check_site_availability(url)
-        last_status_code = status_code
-        last_response_time = response_time
-        last_page_title = page_title
-        last_final_url = final_url
-        last_check_type = check_type
-        
-        # Если сайт доступен (включая TCP-доступность при 403/401), возвращаем результат сразу
-        if is_available:
-            check_info = f" (тип проверки: {last_check_type})" if last_check_type != "http" else ""
-            logging.info(f"Сайт {url} доступен с попытки {attempts} (статус: {status_code}, время: {response_time:.2f}s){check_info}")
-            return True, status_code, attempts, response_time, page_title, final_url
-        
-        # Проверяем тип ошибки
-        if status_code == 0:
-            # Это ошибка подключения/DNS
-            dns_errors_count += 1
-            
-            # Проверяем на ошибку "Network is unreachable" [Errno 101]
-            if "Network is unreachable" in str(page_title) or "[Errno 101]" in str(page_title):
-                network_unreachable_count += 1
-                logging.warning(f"Обнаружена ошибка 'Network is unreachable' для {url} (попытка {attempts})")
-                
-                # Если это повторная ошибка сети, прекращаем попытки
-                if network_unreachable_count >= 2:
-                    logging.error(f"Сеть недоступна для {url}, прекращаем попытки проверки")
-                    return False, -101, attempts, 0.0, "Network is unreachable", url
-            
-            # Если это DNS-ошибка и у нас еще есть попытки, делаем дополнительную проверку
-            if dns_errors_count >= 2 and attempts < max_attempts and ENABLE_ALTERNATIVE_CHECK:
-                logging.info(f"Обнаружены множественные DNS-ошибки для {url}, выполняю альтернативную проверку...")
-                alt_available, alt_result = await check_site_alternative(url)
-                
-                if alt_available:
-                    logging.info(f"Альтернативная проверка подтвердила доступность {url} ({alt_result})")
-                    # Возвращаем успешный результат с данными последней проверки
-                    return True, 200, attempts, last_response_time, last_page_title, last_final_url
-                else:
-                    logging.warning(f"Альтернативная проверка подтвердила недоступность {url} ({alt_result})")
+    while True:
+        decision = tracker.record(await check_site_availability(url, extract_title=extract_title, method=method, engine=engine,
+                                                                fingerprint_rules=fingerprint_rules))
+        
+        # Если это DNS-ошибка и у нас еще есть попытки, делаем дополнительную проверку
+        if decision == DECISION_ALTERNATIVE:
+            alt_available, alt_result = await check_site_alternative(url)
+            decision = tracker.record_alternative(alt_available, alt_result)
+        
+        if decision in (DECISION_UP, DECISION_DOWN):
+            return tracker.result()
         
         # Если сайт недоступен и это не последняя попытка, ждем перед следующей проверкой
-        if attempts < max_attempts:
-            # Увеличиваем интервал между попытками при DNS-ошибках
-            current_interval = retry_interval * (DNS_ERROR_MULTIPLIER if dns_errors_count > 0 else 1)
-            logging.info(f"Сайт {url} недоступен (статус: {status_code}), попытка {attempts}/{max_attempts}, повторная проверка через {current_interval} сек")
-            await asyncio.sleep(current_interval)
-    
-    # Если все попытки неудачны
-    logging.warning(f"Сайт {url} недоступен после {attempts} попыток (последний статус: {last_status_code}, DNS-ошибок: {dns_errors_count}, время ответа: {last_response_time:.2f}с)")
-    return False, last_status_code, attempts, last_response_time, last_page_title, last_final_url
+        # (интервал увеличивается при DNS-ошибках)
+        await asyncio.sleep(tracker.next_interval())
 
 
-async def check_site_availability(url):
+async def check_site_availability(url, extract_title=True, method='GET', engine=None, fingerprint_rules=None):
     """
-    Реализация "Layered Health Check" с использованием curl_cffi для борьбы с ложными отключениями.
+    Реализация "Layered Health Check" для борьбы с ложными отключениями.
     
-    Шаг 1: HTTP-проверка через curl_cffi с имперсонацией браузера (30 секунд)
-    Шаг 2: TCP-проверка при 403/401 или таймауте (5 секунд)
+    Шаг 1: HTTP-проверка движком сайта (по умолчанию curl_cffi с имперсонацией браузера, 30 секунд)
+    Шаг 2: TCP-проверка при 403/401 или ошибке запроса (TCP_CHECK_TIMEOUT, 5 секунд)
     Шаг 3: Решение о статусе сайта
     
+    При extract_title=False заголовок страницы не извлекается (page_title=None).
+    При method='HEAD' запрашиваются только заголовки ответа; если сервер отклоняет HEAD
+    (405/501), проверка повторяется через GET, и хост запоминается как требующий GET.
+    engine - имя движка проверки (см. probe_engines), None - PROBE_ENGINE_DEFAULT.
+    fingerprint_rules (StripRules) - тело читается целиком и хэшируется с этими правилами очистки;
+    отпечаток сохраняется в CONTENT_FINGERPRINTS. None - отпечаток не считается.
+    
     Returns:
         tuple: (is_available, status_code, response_time, page_title, final_url, check_type)
-                check_type: "http", "tcp_only", "down"
+                check_type: "http", "tcp_only", "down", "tcp_down" (движок tcp: хост не принимает подключение)
     """
     start_time = time.time()
-    session = None
+    probe_engine = PROBE_ENGINES.get(engine)
     
-    # Шаг 1: HTTP-проверка через curl_cffi
+    # Шаг 1: запрос движком проверки
     try:
-        if CURL_CFFI_AVAILABLE:
-            # Используем curl_cffi с имперсонацией Chrome 120
-            # Создаем сессию отдельно для лучшего контроля над ресурсами
-            session = curl_requests.AsyncSession(impersonate="chrome120")
-            
-            try:
-                response = await session.get(url, timeout=30)
-                response_time = time.time() - start_time
-                
-                # Получаем финальный URL после редиректов
-                final_url = response.url
-                
-                # Получаем заголовок страницы
-                page_title = None
-                if response.status_code < 400:
-                    try:
-                        html_content = response.text
-                        title_match = re.search(r'<title[^>]*>([^<]+)</title>', html_content, re.IGNORECASE)
-                        if title_match:
-                            page_title = title_match.group(1).strip()
-                    except Exception as title_error:
-                        logging.debug(f"Не удалось извлечь заголовок для {url}: {title_error}")
-                
-                # Если статус 200-299, сайт доступен
-                if 200 <= response.status_code < 300:
-                    logging.info(f"Сайт {url} доступен через HTTP (статус: {response.status_code}, время: {response_time:.2f}s)")
-                    return True, response.status_code, response_time, page_title, final_url, "http"
-                
-                # Если статус 403/401, пробуем TCP-проверку (сайт блокирует бота, но жив)
-                elif response.status_code in [403, 401]:
-                    logging.warning(f"Получен {response.status_code} для {url}, attempting TCP check...")
-                    tcp_result = await tcp_check(url)
-                    if tcp_result[0]:  # TCP успешен
-                        logging.info(f"Сайт {url} доступен через TCP (заблокирован HTTP, но жив)")
-                        return True, response.status_code, response_time, page_title, final_url, "tcp_only"
-                    else:
-                        logging.warning(f"Сайт {url} недоступен и по HTTP, и по TCP")
-                        return False, response.status_code, response_time, page_title, final_url, "down"
-                
-                # Другие ошибки HTTP (4xx, 5xx)
-                else:
-                    logging.warning(f"Сайт {url} вернул ошибку HTTP {response.status_code}")
-                    return False, response.status_code, response_time, page_title, final_url, "http"
-                    
-            finally:
-                # Явно закрываем сессию, чтобы избежать предупреждений
-                if session:
-                    try:
-                        await session.close()
-                    except Exception as close_error:
-                        logging.debug(f"Ошибка при закрытии сессии curl_cffi: {close_error}")
+        fingerprint = ContentFingerprint(fingerprint_rules) if fingerprint_rules is not None else None
+        result = await probe_engine.probe(url, extract_title=extract_title, method=method, fingerprint=fingerprint)
+        record_probe_phases(url, result.phases)
+        if fingerprint_rules is not None:
+            CONTENT_FINGERPRINTS.record(fingerprint_key(url, fingerprint_rules), result.content_hash)
+        
+        # Движок tcp сам решает о доступности, HTTP-кода у него нет
+        if result.check_type != "http":
+            return result.as_tuple()
+        
+        # Если статус 200-299 (или 304 - страница не изменилась), сайт доступен
+        if result.is_available:
+            if result.not_modified:
+                logging.info(f"Сайт {url} доступен через {probe_engine.name} (304, страница не изменилась, время: {result.response_time:.2f}s)")
+            elif result.body_truncated:
+                logging.info(f"Сайт {url} доступен через {probe_engine.name} (статус: {result.status_code}, тело обрезано по лимиту, время: {result.response_time:.2f}s)")
+            else:
+                logging.info(f"Сайт {url} доступен через {probe_engine.name} (статус: {result.status_code}, время: {result.response_time:.2f}s)")
+            return result.as_tuple()
+        
+        # Если статус 403/401, пробуем TCP-проверку (сайт блокирует бота, но жив)
+        elif result.status_code in [403, 401]:
+            logging.warning(f"Получен {result.status_code} для {url}, attempting TCP check...")
+            tcp_result = await tcp_check(url)
+            if tcp_result[0]:  # TCP успешен
+                logging.info(f"Сайт {url} доступен через TCP (заблокирован HTTP, но жив)")
+                return True, result.status_code, result.response_time, result.page_title, result.final_url, "tcp_only"
+            else:
+                logging.warning(f"Сайт {url} недоступен и по HTTP, и по TCP")
+                return False, result.status_code, result.response_time, result.page_title, result.final_url, "down"
+        
+        # Другие ошибки HTTP (4xx, 5xx)
         else:
-            # Fallback к aiohttp если curl_cffi недоступен
-            return await check_site_fallback_aiohttp(url, start_time)
+            logging.warning(f"Сайт {url} вернул ошибку HTTP {result.status_code}")
+            return result.as_tuple()
             
     except Exception as e:
         total_time = time.time() - start_time
-        error_msg = str(e)
         
-        # Проверяем на критические ошибки curl_cffi, которые могут повлиять на мониторинг
-        if "Curlm" in error_msg or "curl" in error_msg.lower() or "libcurl" in error_msg.lower():
-            logging.error(f"Критическая ошибка curl_cffi для {url}: {e} (время: {total_time:.2f}s)")
-            # Отправляем уведомление администратору о проблеме с curl_cffi
+        # Проверяем на критические ошибки движка, которые могут повлиять на мониторинг
+        if probe_engine.is_critical_error(e):
+            logging.error(f"Критическая ошибка {probe_engine.name} для {url}: {e} (время: {total_time:.2f}s)")
+            # Отправляем уведомление администратору о проблеме с движком проверки
             try:
-                await send_admin_notification(f"⚠️ Критическая ошибка curl_cffi при проверке {url}: {e}\nВремя: {total_time:.2f}s")
+                await notify_admin(f"⚠️ Критическая ошибка {probe_engine.name} при проверке {url}: {e}\nВремя: {total_time:.2f}s")
             except Exception as notify_error:
-                logging.error(f"Не удалось отправить уведомление об ошибке curl_cffi: {notify_error}")
+                logging.error(f"Не удалось отправить уведомление об ошибке {probe_engine.name}: {notify_error}")
         else:
             logging.warning(f"HTTP-проверка не удалась для {url}: {e} (время: {total_time:.2f}s)")
         
-        # Убедимся, что сессия закрыта при ошибке
-        if session:
-            try:
-                await session.close()
-            except Exception as close_error:
-                logging.debug(f"Ошибка при закрытии сессии curl_cffi после исключения: {close_error}")
-        
         # При любой ошибке пробуем TCP-проверку
+        record_probe_phases(url, None)
+        if fingerprint_rules is not None:
+            CONTENT_FINGERPRINTS.record(fingerprint_key(url, fingerprint_rules), None)
         tcp_result = await tcp_check(url)
         if tcp_result[0]:  # TCP успешен
             logging.info(f"Сайт {url} доступен через TCP (HTTP ошибка: {e})")
@@ -2137,6 +2124,8 @@ async def tcp_check(url):
     """
     TCP-проверка доступности сайта (Layered Health Check - Шаг 2).
     Проверяет, что хост отвечает на TCP-соединение, даже если HTTP заблокирован.
+    Подключение неблокирующее (net_probes.tcp_probe): перебираются все адреса хоста,
+    причина неудачи (dns, refused, timeout, unreachable) пишется в лог.
     
     Args:
         url: URL сайта для проверки
@@ -2144,133 +2133,41 @@ async def tcp_check(url):
     Returns:
         tuple: (is_available, response_time)
     """
-    start_time = time.time()
-    
-    try:
-        # Используем нашу функцию для извлечения домена
-        domain = extract_domain_from_url(url)
-        
-        # Извлекаем порт из URL
-        parsed = urlparse(url)
-        port = parsed.port or (443 if parsed.scheme == 'https' else 80)
-        host = domain
-        
-        logging.debug(f"TCP-проверка для {host}:{port}")
-        
-        # Создаем TCP соединение с таймаутом 5 секунд
-        with socket.create_connection((host, port), timeout=5) as sock:
-            response_time = time.time() - start_time
-            logging.debug(f"TCP-соединение успешно для {host}:{port} (время: {response_time:.3f}s)")
-            return True, response_time
-            
-    except socket.timeout:
-        response_time = time.time() - start_time
-        logging.warning(f"TCP-таймаут для {url} (время: {response_time:.3f}s)")
-        return False, response_time
-    except socket.gaierror as e:
-        response_time = time.time() - start_time
-        logging.warning(f"DNS-ошибка при TCP-проверке {url}: {e} (время: {response_time:.3f}s)")
-        return False, response_time
-    except Exception as e:
-        response_time = time.time() - start_time
-        logging.warning(f"TCP-проверка не удалась для {url}: {e} (время: {response_time:.3f}s)")
-        return False, response_time
+    # Используем нашу функцию для извлечения домена
+    host = extract_domain_from_url(url)
+    
+    # Извлекаем порт из URL
+    parsed = urlparse(url)
+    port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+    
+    logging.debug(f"TCP-проверка для {host}:{port}")
+    result = await tcp_probe(host, port, timeout=TCP_CHECK_TIMEOUT, resolver=DNS_CACHE)
+    if result.reachable:
+        logging.debug(f"TCP-соединение успешно: {result.describe()}")
+    elif result.failure == FAILURE_DNS:
+        logging.warning(f"DNS-ошибка при TCP-проверке {url}: {result.error} (время: {result.elapsed:.3f}s)")
+    else:
+        logging.warning(f"TCP-проверка не удалась для {url}: {result.describe()} (время: {result.elapsed:.3f}s)")
+    return result.reachable, result.elapsed
 
 
-async def check_site_fallback_aiohttp(url, start_time):
-    """
-    Fallback-функция проверки сайта через aiohttp, если curl_cffi недоступен.
-    Реализует ту же логику "Layered Health Check", что и основная функция.
-    
-    Args:
-        url: URL сайта для проверки
-        start_time: Время начала проверки
-        
-    Returns:
-        tuple: (is_available, status_code, response_time, page_title, final_url, check_type)
-    """
-    try:
-        # Настраиваем ClientSession с User-Agent Chrome 120 для максимальной совместимости
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-        }
-        
-        logging.debug(f"Используем aiohttp fallback для {url}")
-        
-        # Устанавливаем жесткий таймаут в 30 секунд для всех сетевых операций
-        timeout = aiohttp.ClientTimeout(total=30, connect=10)
-        async with aiohttp.ClientSession(headers=headers, timeout=timeout) as session:
-            # allow_redirects=True по умолчанию, max_redirects=10 по умолчанию
-            # Устанавливаем max_redirects=7 как у конкурента
-            async with session.get(url, allow_redirects=True, max_redirects=7) as response:
-                # Замеряем время ответа
-                response_time = time.time() - start_time
-                
-                # Получаем финальный URL после редиректов
-                final_url = str(response.url)
-                
-                logging.debug(f"Ответ от {url}: статус={response.status}, время={response_time:.2f}с, финальный_url={final_url}")
-                
-                # Получаем заголовок страницы с таймаутом
-                page_title = None
-                if response.status < 400:
-                    try:
-                        # Устанавливаем таймаут на чтение контента
-                        html_content = await asyncio.wait_for(response.text(), timeout=10)
-                        # Простой парсинг заголовка из HTML
-                        title_match = re.search(r'<title[^>]*>([^<]+)</title>', html_content, re.IGNORECASE)
-                        if title_match:
-                            page_title = title_match.group(1).strip()
-                        logging.debug(f"Заголовок страницы {url}: {page_title}")
-                    except asyncio.TimeoutError:
-                        logging.warning(f"Таймаут при получении контента для {url}")
-                    except Exception as title_error:
-                        logging.debug(f"Не удалось извлечь заголовок для {url}: {title_error}")
-                
-                # Если статус 200-299, сайт доступен
-                if 200 <= response.status < 300:
-                    logging.info(f"Сайт {url} доступен через aiohttp (статус: {response.status}, время: {response_time:.2f}s)")
-                    return True, response.status, response_time, page_title, final_url, "http"
-                
-                # Если статус 403/401, пробуем TCP-проверку (сайт блокирует бота, но жив)
-                elif response.status in [403, 401]:
-                    logging.warning(f"Получен {response.status} для {url}, attempting TCP check...")
-                    tcp_result = await tcp_check(url)
-                    if tcp_result[0]:  # TCP успешен
-                        logging.info(f"Сайт {url} доступен через TCP (заблокирован HTTP, но жив)")
-                        return True, response.status, response_time, page_title, final_url, "tcp_only"
-                    else:
-                        logging.warning(f"Сайт {url} недоступен и по HTTP, и по TCP")
-                        return False, response.status, response_time, page_title, final_url, "down"
-                
-                # Другие ошибки HTTP (4xx, 5xx)
-                else:
-                    logging.warning(f"Сайт {url} вернул ошибку HTTP {response.status}")
-                    return False, response.status, response_time, page_title, final_url, "http"
-                
-    except Exception as e:
-        total_time = time.time() - start_time
-        error_msg = str(e)
-        
-        # Проверяем на критические ошибки aiohttp, которые могут повлиять на мониторинг
-        if "ClientError" in error_msg or "ServerDisconnectedError" in error_msg or "ConnectorError" in error_msg:
-            logging.error(f"Критическая ошибка aiohttp для {url}: {e} (время: {total_time:.2f}s)")
-            # Отправляем уведомление администратору о проблеме с aiohttp
-            try:
-                await send_admin_notification(f"⚠️ Критическая ошибка aiohttp при проверке {url}: {e}\nВремя: {total_time:.2f}s")
-            except Exception as notify_error:
-                logging.error(f"Не удалось отправить уведомление об ошибке aiohttp: {notify_error}")
-        else:
-            logging.warning(f"aiohttp fallback не удался для {url}: {e} (время: {total_time:.2f}s)")
-        
-        # При любой ошибке пробуем TCP-проверку
-        tcp_result = await tcp_check(url)
-        if tcp_result[0]:  # TCP успешен
-            logging.info(f"Сайт {url} доступен через TCP (aiohttp ошибка: {e})")
-            return True, 0, total_time, None, url, "tcp_only"
-        else:
-            logging.warning(f"Сайт {url} недоступен и по aiohttp, и по TCP")
-            return False, 0, total_time, None, url, "down"
+def engine_summary():
+    """Сводка по движкам проверки для периодического лога"""
+    if ADAPTIVE_ENGINE is None:
+        return PROBE_ENGINES.default
+    return f"{PROBE_ENGINES.default} ({ADAPTIVE_ENGINE.summary()})"
+
+
+def fingerprint_key(url, rules):
+    """Ключ отпечатка: одна страница с разными правилами очистки дает разные отпечатки"""
+    return normalize_url(url), rules.key
+
+
+def record_probe_phases(url, phases):
+    """Сохраняет фазы времени проверки URL (забираются при обработке результата)"""
+    PROBE_PHASES.record(normalize_url(url), phases)
+    if phases:
+        logging.debug(f"Фазы проверки {url}: " + ", ".join(f"{name}={value:.3f}с" for name, value in phases.items()))
 
 
 # --- НОВЫЙ БЛОК: Данные для массового импорта ---
@@ -2569,76 +2466,98 @@ async def handle_show_reserve_domains_callback(callback: CallbackQuery):
 
 # Функция проверки доступности сайтов (каждые 5 минут)
 async def scheduled_availability_check():
-    # Добавляем флаг, чтобы избежать дублирования запусков
-    is_running = False
-    
+    # Циклы не пересекаются: следующий начинается только после завершения предыдущего.
+    # Перегрузка видна как лаг - насколько цикл вышел за свой интервал (CHECK_INTERVAL)
     while True:
         try:
-            if is_running:
-                logging.warning("Проверка сайтов уже запущена, пропускаем итерацию")
-                await asyncio.sleep(60)
-                continue
+            # 1. Получаем сайты из реестра в памяти (синхронизируется в фоне) или из БД
+            if ENABLE_SITE_REGISTRY and SITE_REGISTRY.loaded:
+                sites = SITE_REGISTRY.all()
+            else:
+                success, sites_result = await safe_supabase_operation(
+                    lambda: supabase.table('botmonitor_sites').select(SITE_CHECK_FIELDS).execute(),
+                    operation_name="get_sites_for_check"
+                )
                 
-            is_running = True
-            
-            # 1. Получаем сайты из БД
-            success, sites_result = await safe_supabase_operation(
-                lambda: supabase.table('botmonitor_sites').select(
-                    'id, url, original_url, chat_id, is_up, has_ssl, ssl_expires_at, is_reserve_domain, status_code, response_time, avg_response_time, page_title, final_url, total_checks, successful_checks'
-                ).execute(),
-                operation_name="get_sites_for_check"
-            )
-            
-            if not success:
-                logging.error(f"Не удалось получить список сайтов: {sites_result}")
-                await send_admin_notification(f"🔥 Критическая ошибка: не удалось получить список сайтов: {sites_result}")
-                await asyncio.sleep(60)  # Пауза перед перезапуском цикла
-                is_running = False
-                continue
-            
-            sites = sites_result.data
+                if not success:
+                    logging.error(f"Не удалось получить список сайтов: {sites_result}")
+                    await notify_admin(f"🔥 Критическая ошибка: не удалось получить список сайтов: {sites_result}")
+                    await asyncio.sleep(60)  # Пауза перед перезапуском цикла
+                    continue
+                
+                sites = sites_result.data
+            # В многопроцессном режиме и при аренде шардов проверяем только свои сайты
+            sites = shard_sites(sites or [])
             if not sites:
                 logging.info("Список сайтов пуст, пропускаем проверку")
                 await asyncio.sleep(CHECK_INTERVAL)
-                is_running = False
                 continue
 
             start_time = datetime.now(timezone.utc)
             logging.info(f"Начинаю проверку {len(sites)} сайтов (время: {start_time.strftime('%H:%M:%S')})")
             
-            successful_checks = 0
-            failed_checks = 0
+            # Критичные сайты (короткий интервал) проверяются первыми, резервные домены - последними:
+            # если цикл не укладывается в интервал, сбрасывается работа в конце списка
+            sites = sorted(sites, key=lambda site: (bool(site.get('is_reserve_domain')), site.get('check_interval') or CHECK_INTERVAL))
+            cycle_started = time.monotonic()
+            deferred = 0
+            
+            # Записи одного URL (разные чаты) проверяются одной группой - одним запросом
+            groups = group_sites(sites, SITE_GROUP_KEY)
+            
+            async def check_cycle_group(group):
+                nonlocal deferred
+                LOAD_SHEDDER.update(time.monotonic() - cycle_started - CHECK_INTERVAL)
+                due_sites = []
+                for site in group:
+                    if LOAD_SHEDDER.should_defer(site, site.get('check_interval') or CHECK_INTERVAL):
+                        deferred += 1
+                    else:
+                        due_sites.append(site)
+                if due_sites:
+                    return await check_site_group(due_sites)
             
             # 2. Проверяем каждый сайт изолированно
-            for i, site in enumerate(sites, 1):
-                site_url = site.get('url', 'unknown')
-                try:
-                    logging.debug(f"[{i}/{len(sites)}] Проверка сайта: {site_url}")
-                    await check_single_site(site)
-                    successful_checks += 1
-                except Exception as site_e:
-                    failed_checks += 1
-                    logging.error(f"Ошибка при проверке сайта {site_url}: {site_e}")
-                    # Логика записи ошибки в БД для конкретного сайта, чтобы не терять данные
-                    # continue - идем к следующему сайту
-                    continue
+            if CHECK_EXECUTION_MODE == 'pool':
+                stats = await check_sites_with_pool(groups, check_cycle_group)
+                logging.info(f"Цикл проверки (пул воркеров, {CHECK_CONCURRENCY} потоков) завершен: {stats.summary()}")
+            else:
+                successful_checks = 0
+                failed_checks = 0
+                
+                for i, group in enumerate(groups, 1):
+                    site_url = group[0].get('url', 'unknown')
+                    try:
+                        logging.debug(f"[{i}/{len(groups)}] Проверка сайта: {site_url} (записей: {len(group)})")
+                        await check_cycle_group(group)
+                        successful_checks += len(group)
+                    except Exception as site_e:
+                        failed_checks += len(group)
+                        logging.error(f"Ошибка при проверке сайта {site_url}: {site_e}")
+                        # Логика записи ошибки в БД для конкретного сайта, чтобы не терять данные
+                        # continue - идем к следующему сайту
+                        continue
+                
+                end_time = datetime.now(timezone.utc)
+                duration = (end_time - start_time).total_seconds()
+                logging.info(f"Цикл проверки завершен за {duration:.2f} сек. Успешно: {successful_checks}, Ошибок: {failed_checks}")
             
-            end_time = datetime.now(timezone.utc)
-            duration = (end_time - start_time).total_seconds()
-            logging.info(f"Цикл проверки завершен за {duration:.2f} сек. Успешно: {successful_checks}, Ошибок: {failed_checks}")
+            cycle_lag = max(0.0, time.monotonic() - cycle_started - CHECK_INTERVAL)
+            log = logging.warning if cycle_lag > 0 else logging.info
+            log(f"Лаг цикла проверки: {cycle_lag:.1f}с, уровень сброса нагрузки: {LOAD_SHEDDER.level}, отложено: {deferred}, дедупликация: {PROBE_COALESCER.summary()}, пул aiohttp: {AIOHTTP_SESSIONS.summary()}, не изменилось (304): {PAGE_VALIDATORS.take_not_modified()}, движки: {engine_summary()}, обрезано тел: {BODY_LIMITS.summary()}, сертификаты: {CERTIFICATE_CACHE.summary()}, DNS: {DNS_CACHE.summary()}")
+            # Следующий цикл начинается без сброса нагрузки
+            LOAD_SHEDDER.update(0.0)
                     
         except Exception as global_e:
             # 3. Глобальный перехват, чтобы бот не умер
             error_msg = f"🔥 КРИТИЧЕСКАЯ ОШИБКА ЦИКЛА: {global_e}"
             logging.critical(error_msg, exc_info=True)
             try:
-                await bot.send_message(ADMIN_CHAT_ID, error_msg)
+                await notify_admin(error_msg)
             except:
                 pass # Если даже Telegram недоступен, просто пишем в лог
             
             await asyncio.sleep(60) # Даем время "остыть" перед перезапуском
-        finally:
-            is_running = False
 
         # Используем рандомизированный интервал 5-10 минут как у конкурента
         import random
@@ -2646,17 +2565,272 @@ async def scheduled_availability_check():
         logging.info(f"Следующая проверка через {random_interval} секунд ({random_interval//60} мин {random_interval%60} сек)")
         await asyncio.sleep(random_interval)
 
+# Реестр сайтов загружается один раз при старте и затем синхронизируется инкрементально
+SITE_REGISTRY = SiteRegistry(supabase, REGISTRY_SITE_FIELDS, full_resync_interval=SITE_REGISTRY_FULL_RESYNC)
+
+# Пул воркеров создается один раз, семафоры хостов живут между циклами
+CHECK_WORKER_POOL = CheckWorkerPool(concurrency=CHECK_CONCURRENCY, per_host_limit=CHECK_PER_HOST_LIMIT)
+
+# Сброс нагрузки по лагу проверок (уровень читается в check_single_site)
+LOAD_SHEDDER = LoadShedder(lag_threshold=LOAD_SHED_LAG, slow_interval=LOAD_SHED_SLOW_INTERVAL, enabled=ENABLE_LOAD_SHEDDING)
+
+# Сессии curl_cffi живут весь срок работы процесса и закрываются при остановке
+CURL_SESSION_POOL = CurlSessionPool(size=CURL_SESSION_POOL_SIZE, max_clients=CURL_SESSION_MAX_CLIENTS, impersonate="chrome120",
+                                    curl_infos=CURL_TIMING_INFOS)
+
+# Разрешенные имена хостов для проверок aiohttp, TCP и SSL (curl_cffi использует кэш DNS libcurl)
+DNS_CACHE = DnsResolverCache(default_ttl=DNS_CACHE_DEFAULT_TTL, negative_ttl=DNS_NEGATIVE_TTL,
+                             max_ttl=DNS_CACHE_MAX_TTL, nameservers=DNS_NAMESERVERS)
+
+# Резолверы альтернативной проверки (запросы идут мимо кэша)
+ALTERNATIVE_RESOLVERS = build_alternative_resolvers()
+
+# Общая сессия aiohttp создается при старте проверок и закрывается при остановке
+AIOHTTP_SESSIONS = AiohttpSessionManager(
+    limit=AIOHTTP_POOL_LIMIT,
+    limit_per_host=AIOHTTP_POOL_LIMIT_PER_HOST,
+    ttl_dns_cache=AIOHTTP_DNS_CACHE_TTL,
+    trace_configs=[aiohttp_trace_config()],
+    resolver=CachedAiohttpResolver(DNS_CACHE)
+)
+
+# Фазы времени (DNS, подключение, TLS, TTFB, загрузка) последней проверки каждого URL
+PROBE_PHASES = ProbePhaseLog()
+
+# Отпечатки содержимого последней проверки сайтов с content_fingerprint
+CONTENT_FINGERPRINTS = FingerprintLog()
+
+# SSL-сертификаты из TLS-соединений проверок: check_ssl_certificate не повторяет рукопожатие
+PEER_CERTIFICATES = PeerCertificateLog()
+
+# Проверенные сертификаты с расписанием повторной проверки по сроку действия
+CERTIFICATE_CACHE = CertificateCache()
+
+# Валидаторы (ETag, Last-Modified) последней загрузки страниц для условных запросов
+PAGE_VALIDATORS = ValidatorCache()
+
+# Метод проверки (HEAD/GET), сработавший для каждого хоста
+PROBE_METHODS = ProbeMethodMemory(ttl=PROBE_METHOD_MEMORY_TTL)
+
+# Лимиты тела ответа и счетчик проверок, где загрузка была прервана
+BODY_LIMITS = BodyLimits(max_download=PROBE_MAX_DOWNLOAD_BYTES, max_decompressed=PROBE_MAX_DECOMPRESSED_BYTES)
+
+# Движки проверки: выбираются для сайта колонкой probe_engine, по умолчанию PROBE_ENGINE_DEFAULT
+HTTP_ENGINE_OPTIONS = {
+    'validators': PAGE_VALIDATORS if CONDITIONAL_REQUESTS else None,
+    'methods': PROBE_METHODS,
+    'title_limit': TITLE_READ_LIMIT,
+    'body_limits': BODY_LIMITS,
+    'certificates': PEER_CERTIFICATES,
+}
+if PROBE_ENGINE_DEFAULT in ('curl', 'auto') and not CURL_CFFI_AVAILABLE:
+    # Fallback к aiohttp если curl_cffi недоступен
+    PROBE_ENGINE_DEFAULT = 'aiohttp'
+PROBE_ENGINES = ProbeEngineRegistry(default=PROBE_ENGINE_DEFAULT)
+PROBE_ENGINES.register(AiohttpProbeEngine(AIOHTTP_SESSIONS, **HTTP_ENGINE_OPTIONS))
+PROBE_ENGINES.register(TcpProbeEngine(tcp_check))
+ADAPTIVE_ENGINE = None
+if CURL_CFFI_AVAILABLE:
+    PROBE_ENGINES.register(CurlProbeEngine(CURL_SESSION_POOL, **HTTP_ENGINE_OPTIONS))
+    ADAPTIVE_ENGINE = AdaptiveProbeEngine(PROBE_ENGINES.get('aiohttp'), PROBE_ENGINES.get('curl'),
+                                          ImpersonationPins(ttl=IMPERSONATION_PIN_TTL))
+    PROBE_ENGINES.register(ADAPTIVE_ENGINE)
+if PROBE_ENGINE_DEFAULT not in PROBE_ENGINES.names():
+    # Опечатка в PROBE_ENGINE_DEFAULT не должна останавливать проверки всех сайтов
+    logging.warning(f"Неизвестный PROBE_ENGINE_DEFAULT={PROBE_ENGINE_DEFAULT} (доступны: {', '.join(PROBE_ENGINES.names())}), используется aiohttp")
+    PROBE_ENGINE_DEFAULT = 'aiohttp'
+    PROBE_ENGINES.default = PROBE_ENGINE_DEFAULT
+
+# Объединение проверок одного URL из разных записей сайтов
+PROBE_COALESCER = ProbeCoalescer(ttl=PROBE_DEDUP_TTL, enabled=PROBE_DEDUP)
+# Ключ группы записей: при дедупликации записи одного URL проверяются одним запросом
+SITE_GROUP_KEY = (lambda site: normalize_url(site.get('url', ''))) if PROBE_DEDUP else None
+
+async def check_sites_with_pool(groups, check_func=None):
+    """
+    Параллельная проверка групп сайтов (см. group_sites) через пул воркеров.
+    Время цикла растет с самым медленным сайтом, а не с суммой всех проверок.
+    
+    Returns:
+        CycleStats: Статистика пропускной способности цикла
+    """
+    return await CHECK_WORKER_POOL.run_cycle(
+        groups,
+        check_func or check_site_group,
+        host_func=lambda group: extract_domain_from_url(group[0].get('url', '')),
+        key_func=lambda group: group[0].get('original_url') or group[0].get('url', 'unknown')
+    )
+
+# Планировщик проверок с индивидуальными интервалами (режим priority)
+async def scheduled_priority_check():
+    """
+    Непрерывный цикл проверок на основе очереди с приоритетом.
+    Проверяются только сайты, у которых подошло время, с интервалом из колонки check_interval
+    (по умолчанию CHECK_INTERVAL). Список сайтов перечитывается раз в SITES_REFRESH_INTERVAL секунд.
+    При ADAPTIVE_INTERVALS интервал корректируется по состоянию сайта после каждой проверки.
+    """
+    policy = None
+    if ADAPTIVE_INTERVALS:
+        policy = AdaptiveIntervalPolicy(
+            min_interval=ADAPTIVE_MIN_INTERVAL,
+            max_interval=ADAPTIVE_MAX_INTERVAL,
+            stable_after=ADAPTIVE_STABLE_AFTER
+        )
+    # При дедупликации записи одного URL получают общую фазу и выдаются одной группой
+    scheduler = SiteScheduler(default_interval=CHECK_INTERVAL, smoothing=CHECK_SMOOTHING, policy=policy, phase_key=SITE_GROUP_KEY)
+    last_refresh = 0.0
+    registry_version = None
+    synced_lease_version = None
+    stats = CycleStats()
+    deferred = 0
+    # Будится при завершении проверки, чтобы сразу занять освободившийся слот пула
+    slot_freed = asyncio.Event()
+    
+    def on_check_done(done_group):
+        for done_site in done_group:
+            scheduler.complete(done_site['id'])
+        slot_freed.set()
+    
+    while True:
+        try:
+            # Изменение арендованных шардов требует пересборки расписания
+            lease_version = SHARD_LEASES.version if SHARD_LEASES is not None else None
+            leases_changed = lease_version != synced_lease_version
+            
+            # 1. Синхронизируем расписание с реестром сайтов в памяти (без обращения к БД)
+            if ENABLE_SITE_REGISTRY and SITE_REGISTRY.loaded:
+                if SITE_REGISTRY.version != registry_version or leases_changed:
+                    scheduler.sync(shard_sites(SITE_REGISTRY.all()))
+                    registry_version = SITE_REGISTRY.version
+                    synced_lease_version = lease_version
+                    logging.debug(f"Расписание проверок обновлено из реестра: {len(scheduler)} сайтов")
+                last_refresh = time.monotonic()
+            # ... или периодически со списком сайтов в БД
+            elif time.monotonic() - last_refresh >= SITES_REFRESH_INTERVAL or leases_changed:
+                success, sites_result = await safe_supabase_operation(
+                    lambda: supabase.table('botmonitor_sites').select(SCHEDULER_SITE_FIELDS).execute(),
+                    operation_name="get_sites_for_scheduler"
+                )
+                if success:
+                    scheduler.sync(shard_sites(sites_result.data or []))
+                    last_refresh = time.monotonic()
+                    synced_lease_version = lease_version
+                    logging.debug(f"Расписание проверок обновлено: {len(scheduler)} сайтов")
+                else:
+                    logging.error(f"Не удалось обновить список сайтов для планировщика: {sites_result}")
+                    await notify_admin(f"🔥 Критическая ошибка: не удалось получить список сайтов: {sites_result}")
+                    await asyncio.sleep(60)
+                    continue
+            
+            # 2. Запускаем проверки сайтов, время которых подошло, в пределах свободных слотов пула.
+            # Остальные ждут в расписании, поэтому отставание от времени проверки видно как лаг
+            lag = scheduler.lag()
+            LOAD_SHEDDER.update(lag)
+            free_slots = CHECK_CONCURRENCY - CHECK_WORKER_POOL.active_count
+            while free_slots > 0:
+                due_groups = scheduler.pop_due_groups(limit=free_slots)
+                if not due_groups:
+                    break
+                for group in due_groups:
+                    due_sites = []
+                    for site in group:
+                        if LOAD_SHEDDER.should_defer(site, scheduler.interval_of(site['id'])):
+                            # Низкоприоритетная проверка переносится на следующий интервал
+                            scheduler.complete(site['id'])
+                            deferred += 1
+                        else:
+                            due_sites.append(site)
+                    if not due_sites:
+                        continue
+                    CHECK_WORKER_POOL.dispatch(
+                        due_sites,
+                        check_site_group,
+                        host=extract_domain_from_url(due_sites[0].get('url', '')),
+                        key=due_sites[0].get('original_url') or due_sites[0].get('url', 'unknown'),
+                        stats=stats,
+                        on_done=on_check_done
+                    )
+                    free_slots -= 1
+            
+            # 3. Периодически выводим статистику пропускной способности и лаг
+            if stats.elapsed >= CHECK_INTERVAL:
+                stats.finish()
+                lag_stats = scheduler.take_lag_stats()
+                logging.info(
+                    f"Планировщик: {stats.summary()}, в очереди: {len(scheduler)}, выполняется: {CHECK_WORKER_POOL.active_count}, "
+                    f"лаг: текущий {lag:.1f}с, средний {lag_stats['avg']:.1f}с, макс {lag_stats['max']:.1f}с, "
+                    f"уровень сброса нагрузки: {LOAD_SHEDDER.level}, отложено: {deferred}, "
+                    f"дедупликация: {PROBE_COALESCER.summary()}, пул aiohttp: {AIOHTTP_SESSIONS.summary()}, "
+                    f"не изменилось (304): {PAGE_VALIDATORS.take_not_modified()}, движки: {engine_summary()}, "
+                    f"обрезано тел: {BODY_LIMITS.summary()}, сертификаты: {CERTIFICATE_CACHE.summary()}, DNS: {DNS_CACHE.summary()}"
+                )
+                stats = CycleStats()
+                deferred = 0
+            
+            # 4. Спим до ближайшей проверки, освобождения слота пула или обновления списка сайтов
+            next_due = scheduler.seconds_until_next()
+            refresh_in = max(0.0, SITES_REFRESH_INTERVAL - (time.monotonic() - last_refresh))
+            if free_slots <= 0:
+                next_due = None  # Пул занят - ждем завершения проверки
+            sleep_for = min(next_due if next_due is not None else refresh_in, refresh_in, 1.0)
+            slot_freed.clear()
+            try:
+                await asyncio.wait_for(slot_freed.wait(), timeout=max(0.05, sleep_for))
+            except asyncio.TimeoutError:
+                pass
+        
+        except Exception as global_e:
+            error_msg = f"🔥 КРИТИЧЕСКАЯ ОШИБКА ПЛАНИРОВЩИКА: {global_e}"
+            logging.critical(error_msg, exc_info=True)
+            try:
+                await notify_admin(error_msg)
+            except:
+                pass
+            await asyncio.sleep(60)
+
 # Функция проверки отдельного сайта с изоляцией ошибок
-async def check_single_site(site):
+def site_probe_method(site):
+    """Метод HTTP-проверки сайта: probe_method из записи или PROBE_METHOD_DEFAULT"""
+    if site.get('content_fingerprint'):
+        # Для отпечатка содержимого нужно тело страницы
+        return 'GET'
+    mode = (site.get('probe_method') or PROBE_METHOD_DEFAULT).lower()
+    return 'HEAD' if mode == 'head' else 'GET'
+
+
+def site_fingerprint_rules(site):
+    """Правила очистки для отпечатка содержимого сайта; None - отпечаток не отслеживается"""
+    if not site.get('content_fingerprint'):
+        return None
+    return StripRules.parse(site.get('content_strip_rules'))
+
+
+async def check_site_group(sites):
+    """
+    Проверка группы записей одного URL (см. group_sites): запрос к сайту выполняется один раз,
+    результат обрабатывается для каждой записи.
+    Возвращает False, если проверка хотя бы одной записи завершилась ошибкой.
+    """
+    probes = ProbeGroup(PROBE_COALESCER)
+    ok = True
+    for site in sites:
+        if await check_single_site(site, probes) is False:
+            ok = False
+    return ok
+
+
+async def check_single_site(site, probes=None):
     """
     Изолированная проверка отдельного сайта.
     Ошибки при проверке одного сайта не должны влиять на другие сайты.
+    probes - проверки группы записей того же URL (ProbeGroup); по умолчанию общий PROBE_COALESCER.
+    Возвращает False, если проверка завершилась ошибкой (учитывается в статистике пула).
     """
+    probes = probes or PROBE_COALESCER
     try:
         site_id = site.get('id')
         url = site.get('url')
         original_url = site.get('original_url')
-        chat_id = site.get('chat_id')
         display_url = original_url or url
         
         # Пропускаем проверку доступности для резервных доменов
@@ -2674,136 +2848,263 @@ async def check_single_site(site):
                 logging.error(f"Не удалось обновить время проверки для резервного домена {site_id}: {update_result}")
             return
         
+        # Сайт еще проходит подтверждение недоступности - не проверяем его повторно
+        if CONFIRMATION_QUEUE.is_pending(site_id):
+            logging.debug(f"Сайт {display_url} (ID: {site_id}) ожидает подтверждения статуса, пропускаем")
+            return
+        
         logging.debug(f"Начинаю проверку сайта {display_url} (ID: {site_id})")
         
-        # Получаем старые значения для отслеживания изменений
-        was_up = site['is_up']
-        had_ssl = site['has_ssl']
-        old_ssl_expires_at = site['ssl_expires_at']
-        old_status_code = site.get('status_code')
-        old_page_title = site.get('page_title')
-        old_final_url = site.get('final_url')
-        old_avg_response_time = site.get('avg_response_time', 0.0) or 0.0
-        total_checks = site.get('total_checks', 0) or 0
-        successful_checks = site.get('successful_checks', 0) or 0
+        # При отставании от расписания заголовок и SSL не обновляются
+        enrich = not LOAD_SHEDDER.skip_enrichment
+        # Сайты без отслеживания заголовка проверяются запросом HEAD
+        method = site_probe_method(site)
+        extract_title = enrich and method == 'GET'
+        engine = PROBE_ENGINES.get(site.get('probe_engine')).name
+        # Отпечаток содержимого требует чтения всего тела - при сбросе нагрузки не считается
+        fingerprint_rules = site_fingerprint_rules(site) if enrich else None
+        fingerprint_key_part = fingerprint_rules.key if fingerprint_rules is not None else None
+        
+        # 1. Проверяем доступность с несколькими попытками - получаем расширенные данные.
+        # Записи с тем же URL (другие чаты) используют результат одной проверки
+        probe_key = normalize_url(url)
+        if NON_BLOCKING_CONFIRMATION and CONFIRMATION_QUEUE.running:
+            # Делаем одну попытку, повторные выполнит очередь подтверждения по своему таймеру
+            tracker = RetryTracker(url, DOWN_CHECK_ATTEMPTS, DOWN_CHECK_INTERVAL, DNS_ERROR_MULTIPLIER, ENABLE_ALTERNATIVE_CHECK,
+                                   probe_options={'extract_title': extract_title, 'method': method, 'engine': engine,
+                                                  'fingerprint_rules': fingerprint_rules})
+            decision = tracker.record(await probes.run(
+                ('probe', probe_key, extract_title, method, engine, fingerprint_key_part),
+                lambda: check_site_availability(url, extract_title=extract_title, method=method, engine=engine,
+                                                fingerprint_rules=fingerprint_rules)
+            ))
+            if decision not in (DECISION_UP, DECISION_DOWN):
+                CONFIRMATION_QUEUE.submit(site_id, site, tracker, decision)
+                logging.debug(f"Сайт {display_url} (ID: {site_id}) передан в очередь подтверждения")
+                return
+            check_result = tracker.result()
+        else:
+            check_result = await probes.run(
+                ('retries', probe_key, extract_title, method, engine, fingerprint_key_part),
+                lambda: check_site_with_retries(url, extract_title=extract_title, method=method, engine=engine,
+                                                fingerprint_rules=fingerprint_rules)
+            )
         
-        now = datetime.now(timezone.utc)
+        await process_site_check_result(site, check_result, enrich=enrich, probes=probes)
+    
+    except Exception as e:
+        await handle_site_check_error(site, e)
+        # Для статистики пула: ошибка обработана здесь, но проверка не удалась
+        return False
 
-        # 1. Проверяем доступность с несколькими попытками - получаем расширенные данные
-        status, status_code, attempts, response_time, page_title, final_url = await check_site_with_retries(url)
-        status_changed = status != bool(was_up)
-        
-        # Обновляем счетчики
-        total_checks += 1
-        if status:
-            successful_checks += 1
-        
-        # Вычисляем среднее время ответа (скользящее среднее)
-        if response_time > 0:
-            if old_avg_response_time > 0:
-                new_avg_response_time = (old_avg_response_time * 0.8) + (response_time * 0.2)
-            else:
-                new_avg_response_time = response_time
-        else:
-            new_avg_response_time = old_avg_response_time
+async def handle_site_check_error(site, e):
+    """Изолирует ошибку проверки конкретного сайта и помечает его недоступным в БД"""
+    # Изолируем ошибку конкретного сайта, чтобы она не повлияла на другие
+    site_url = site.get('url', 'unknown')
+    site_id = site.get('id', 'unknown')
+    logging.error(f"Критическая ошибка при проверке сайта {site_url} (ID: {site_id}): {e}", exc_info=True)
+    # Помечаем сайт как недоступный в БД, если возможно
+    try:
+        site_id = site.get('id')
+        if site_id:
+            await safe_supabase_operation(
+                lambda: supabase.table('botmonitor_sites').update({
+                    'is_up': False,
+                    'last_check': datetime.now(timezone.utc).isoformat()
+                }).eq('id', site_id).execute(),
+                operation_name=f"mark_site_down_{site_id}"
+            )
+            site['is_up'] = False
+            SITE_REGISTRY.apply_local_update(site_id, {'is_up': False})
+    except Exception as update_error:
+        logging.error(f"Не удалось обновить статус недоступности для сайта {site.get('id', 'unknown')}: {update_error}")
+    # Продолжаем работу, не прерывая цикл проверки других сайтов
 
-        # 2. Проверяем SSL (только для обновления данных, без уведомлений)
-        has_ssl, ssl_info, ssl_expires_at = False, None, old_ssl_expires_at
-        if status and url.startswith('https://'):
-            ssl_info = await check_ssl_certificate(url)
-            has_ssl = ssl_info.get('has_ssl', False)
-            if has_ssl:
-                ssl_expires_at = ssl_info.get('expiry_date')
 
-        # 3. Безопасное обновление статуса в БД с расширенными данными
-        update_success, update_result = await safe_supabase_operation(
-            lambda: supabase.table('botmonitor_sites').update({
-                'is_up': status,
-                'status_code': status_code,
-                'response_time': response_time if response_time > 0 else None,
-                'avg_response_time': new_avg_response_time if new_avg_response_time > 0 else None,
-                'page_title': page_title,
-                'final_url': final_url,
-                'has_ssl': has_ssl,
-                'ssl_expires_at': ssl_expires_at.isoformat() if ssl_expires_at and hasattr(ssl_expires_at, 'isoformat') else ssl_expires_at,
-                'last_check': now.isoformat(),
-                'last_status_change': now.isoformat() if status_changed else site.get('last_status_change'),
-                'total_checks': total_checks,
-                'successful_checks': successful_checks
-            }).eq('id', site_id).execute(),
-            operation_name=f"update_site_status_{site_id}"
-        )
-        
-        if not update_success:
-            logging.error(f"Не удалось обновить статус сайта {site_id}: {update_result}")
-            # Не отправляем уведомление админу об ошибке обновления одного сайта
-            return
+async def process_site_check_result(site, check_result, enrich=True, probes=None):
+    """
+    Обработка результата проверки сайта: SSL, обновление статуса в БД и уведомления.
+    
+    Args:
+        site: Запись сайта из БД (значения до проверки)
+        check_result: Результат в формате check_site_with_retries
+        enrich: Обновлять SSL и заголовок страницы (False при сбросе нагрузки - сохраняются прежние значения)
+        probes: Проверки группы записей того же URL (ProbeGroup); по умолчанию PROBE_COALESCER
+    """
+    site_id = site.get('id')
+    url = site.get('url')
+    original_url = site.get('original_url')
+    chat_id = site.get('chat_id')
+    display_url = original_url or url
+    
+    # Получаем старые значения для отслеживания изменений
+    was_up = site['is_up']
+    had_ssl = site['has_ssl']
+    old_ssl_expires_at = site['ssl_expires_at']
+    old_status_code = site.get('status_code')
+    old_page_title = site.get('page_title')
+    old_final_url = site.get('final_url')
+    old_content_hash = site.get('content_hash')
+    old_avg_response_time = site.get('avg_response_time', 0.0) or 0.0
+    total_checks = site.get('total_checks', 0) or 0
+    successful_checks = site.get('successful_checks', 0) or 0
+    
+    now = datetime.now(timezone.utc)
+
+    # 1. Результат проверки доступности с несколькими попытками - расширенные данные
+    status, status_code, attempts, response_time, page_title, final_url = check_result
+    status_changed = status != bool(was_up)
+    if status and status_code == 0:
+        # Доступность подтверждена только TCP (движок tcp или TCP после ошибки HTTP) - HTTP-кода нет,
+        # сохраняем прежний, чтобы не сообщать о смене кода ответа
+        status_code = old_status_code or status_code
+    if (not enrich or site_probe_method(site) == 'HEAD') and page_title is None:
+        # Заголовок не запрашивался - сохраняем прежний
+        page_title = old_page_title
+    
+    # Обновляем счетчики
+    total_checks += 1
+    if status:
+        successful_checks += 1
+    
+    # Вычисляем среднее время ответа (скользящее среднее)
+    if response_time > 0:
+        if old_avg_response_time > 0:
+            new_avg_response_time = (old_avg_response_time * 0.8) + (response_time * 0.2)
+        else:
+            new_avg_response_time = response_time
+    else:
+        new_avg_response_time = old_avg_response_time
+
+    # 2. Проверяем SSL (только для обновления данных, без уведомлений)
+    has_ssl, ssl_info, ssl_expires_at = False, None, old_ssl_expires_at
+    if not enrich:
+        has_ssl = had_ssl
+    elif status and url.startswith('https://'):
+        ssl_info = await (probes or PROBE_COALESCER).run(('ssl', normalize_url(url)), lambda: check_ssl_certificate(url))
+        has_ssl = ssl_info.get('has_ssl', False)
+        if has_ssl:
+            ssl_expires_at = ssl_info.get('expiry_date')
+
+    # 3. Безопасное обновление статуса в БД с расширенными данными
+    update_payload = {
+        'is_up': status,
+        'status_code': status_code,
+        'response_time': response_time if response_time > 0 else None,
+        'avg_response_time': new_avg_response_time if new_avg_response_time > 0 else None,
+        'page_title': page_title,
+        'final_url': final_url,
+        'has_ssl': has_ssl,
+        'ssl_expires_at': ssl_expires_at.isoformat() if ssl_expires_at and hasattr(ssl_expires_at, 'isoformat') else ssl_expires_at,
+        'last_check': now.isoformat(),
+        'last_status_change': now.isoformat() if status_changed else site.get('last_status_change'),
+        'total_checks': total_checks,
+        'successful_checks': successful_checks,
+    }
+    if ENABLE_RESPONSE_PHASES:
+        # Фазы времени последней HTTP-попытки (DNS, подключение, TLS, TTFB, загрузка)
+        update_payload['response_phases'] = PROBE_PHASES.get(normalize_url(url))
+    content_hash = old_content_hash
+    fingerprint_rules = site_fingerprint_rules(site)
+    if fingerprint_rules is not None:
+        # Нет нового отпечатка (304, обрезанное тело, сброс нагрузки) - сохраняем прежний
+        if status and enrich:
+            content_hash = CONTENT_FINGERPRINTS.get(fingerprint_key(url, fingerprint_rules)) or old_content_hash
+        update_payload['content_hash'] = content_hash
+    update_success, update_result = await safe_supabase_operation(
+        lambda: supabase.table('botmonitor_sites').update(update_payload).eq('id', site_id).execute(),
+        operation_name=f"update_site_status_{site_id}"
+    )
+    
+    if not update_success:
+        logging.error(f"Не удалось обновить статус сайта {site_id}: {update_result}")
+        # Не отправляем уведомление админу об ошибке обновления одного сайта
+        return
+    
+    # Запись сайта (планировщик, реестр) хранит актуальный статус без повторного чтения из БД
+    site.update(update_payload)
+    SITE_REGISTRY.apply_local_update(site_id, update_payload)
 
-        # 4. Отправляем уведомления (только для нерезервных доменов)
-        if not site.get('is_reserve_domain', False):
-            notifications = []
-            
-            # Изменение доступности
-            if status_changed:
-                if status:
-                    msg = f"✅ Сайт снова доступен!\nURL: {display_url}\nКод ответа: {status_code}"
-                    if response_time > 0:
-                        msg += f"\n⏱️ Время ответа: {response_time:.2f}с"
-                    notifications.append(msg)
-                else:
-                    msg = f"❌ Сайт стал недоступен!\nURL: {display_url}\nКод ответа: {status_code}\nПроверок выполнено: {attempts}/{DOWN_CHECK_ATTEMPTS}"
-                    notifications.append(msg)
-            
-            # Изменение кода ответа (без изменения доступности)
-            elif status and old_status_code and status_code != old_status_code:
-                msg = f"ℹ️ Изменился код ответа сайта\nURL: {display_url}\nБыло: {old_status_code} → Стало: {status_code}"
+    # 4. Отправляем уведомления (только для нерезервных доменов)
+    if not site.get('is_reserve_domain', False):
+        notifications = []
+        
+        # Изменение доступности
+        if status_changed:
+            if status:
+                msg = f"✅ Сайт снова доступен!\nURL: {display_url}\nКод ответа: {status_code}"
+                if response_time > 0:
+                    msg += f"\n⏱️ Время ответа: {response_time:.2f}с"
                 notifications.append(msg)
-            
-            # Изменение заголовка страницы
-            if status and page_title and old_page_title and page_title != old_page_title:
-                msg = f"📝 Изменился заголовок страницы\nURL: {display_url}\nБыло: {old_page_title}\nСтало: {page_title}"
+            else:
+                msg = f"❌ Сайт стал недоступен!\nURL: {display_url}\nКод ответа: {status_code}\nПроверок выполнено: {attempts}/{DOWN_CHECK_ATTEMPTS}"
                 notifications.append(msg)
-            
-            # Изменение конечного URL (редирект)
-            if status and final_url and old_final_url and final_url != old_final_url:
-                msg = f"🔄 Изменился конечный URL\nURL: {display_url}\nБыло: {old_final_url}\nСтало: {final_url}"
+        
+        # Изменение кода ответа (без изменения доступности)
+        elif status and old_status_code and status_code != old_status_code:
+            msg = f"ℹ️ Изменился код ответа сайта\nURL: {display_url}\nБыло: {old_status_code} → Стало: {status_code}"
+            notifications.append(msg)
+        
+        # Изменение заголовка страницы
+        if status and page_title and old_page_title and page_title != old_page_title:
+            msg = f"📝 Изменился заголовок страницы\nURL: {display_url}\nБыло: {old_page_title}\nСтало: {page_title}"
+            notifications.append(msg)
+        
+        # Изменение содержимого страницы (отпечаток с учетом правил очистки)
+        if status and content_hash and old_content_hash and content_hash != old_content_hash:
+            msg = f"🧩 Изменилось содержимое страницы\nURL: {display_url}\nЗаголовок: {page_title or '—'}"
+            notifications.append(msg)
+        
+        # Изменение конечного URL (редирект)
+        if status and final_url and old_final_url and final_url != old_final_url:
+            msg = f"🔄 Изменился конечный URL\nURL: {display_url}\nБыло: {old_final_url}\nСтало: {final_url}"
+            notifications.append(msg)
+        
+        # Значительное увеличение времени ответа (в 2 раза)
+        if status and response_time > 0 and old_avg_response_time > 0:
+            if response_time > (old_avg_response_time * 2) and response_time > 3.0:  # Только если >3 сек
+                msg = f"⚠️ Значительное увеличение времени ответа\nURL: {display_url}\nОбычно: {old_avg_response_time:.2f}с → Сейчас: {response_time:.2f}с"
                 notifications.append(msg)
-            
-            # Значительное увеличение времени ответа (в 2 раза)
-            if status and response_time > 0 and old_avg_response_time > 0:
-                if response_time > (old_avg_response_time * 2) and response_time > 3.0:  # Только если >3 сек
-                    msg = f"⚠️ Значительное увеличение времени ответа\nURL: {display_url}\nОбычно: {old_avg_response_time:.2f}с → Сейчас: {response_time:.2f}с"
-                    notifications.append(msg)
-            
-            # Отправляем все уведомления
-            for notification in notifications:
-                try:
-                    await send_notification(chat_id, notification)
-                    await asyncio.sleep(0.5)  # Небольшая задержка между уведомлениями
-                except Exception as notify_error:
-                    logging.error(f"Ошибка отправки уведомления для сайта {site_id}: {notify_error}")
-    
-    except Exception as e:
-        # Изолируем ошибку конкретного сайта, чтобы она не повлияла на другие
-        site_url = site.get('url', 'unknown')
-        site_id = site.get('id', 'unknown')
-        logging.error(f"Критическая ошибка при проверке сайта {site_url} (ID: {site_id}): {e}", exc_info=True)
-        # Помечаем сайт как недоступный в БД, если возможно
-        try:
-            site_id = site.get('id')
-            if site_id:
-                await safe_supabase_operation(
-                    lambda: supabase.table('botmonitor_sites').update({
-                        'is_up': False,
-                        'last_check': datetime.now(timezone.utc).isoformat()
-                    }).eq('id', site_id).execute(),
-                    operation_name=f"mark_site_down_{site_id}"
-                )
-        except Exception as update_error:
-            logging.error(f"Не удалось обновить статус недоступности для сайта {site.get('id', 'unknown')}: {update_error}")
         
-        # Продолжаем работу, не прерывая цикл проверки других сайтов
-        return
+        # Отправляем все уведомления
+        for notification in notifications:
+            try:
+                await send_notification(chat_id, notification)
+                await asyncio.sleep(0.5)  # Небольшая задержка между уведомлениями
+            except Exception as notify_error:
+                logging.error(f"Ошибка отправки уведомления для сайта {site_id}: {notify_error}")
+
+async def confirmation_probe(url, extract_title=True, method='GET', engine=None, fingerprint_rules=None):
+    """
+    Повторная попытка очереди подтверждения: как и плановая проверка, при сбросе нагрузки
+    не извлекает заголовок и отпечаток, а одновременные проверки того же URL объединяются
+    через PROBE_COALESCER.
+    """
+    if LOAD_SHEDDER.skip_enrichment:
+        extract_title, fingerprint_rules = False, None
+    fingerprint_key_part = fingerprint_rules.key if fingerprint_rules is not None else None
+    return await PROBE_COALESCER.run(
+        ('probe', normalize_url(url), extract_title, method, engine, fingerprint_key_part),
+        lambda: check_site_availability(url, extract_title=extract_title, method=method, engine=engine,
+                                        fingerprint_rules=fingerprint_rules)
+    )
+
+async def complete_confirmed_check(site, check_result):
+    """Callback очереди подтверждения: итоговое решение по сайту после повторных попыток"""
+    try:
+        await process_site_check_result(site, check_result, enrich=not LOAD_SHEDDER.skip_enrichment)
+    except Exception as e:
+        await handle_site_check_error(site, e)
+
+# Очередь неблокирующего подтверждения недоступности (режим NON_BLOCKING_CONFIRMATION).
+# При сбросе нагрузки повторные попытки откладываются так же, как плановые проверки
+CONFIRMATION_QUEUE = ConfirmationQueue(
+    probe_func=confirmation_probe,
+    alternative_func=check_site_alternative,
+    on_complete=complete_confirmed_check,
+    concurrency=CONFIRMATION_CONCURRENCY,
+    defer_func=lambda site: LOAD_SHEDDER.should_defer(site, site.get('check_interval') or CHECK_INTERVAL)
+)
 
 # Функция проверки уведомлений о сроках истечения (один раз в день)
 async def scheduled_notification_check():
@@ -2811,7 +3112,9 @@ async def scheduled_notification_check():
         try:
             # Проверяем уведомления один раз в день в 9:00 UTC
             now = datetime.now(timezone.utc)
-            if now.hour == 9 and now.minute < 5:  # Проверяем в течение 5 минут
+            # При нескольких узлах уведомления о сроках отправляет только ведущий узел
+            is_leader_node = SHARD_LEASES is None or SHARD_LEASES.is_leader
+            if is_leader_node and now.hour == 9 and now.minute < 5:  # Проверяем в течение 5 минут
                 logging.info("Начинаю проверку уведомлений о сроках истечения")
                 
                 # Обновляем кэш резервных доменов раз в сутки
@@ -2980,12 +3283,111 @@ async def check_site_notifications(site, now):
                     logging.error(f"Не удалось обновить дату уведомления о хостинге для сайта {site_id}: {update_result}")
 
 
+# Запуск циклов проверки доступности (в процессе бота или в процессе-проверяльщике)
+async def start_availability_checks():
+    # Общая сессия aiohttp создается заранее, чтобы первый цикл не открывал ее под нагрузкой
+    AIOHTTP_SESSIONS.session()
+    if NON_BLOCKING_CONFIRMATION:
+        CONFIRMATION_QUEUE.start()
+    if ENABLE_SITE_REGISTRY:
+        # Полная загрузка один раз при старте, далее только изменения в фоне
+        await SITE_REGISTRY.load()
+        asyncio.create_task(SITE_REGISTRY.run(SITES_REFRESH_INTERVAL))
+    if CHECK_EXECUTION_MODE == 'priority':
+        return asyncio.create_task(scheduled_priority_check())
+    if CHECK_SMOOTHING:
+        logging.warning("CHECK_SMOOTHING работает только в режиме CHECK_EXECUTION_MODE=priority, сглаживание отключено")
+    if ADAPTIVE_INTERVALS:
+        logging.warning("ADAPTIVE_INTERVALS работает только в режиме CHECK_EXECUTION_MODE=priority, адаптивные интервалы отключены")
+    return asyncio.create_task(scheduled_availability_check())
+
+
+async def start_shard_leases(node_id: str, claim_shards: bool, claim_leader: bool):
+    """Запускает аренду шардов узлом; первый такт выполняется до старта проверок"""
+    global SHARD_LEASES
+    SHARD_LEASES = ShardLeaseManager(
+        SupabaseLeaseStore(supabase),
+        node_id,
+        shard_count=LEASE_SHARD_COUNT,
+        ttl=LEASE_TTL,
+        renew_interval=LEASE_RENEW_INTERVAL,
+        claim_shards=claim_shards,
+        claim_leader=claim_leader
+    )
+    await SHARD_LEASES.tick()
+    asyncio.create_task(SHARD_LEASES.run())
+
+
+async def checker_shard_main():
+    """Цикл событий процесса-проверяльщика: только проверки своего шарда, без Telegram-поллинга"""
+    if ENABLE_SHARD_LEASES:
+        # Каждый процесс - отдельный узел аренды; шарды аренды заменяют шард процесса
+        await start_shard_leases(f"{CHECKER_NODE_ID}/{CHECKER_SHARD[0]}", claim_shards=True, claim_leader=False)
+    checks_task = await start_availability_checks()
+    try:
+        await checks_task
+    finally:
+        await CURL_SESSION_POOL.close()
+        await AIOHTTP_SESSIONS.close()
+
+
+def run_checker_shard(shard_index: int, shard_count: int, message_queue):
+    """Точка входа процесса-проверяльщика (запускается CheckerShardPool)"""
+    global CHECKER_SHARD, SHARD_NOTIFICATION_SINK
+    CHECKER_SHARD = (shard_index, shard_count)
+    SHARD_NOTIFICATION_SINK = ShardNotificationSink(message_queue, shard_index)
+    logging.info(f"Процесс проверки шарда {shard_index + 1}/{shard_count} запущен")
+    asyncio.run(checker_shard_main())
+
+
+# Процессы-проверяльщики многопроцессного режима (создаются при старте, если CHECKER_PROCESSES > 0)
+CHECKER_SHARD_POOL = None
+
 # Запуск периодических проверок как фоновые задачи
 async def on_startup():
-    asyncio.create_task(scheduled_availability_check())
+    global CHECKER_SHARD_POOL
+    if ENABLE_SHARD_LEASES:
+        # В многопроцессном режиме шарды арендуют процессы-проверяльщики, процесс бота - только поллинг
+        await start_shard_leases(CHECKER_NODE_ID, claim_shards=CHECKER_PROCESSES <= 0, claim_leader=True)
+        SHARD_LEASES.on_leadership_lost = lambda: asyncio.create_task(stop_polling_on_lease_loss())
+    if CHECKER_PROCESSES > 0:
+        # Проверки выполняются в отдельных процессах, бот только пересылает их уведомления
+        CHECKER_SHARD_POOL = CheckerShardPool(
+            CHECKER_PROCESSES,
+            target=run_checker_shard,
+            on_notify=send_notification,
+            on_admin=send_admin_notification
+        )
+        CHECKER_SHARD_POOL.start()
+        asyncio.create_task(CHECKER_SHARD_POOL.run())
+        logging.info(f"Проверки доступности выполняются в {CHECKER_PROCESSES} процессах")
+    else:
+        await start_availability_checks()
     asyncio.create_task(scheduled_notification_check())
 
 
+async def stop_polling_on_lease_loss():
+    """Останавливает Telegram-поллинг, если аренду поллинга забрал другой узел"""
+    try:
+        await dp.stop_polling()
+    except RuntimeError:
+        pass  # Поллинг не запущен
+
+
+async def whois_watchdog_while_leader():
+    """
+    WHOIS Watchdog работает только на ведущем узле: при потере аренды поллинга он
+    останавливается (иначе уведомления WHOIS дублировались бы с новым ведущим)
+    и запускается снова, когда узел вернет аренду.
+    """
+    while True:
+        await SHARD_LEASES.wait_leader()
+        watchdog_task = await whois_integration.start_whois_watchdog(supabase, bot)
+        await SHARD_LEASES.wait_leadership_lost()
+        logging.warning(f"Узел {CHECKER_NODE_ID} больше не ведущий, WHOIS Watchdog остановлен")
+        watchdog_task.cancel()
+
+
 async def supervisor():
     """
     Улучшенный supervisor паттерн для обработки сетевых ошибок и перезапуска бота
@@ -2995,6 +3397,10 @@ async def supervisor():
     restart_count = 0
     while True:
         try:
+            # При нескольких узлах поллинг ведет только владелец аренды поллинга
+            if SHARD_LEASES is not None and not SHARD_LEASES.is_leader:
+                logging.info(f"Узел {CHECKER_NODE_ID} ожидает аренду Telegram-поллинга")
+                await SHARD_LEASES.wait_leader()
             start_time = datetime.now(timezone.utc)
             logging.info(f"Запуск бота с улучшенным supervisor паттерном... (перезапуск #{restart_count}, время: {start_time.strftime('%H:%M:%S')})")
             await dp.start_polling(bot)
@@ -3051,11 +3457,19 @@ async def main():
     # Запускаем задачу проверки сайтов при старте (без отправки сообщения)
     await on_startup()
     
+    # Резервный узел проверяет свои шарды, а бот и WHOIS запускает, только став ведущим
+    if SHARD_LEASES is not None and not SHARD_LEASES.is_leader:
+        logging.info(f"Узел {CHECKER_NODE_ID} работает как резервный, ожидание аренды Telegram-поллинга")
+        await SHARD_LEASES.wait_leader()
+    
     # Регистрируем обработчики WHOIS
     whois_integration.register_whois_handlers(dp, supabase, bot)
     
     # Запускаем WHOIS Watchdog (без отправки сообщения)
-    await whois_integration.start_whois_watchdog(supabase, bot)
+    if SHARD_LEASES is None:
+        await whois_integration.start_whois_watchdog(supabase, bot)
+    else:
+        asyncio.create_task(whois_watchdog_while_leader())
     
     # Отправляем одно объединенное уведомление админу о запуске всех компонентов
     cache_info = f"🔄 Кэш резервных доменов: {len(RESERVE_DOMAINS_CACHE)} доменов"
@@ -3079,7 +3493,14 @@ async def main():
     logging.info("🚀 Бот мониторинга запущен (режим отказоустойчивости)")
     
     # Запускаем бота через supervisor
-    await supervisor()
+    try:
+        await supervisor()
+    finally:
+        # Освобождаем аренды, чтобы другие узлы забрали шарды без ожидания LEASE_TTL
+        if SHARD_LEASES is not None:
+            await SHARD_LEASES.release_all()
+        await CURL_SESSION_POOL.close()
+        await AIOHTTP_SESSIONS.close()
 
 
 if __name__ == '__main__':
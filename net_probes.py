@@ -0,0 +1,339 @@
+"""
+Неблокирующие сетевые проверки на цикле событий.
+
+tcp_probe разрешает имя через loop.getaddrinfo (в пуле потоков, цикл не блокируется)
+или через общий кэширующий резолвер (dns_cache.DnsResolverCache) и по очереди подключается ко всем полученным адресам, пока одно из подключений
+не удастся. Неудача классифицируется:
+    dns         - имя не разрешается
+    refused     - хост отвечает, но порт закрыт (RST)
+    timeout     - подключение не установлено за отведенное время
+    unreachable - нет маршрута до хоста или сети
+    error       - прочие ошибки сокета
+
+confirm_host - подтверждение недоступности без внешних программ (ping, nslookup): имя
+разрешается через несколько DNS-резолверов одновременно, затем проверяются TCP-подключения
+к веб-портам по всем найденным адресам.
+
+Сертификат сервера (CertificateInfo) берется из TLS-соединения, которое уже установила
+HTTP-проверка; tls_probe - отдельное неблокирующее TLS-подключение для случаев, когда
+соединения проверки нет (движок curl_cffi, сайт проверен только по TCP, команды бота).
+"""
+
+import asyncio
+import errno
+import hashlib
+import socket
+import ssl
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from bounded_map import BoundedDict
+
+FAILURE_DNS = 'dns'
+FAILURE_REFUSED = 'refused'
+FAILURE_TIMEOUT = 'timeout'
+FAILURE_UNREACHABLE = 'unreachable'
+FAILURE_ERROR = 'error'
+
+# Итоговая причина при разных ошибках по адресам: отказ в подключении означает, что хост жив
+FAILURE_PRIORITY = (FAILURE_REFUSED, FAILURE_TIMEOUT, FAILURE_UNREACHABLE, FAILURE_ERROR)
+
+UNREACHABLE_ERRNOS = {errno.ENETUNREACH, errno.EHOSTUNREACH, errno.ENETDOWN, errno.EHOSTDOWN, errno.EADDRNOTAVAIL}
+
+
+def classify_connect_error(error: BaseException) -> str:
+    """Причина неудачного TCP-подключения по исключению"""
+    if isinstance(error, (asyncio.TimeoutError, socket.timeout)):
+        return FAILURE_TIMEOUT
+    if isinstance(error, socket.gaierror):
+        return FAILURE_DNS
+    if isinstance(error, ConnectionRefusedError):
+        return FAILURE_REFUSED
+    if isinstance(error, OSError) and error.errno in UNREACHABLE_ERRNOS:
+        return FAILURE_UNREACHABLE
+    return FAILURE_ERROR
+
+
+class TcpProbeResult:
+    """Результат TCP-проверки хоста"""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reachable = False
+        self.address: Optional[str] = None
+        self.failure: Optional[str] = None
+        self.error: Optional[str] = None
+        self.dns_time = 0.0
+        # Время установления успешного подключения (без разрешения имени)
+        self.connect_time = 0.0
+        self.elapsed = 0.0
+        # Попытки по адресам: (адрес, причина неудачи или None)
+        self.attempts: List[Tuple[str, Optional[str]]] = []
+
+    def describe(self) -> str:
+        if self.reachable:
+            return (f"{self.host}:{self.port} доступен через {self.address} "
+                    f"(DNS {self.dns_time:.3f}с, подключение {self.connect_time:.3f}с)")
+        tried = ", ".join(f"{address}: {failure}" for address, failure in self.attempts)
+        return f"{self.host}:{self.port} недоступен ({self.failure}: {self.error}){' [' + tried + ']' if tried else ''}"
+
+    def __repr__(self) -> str:
+        return f"<TcpProbeResult {self.host}:{self.port} {'up' if self.reachable else self.failure}>"
+
+
+async def _connect(family: int, sockaddr, timeout: float):
+    """Неблокирующее подключение к одному адресу; сокет закрывается сразу после установления"""
+    loop = asyncio.get_running_loop()
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    try:
+        sock.setblocking(False)
+        await asyncio.wait_for(loop.sock_connect(sock, sockaddr), timeout=timeout)
+    finally:
+        sock.close()
+
+
+async def resolve_addresses(host: str, port: int, resolver=None) -> List[Tuple[int, tuple]]:
+    """Адреса (family, sockaddr) для подключения к host:port без повторов"""
+    if resolver is not None:
+        return await resolver.getaddrinfo(host, port)
+    infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    addresses = []
+    for family, _, _, _, sockaddr in infos:
+        if (family, sockaddr) not in addresses:
+            addresses.append((family, sockaddr))
+    return addresses
+
+
+async def tcp_probe(host: str, port: int, timeout: float = 5.0,
+                    addresses: Optional[List[Tuple[int, tuple]]] = None, resolver=None) -> TcpProbeResult:
+    """
+    TCP-подключение к host:port с общим таймаутом timeout (включая разрешение имени).
+    Адреса перебираются по очереди; каждому достается остаток общего времени,
+    поделенный на число непроверенных адресов, чтобы недоступный первый адрес
+    не съедал все время. addresses - уже разрешенные (family, sockaddr), без DNS;
+    resolver - объект с async getaddrinfo(host, port) вместо loop.getaddrinfo.
+    """
+    result = TcpProbeResult(host, port)
+    start = time.monotonic()
+    deadline = start + timeout
+
+    if addresses is None:
+        try:
+            addresses = await asyncio.wait_for(resolve_addresses(host, port, resolver), timeout=timeout)
+        except (socket.gaierror, asyncio.TimeoutError, UnicodeError) as e:
+            result.failure = FAILURE_DNS
+            result.error = str(e) or type(e).__name__
+            result.elapsed = result.dns_time = time.monotonic() - start
+            return result
+    result.dns_time = time.monotonic() - start
+
+    failures = []
+    for index, (family, sockaddr) in enumerate(addresses):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        attempt_timeout = remaining / (len(addresses) - index)
+        attempt_start = time.monotonic()
+        try:
+            await _connect(family, sockaddr, attempt_timeout)
+        except (OSError, asyncio.TimeoutError) as e:
+            failure = classify_connect_error(e)
+            result.attempts.append((sockaddr[0], failure))
+            failures.append((failure, str(e) or type(e).__name__))
+            continue
+        result.attempts.append((sockaddr[0], None))
+        result.reachable = True
+        result.address = sockaddr[0]
+        result.connect_time = time.monotonic() - attempt_start
+        result.elapsed = time.monotonic() - start
+        return result
+
+    if failures:
+        result.failure, result.error = min(failures, key=lambda item: FAILURE_PRIORITY.index(item[0]))
+    elif not addresses:
+        result.failure, result.error = FAILURE_DNS, "имя не разрешается ни в один адрес"
+    else:
+        result.failure, result.error = FAILURE_TIMEOUT, "нет времени на подключение"
+    result.elapsed = time.monotonic() - start
+    return result
+
+
+# Итоги confirm_host (вторая часть результата check_site_alternative)
+CONFIRM_TCP_SUCCESS = 'tcp_success'
+CONFIRM_TCP_FAILED = 'tcp_failed'
+CONFIRM_DNS_FAILED = 'dns_failed'
+CONFIRM_DNS_TIMEOUT = 'dns_timeout'
+
+
+class HostConfirmation:
+    """Результат подтверждения: ответы каждого резолвера и каждого порта"""
+
+    def __init__(self, host: str):
+        self.host = host
+        # Резолвер -> найденные IP или описание ошибки
+        self.dns: Dict[str, Any] = {}
+        self.tcp: List[TcpProbeResult] = []
+        self.available = False
+        self.verdict = CONFIRM_DNS_FAILED
+        self.elapsed = 0.0
+
+    def addresses(self) -> List[Tuple[int, str]]:
+        """Адреса, найденные хотя бы одним резолвером, без повторов"""
+        found: List[Tuple[int, str]] = []
+        for answer in self.dns.values():
+            if isinstance(answer, list):
+                found.extend(address for address in answer if address not in found)
+        return found
+
+    def describe(self) -> str:
+        steps = []
+        for name, answer in self.dns.items():
+            steps.append(f"DNS {name}: " + (", ".join(ip for _, ip in answer) if isinstance(answer, list) else answer))
+        steps.extend(f"TCP {result.describe()}" for result in self.tcp)
+        return f"{self.verdict} за {self.elapsed:.2f}с [" + "; ".join(steps) + "]"
+
+
+async def _lookup_answer(resolver, host: str, timeout: float):
+    """Ответ одного резолвера: список адресов или описание ошибки"""
+    try:
+        addresses = await asyncio.wait_for(resolver.lookup(host), timeout=timeout)
+    except asyncio.TimeoutError:
+        return 'timeout'
+    except socket.gaierror as e:
+        return 'nxdomain' if e.errno == socket.EAI_NONAME else f"error: {e}"
+    except (OSError, UnicodeError) as e:
+        return f"error: {e}"
+    return addresses or 'nxdomain'
+
+
+async def confirm_host(host: str, resolvers: Dict[str, Any], ports: Sequence[int] = (80, 443),
+                       timeout: float = 10.0) -> HostConfirmation:
+    """
+    Подтверждает доступность хоста. resolvers - имя -> объект с async lookup(host),
+    возвращающим [(family, ip)] (dns_cache.DnsResolverCache). Хост доступен, если имя
+    разрешилось хотя бы одним резолвером и принято TCP-подключение хотя бы к одному порту.
+    На DNS и на TCP отводится по половине timeout.
+    """
+    result = HostConfirmation(host)
+    start = time.monotonic()
+    answers = await asyncio.gather(*(_lookup_answer(resolver, host, timeout / 2) for resolver in resolvers.values()))
+    result.dns = dict(zip(resolvers, answers))
+
+    addresses = result.addresses()
+    if not addresses:
+        result.verdict = (CONFIRM_DNS_TIMEOUT if answers and all(answer == 'timeout' for answer in answers)
+                          else CONFIRM_DNS_FAILED)
+    else:
+        result.tcp = list(await asyncio.gather(*(
+            tcp_probe(host, port, timeout=timeout / 2, addresses=[(family, (ip, port)) for family, ip in addresses])
+            for port in ports
+        )))
+        result.available = any(probe.reachable for probe in result.tcp)
+        result.verdict = CONFIRM_TCP_SUCCESS if result.available else CONFIRM_TCP_FAILED
+    result.elapsed = time.monotonic() - start
+    return result
+
+
+def _name_field(name, field: str = 'commonName') -> str:
+    """Поле из имени субъекта/издателя в формате ssl.getpeercert()"""
+    for rdn in name or ():
+        for key, value in rdn:
+            if key == field:
+                return value
+    return 'Unknown'
+
+
+class CertificateInfo:
+    """Метаданные проверенного сертификата сервера"""
+
+    def __init__(self, not_after: datetime, issuer: str, subject: str, sans: List[str], fingerprint: str):
+        self.not_after = not_after
+        self.issuer = issuer
+        self.subject = subject
+        self.sans = sans
+        # SHA-256 сертификата в DER - отличает перевыпущенный сертификат
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def from_ssl_object(cls, ssl_object) -> Optional['CertificateInfo']:
+        """
+        Сертификат из ssl.SSLObject установленного соединения. Без проверки цепочки
+        getpeercert() возвращает пустой словарь - такой сертификат не учитывается.
+        """
+        if ssl_object is None:
+            return None
+        cert = ssl_object.getpeercert()
+        der = ssl_object.getpeercert(binary_form=True)
+        if not cert or not der:
+            return None
+        not_after = datetime.fromtimestamp(ssl.cert_time_to_seconds(cert['notAfter']), timezone.utc)
+        sans = [value for kind, value in cert.get('subjectAltName', ()) if kind in ('DNS', 'IP Address')]
+        return cls(not_after, _name_field(cert.get('issuer')), _name_field(cert.get('subject')), sans,
+                   hashlib.sha256(der).hexdigest())
+
+    def days_left(self, now: Optional[datetime] = None) -> int:
+        return (self.not_after - (now or datetime.now(timezone.utc))).days
+
+    def __repr__(self) -> str:
+        return f"<CertificateInfo {self.subject} до {self.not_after:%Y-%m-%d}>"
+
+
+async def _open_tls(host: str, port: int, context: ssl.SSLContext, resolver):
+    """TLS-соединение с первым ответившим адресом хоста; имя хоста передается в SNI и проверку"""
+    if resolver is None:
+        return await asyncio.open_connection(host, port, ssl=context, server_hostname=host)
+    error: Optional[BaseException] = None
+    for _, sockaddr in await resolver.getaddrinfo(host, port):
+        try:
+            return await asyncio.open_connection(sockaddr[0], port, ssl=context, server_hostname=host)
+        except ssl.SSLError:
+            raise
+        except OSError as e:
+            error = e
+    raise error or OSError(f"{host}: нет адресов для подключения")
+
+
+async def tls_probe(host: str, port: int = 443, timeout: float = 10.0,
+                    context: Optional[ssl.SSLContext] = None, resolver=None) -> CertificateInfo:
+    """
+    Неблокирующее TLS-подключение к host:port с проверкой цепочки и имени хоста.
+    resolver - как в tcp_probe. Ошибки (DNS, таймаут, ssl.SSLError) пробрасываются.
+    """
+    context = context or ssl.create_default_context()
+    _, writer = await asyncio.wait_for(_open_tls(host, port, context, resolver), timeout=timeout)
+    try:
+        info = CertificateInfo.from_ssl_object(writer.get_extra_info('ssl_object'))
+    finally:
+        writer.close()
+        try:
+            await asyncio.wait_for(writer.wait_closed(), timeout=1)
+        except (OSError, asyncio.TimeoutError, ssl.SSLError):
+            pass
+    if info is None:
+        raise ssl.SSLError("сервер не предъявил сертификат")
+    return info
+
+
+class PeerCertificateLog:
+    """
+    Сертификаты, полученные HTTP-проверками, по хосту и порту. Обработка результата проверки
+    берет сертификат отсюда вместо повторного TLS-рукопожатия; запись старше max_age
+    не используется.
+    """
+
+    def __init__(self, max_age: float = 600, max_hosts: int = 10000, clock=time.monotonic):
+        self.max_age = max_age
+        self.clock = clock
+        self._certificates: Dict[Tuple[str, int], Tuple[float, CertificateInfo]] = BoundedDict(max_hosts)
+
+    def record(self, host: str, port: int, info: CertificateInfo):
+        key = (host.lower(), port)
+        self._certificates[key] = (self.clock(), info)
+
+    def get(self, host: str, port: int = 443) -> Optional[CertificateInfo]:
+        entry = self._certificates.get((host.lower(), port))
+        if entry is None or self.clock() - entry[0] > self.max_age:
+            return None
+        return entry[1]
@@ -0,0 +1,142 @@
+"""
+Дедупликация проверок одного и того же URL.
+
+Один и тот же сайт может отслеживаться несколькими записями (разные чаты, дубликаты,
+см. remove_duplicates.sql). Записи группируются по нормализованному URL до запуска
+проверок (group_sites), и группа проверяется одним запросом (ProbeGroup). Кроме того,
+одновременные запросы одного URL ждут одну проверку, а результат переиспользуется в течение
+короткого TTL (ProbeCoalescer).
+Обработка результата (запись в БД, уведомления) по-прежнему выполняется для каждой записи.
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Нормализует URL для сравнения: схема и хост в нижнем регистре, без порта по умолчанию,
+    без фрагмента и без завершающего слеша у пустого пути.
+    """
+    try:
+        parts = urlsplit((url or '').strip())
+        scheme = parts.scheme.lower()
+        host = (parts.hostname or '').rstrip('.')
+        port = parts.port
+    except ValueError:
+        return (url or '').strip().lower()
+    netloc = host
+    if port and DEFAULT_PORTS.get(scheme) != port:
+        netloc = f"{host}:{port}"
+    path = parts.path if parts.path not in ('', '/') else ''
+    return urlunsplit((scheme, netloc, path, parts.query, ''))
+
+
+class ProbeCoalescer:
+    """
+    Объединение одинаковых проверок.
+
+    run(key, func) выполняет func() один раз для всех одновременных вызовов с тем же ключом,
+    а в течение ttl секунд после завершения возвращает сохраненный результат.
+    Ошибки не кэшируются. При enabled=False func() вызывается напрямую.
+    """
+
+    def __init__(self, ttl: float = 30, enabled: bool = True, max_entries: int = 10000):
+        self.ttl = ttl
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self._results: Dict[Hashable, Tuple[float, Any]] = {}
+        self.probes = 0
+        self.joined = 0
+        self.cache_hits = 0
+        # Записи группы, получившие результат проверки другой записи (ProbeGroup)
+        self.shared = 0
+
+    def _purge(self, now: float):
+        if len(self._results) <= self.max_entries:
+            return
+        for key in [key for key, (stored_at, _) in self._results.items() if now - stored_at >= self.ttl]:
+            del self._results[key]
+
+    async def run(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        if not self.enabled:
+            return await func()
+
+        now = time.monotonic()
+        cached = self._results.get(key)
+        if cached is not None and now - cached[0] < self.ttl:
+            self.cache_hits += 1
+            return cached[1]
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.joined += 1
+        else:
+            self.probes += 1
+            task = asyncio.ensure_future(func())
+            self._in_flight[key] = task
+
+            def on_done(done_task, key=key):
+                self._in_flight.pop(key, None)
+                if not done_task.cancelled() and done_task.exception() is None:
+                    finished = time.monotonic()
+                    self._results[key] = (finished, done_task.result())
+                    self._purge(finished)
+
+            task.add_done_callback(on_done)
+
+        # shield: отмена одного из ожидающих не отменяет общую проверку
+        return await asyncio.shield(task)
+
+    def take_stats(self) -> Dict[str, int]:
+        """Статистика с момента предыдущего вызова"""
+        stats = {'probes': self.probes, 'joined': self.joined, 'cache_hits': self.cache_hits, 'shared': self.shared}
+        self.probes = self.joined = self.cache_hits = self.shared = 0
+        return stats
+
+    def summary(self) -> str:
+        stats = self.take_stats()
+        saved = stats['joined'] + stats['cache_hits'] + stats['shared']
+        return f"запросов {stats['probes']}, объединено {saved}"
+
+
+def group_sites(sites: List[Dict[str, Any]],
+                key_func: Optional[Callable[[Dict[str, Any]], Hashable]] = None) -> List[List[Dict[str, Any]]]:
+    """
+    Группирует записи сайтов по ключу (обычно нормализованному URL) с сохранением порядка
+    первого появления. Без key_func каждая запись - отдельная группа.
+    """
+    if key_func is None:
+        return [[site] for site in sites]
+    groups: Dict[Hashable, List[Dict[str, Any]]] = {}
+    for site in sites:
+        groups.setdefault(key_func(site), []).append(site)
+    return list(groups.values())
+
+
+class ProbeGroup:
+    """
+    Проверки одной группы записей (одного URL).
+
+    Интерфейс совпадает с ProbeCoalescer.run: первая запись группы выполняет проверку
+    через coalescer, остальные получают ее результат независимо от TTL. Ошибки не
+    сохраняются - следующая запись повторит проверку. Полученные так результаты
+    учитываются в статистике coalescer (shared).
+    """
+
+    def __init__(self, coalescer: ProbeCoalescer):
+        self.coalescer = coalescer
+        self._results: Dict[Hashable, Any] = {}
+
+    async def run(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        if key in self._results:
+            self.coalescer.shared += 1
+            return self._results[key]
+        result = await self.coalescer.run(key, func)
+        self._results[key] = result
+        return result
@@ -0,0 +1,580 @@
+"""
+Движки HTTP/TCP-проверки сайтов с общим интерфейсом.
+
+Движок выполняет один запрос и возвращает ProbeResult: код ответа, время, заголовок
+страницы, конечный URL и фазы времени. Сетевые ошибки движок пробрасывает - решение
+о доступности (TCP-проверка при 401/403 и при ошибке) принимает check_site_availability.
+
+Зарегистрированы движки:
+    auto    - aiohttp, а curl_cffi только для хостов, которые блокируют обычный клиент
+    curl    - curl_cffi с имперсонацией браузера (обходит защиту от ботов, самый дорогой)
+    aiohttp - обычный HTTP-клиент без имперсонации
+    tcp     - только TCP-подключение к порту сайта, без HTTP
+Движок выбирается для сайта колонкой probe_engine, по умолчанию - PROBE_ENGINE_DEFAULT.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import aiohttp
+
+from body_reader import DEFAULT_TITLE_READ_LIMIT, BodyBudget, BodyLimits, read_title
+from bounded_map import BoundedDict
+from content_fingerprint import ContentFingerprint
+from http_sessions import HEAD_REJECTED_STATUSES, ValidatorCache, close_stream
+from net_probes import CertificateInfo
+from probe_coalescer import normalize_url
+from probe_timings import PhaseTimer, curl_body_wait, curl_phases
+
+# User-Agent Chrome 120 для движка aiohttp (максимальная совместимость без имперсонации TLS)
+CHROME_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+# CURLINFO_SIZE_DOWNLOAD (double): в CurlInfo curl_cffi 0.6.2 его нет, а SIZE_DOWNLOAD_T (off_t)
+# не поддерживает Curl.getinfo
+CURLINFO_SIZE_DOWNLOAD = 0x300000 + 8
+
+# Признаки страницы-проверки защиты от ботов (Cloudflare, DDoS-Guard и т.п.)
+BLOCKED_STATUSES = {401, 403}
+CHALLENGE_TITLES = ('just a moment', 'attention required', 'checking your browser', 'ddos-guard', 'access denied')
+CHALLENGE_SERVERS = ('cloudflare', 'ddos-guard')
+
+
+def is_bot_challenge(status_code: int, headers, page_title: Optional[str] = None) -> bool:
+    """Ответ похож на страницу-проверку защиты от ботов, а не на ответ самого сайта"""
+    if (headers.get('cf-mitigated') or '').lower() == 'challenge':
+        return True
+    if page_title and any(marker in page_title.lower() for marker in CHALLENGE_TITLES):
+        return True
+    server = (headers.get('Server') or '').lower()
+    return status_code == 503 and any(name in server for name in CHALLENGE_SERVERS)
+
+
+class ProbeResult:
+    """Результат одного запроса движка проверки"""
+
+    def __init__(self, status_code: int, response_time: float, final_url: str,
+                 page_title: Optional[str] = None, check_type: str = "http",
+                 phases: Optional[Dict[str, float]] = None, not_modified: bool = False,
+                 is_available: Optional[bool] = None, bot_challenge: bool = False, body_truncated: bool = False,
+                 content_hash: Optional[str] = None):
+        self.status_code = status_code
+        self.response_time = response_time
+        self.final_url = final_url
+        self.page_title = page_title
+        self.check_type = check_type
+        self.phases = phases
+        # Ответ 304 на условный запрос: страница не изменилась, поля взяты из прошлой загрузки
+        self.not_modified = not_modified
+        # Ответ - страница-проверка защиты от ботов (см. is_bot_challenge)
+        self.bot_challenge = bot_challenge
+        # Загрузка тела прервана жестким лимитом (BodyLimits); на доступность не влияет
+        self.body_truncated = body_truncated
+        # Отпечаток всего тела (только если он запрашивался и тело прочитано полностью)
+        self.content_hash = content_hash
+        self.is_available = 200 <= status_code < 300 if is_available is None else is_available
+
+    def as_tuple(self) -> Tuple[bool, int, float, Optional[str], str, str]:
+        """Кортеж в формате check_site_availability"""
+        return self.is_available, self.status_code, self.response_time, self.page_title, self.final_url, self.check_type
+
+    def __repr__(self) -> str:
+        return f"<ProbeResult {self.check_type} {self.status_code} {self.response_time:.3f}s>"
+
+
+class ProbeEngine:
+    """
+    Интерфейс движка проверки.
+
+    probe() выполняет запрос и возвращает ProbeResult или пробрасывает сетевую ошибку.
+    Если передан fingerprint (ContentFingerprint), тело читается целиком и хэшируется.
+    is_critical_error() отличает сбой самого движка (о нем уведомляется администратор)
+    от недоступности сайта.
+    """
+
+    name = ''
+
+    async def probe(self, url: str, extract_title: bool = True, method: str = 'GET',
+                    fingerprint: Optional[ContentFingerprint] = None) -> ProbeResult:
+        raise NotImplementedError
+
+    def is_critical_error(self, error: Exception) -> bool:
+        return False
+
+
+class HttpProbeEngine(ProbeEngine):
+    """
+    Общая часть HTTP-движков: HEAD с возвратом к GET, условные запросы и
+    извлечение заголовка из начала тела.
+    """
+
+    def __init__(self, validators: Optional[ValidatorCache] = None, methods=None,
+                 title_limit: int = DEFAULT_TITLE_READ_LIMIT, timeout: float = 30, title_timeout: float = 10,
+                 body_limits: Optional[BodyLimits] = None, certificates=None):
+        self.validators = validators
+        # PeerCertificateLog: сертификаты из TLS-соединений проверок (только движок aiohttp;
+        # curl_cffi 0.6.2 не умеет отдавать CURLINFO_CERTINFO)
+        self.certificates = certificates
+        self.methods = methods
+        self.title_limit = title_limit
+        self.body_limits = body_limits if body_limits is not None else BodyLimits()
+        self.timeout = timeout
+        self.title_timeout = title_timeout
+
+    def use_head(self, url: str, method: str) -> bool:
+        if method != 'HEAD':
+            return False
+        return self.methods is None or self.methods.method_for(urlparse(url).hostname or '') == 'HEAD'
+
+    def head_result(self, url: str, status_code: int) -> bool:
+        """Учитывает ответ на HEAD; False - сервер отклонил HEAD и нужен GET"""
+        host = urlparse(url).hostname or ''
+        if status_code in HEAD_REJECTED_STATUSES:
+            logging.debug(f"Сервер {host} отклонил HEAD ({status_code}), проверяем через GET")
+            if self.methods is not None:
+                self.methods.remember(host, 'GET')
+            return False
+        if self.methods is not None:
+            self.methods.remember(host, 'HEAD')
+        return True
+
+    def lookup_validators(self, url: str, extract_title: bool):
+        if self.validators is None or not extract_title:
+            return None
+        return self.validators.lookup(normalize_url(url))
+
+    def store_validators(self, url: str, response_headers, status_code: int, page_title, final_url: str):
+        if self.validators is not None and 200 <= status_code < 300:
+            self.validators.store(normalize_url(url), response_headers, status_code, page_title, final_url)
+
+    def not_modified(self, validators, response_time: float, phases) -> ProbeResult:
+        """Ответ 304: сайт доступен, страница не изменилась с прошлой загрузки"""
+        self.validators.record_not_modified(validators)
+        return ProbeResult(validators['status_code'], response_time, validators['final_url'],
+                           validators['page_title'], phases=phases, not_modified=True)
+
+    async def read_title(self, url: str, chunks, content_type: Optional[str], budget: BodyBudget,
+                         fingerprint: Optional[ContentFingerprint] = None) -> Tuple[Optional[str], bool]:
+        """
+        Заголовок страницы и признак полного чтения. Части тела приходят через budget;
+        неудачное или прерванное лимитом чтение не сохраняется в валидаторах.
+        С fingerprint части хэшируются по мере получения, а после заголовка дочитывается остаток тела.
+        """
+        if fingerprint is not None:
+            chunks = self._fingerprinted(chunks, fingerprint)
+
+        async def read():
+            title = await read_title(chunks, content_type, self.title_limit)
+            if fingerprint is not None:
+                async for _ in chunks:
+                    pass
+            return title
+
+        page_title, complete = None, False
+        try:
+            page_title = await asyncio.wait_for(read(), timeout=self.title_timeout)
+            complete = True
+        except asyncio.TimeoutError:
+            logging.warning(f"Таймаут при получении контента для {url}")
+        except Exception as title_error:
+            logging.debug(f"Не удалось извлечь заголовок для {url}: {title_error}")
+        if budget.truncated:
+            self.body_limits.record(budget)
+            logging.warning(f"Загрузка тела {url} прервана по лимиту ({budget.truncated}): "
+                            f"загружено {budget.downloaded} байт, распаковано {budget.decompressed} байт")
+            complete = False
+        return page_title, complete
+
+    @staticmethod
+    async def _fingerprinted(chunks, fingerprint: ContentFingerprint):
+        async for chunk in chunks:
+            fingerprint.update(chunk)
+            yield chunk
+
+    @staticmethod
+    def content_hash(fingerprint: Optional[ContentFingerprint], complete: bool) -> Optional[str]:
+        return fingerprint.hexdigest() if fingerprint is not None and complete else None
+
+
+class CurlProbeEngine(HttpProbeEngine):
+    """curl_cffi с имперсонацией Chrome 120 через пул долгоживущих сессий"""
+
+    name = 'curl'
+
+    def __init__(self, pool, **kwargs):
+        super().__init__(**kwargs)
+        self.pool = pool
+
+    async def probe(self, url: str, extract_title: bool = True, method: str = 'GET',
+                    fingerprint: Optional[ContentFingerprint] = None) -> ProbeResult:
+        start_time = time.time()
+        if fingerprint is None and self.use_head(url, method):
+            # Только заголовки ответа, тело не передается
+            response = await self.pool.request('HEAD', url, timeout=self.timeout)
+            if self.head_result(url, response.status_code):
+                return ProbeResult(response.status_code, time.time() - start_time, response.url,
+                                   phases=curl_phases(response.infos),
+                                   bot_challenge=is_bot_challenge(response.status_code, response.headers))
+
+        # Валидаторы прошлой загрузки: если страница не изменилась, сервер ответит 304 без тела
+        validators = self.lookup_validators(url, extract_title)
+        # Ответ читается потоком: после заголовков загружается только начало тела
+        response = await self.pool.get(url, timeout=self.timeout, stream=True,
+                                       headers=ValidatorCache.request_headers(validators) or None)
+        # Время ответа - до получения заголовков, как у aiohttp: чтение тела в него не входит.
+        # curl_cffi возвращает ответ после первой части тела - вычитаем ожидание после заголовков
+        body_wait = curl_body_wait(response.infos)
+        response_time = time.time() - start_time - body_wait
+        headers_received = time.perf_counter() - body_wait
+        page_title = content_hash = None
+        budget = self.body_limits.budget(self.downloaded_counter(response))
+        try:
+            if (extract_title or fingerprint is not None) and response.status_code < 400 and response.status_code != 304:
+                # libcurl распаковывает тело сам частями до 16 КБ, загруженные байты берутся из его счетчика
+                page_title, complete = await self.read_title(url, budget.chunks(response.aiter_content()),
+                                                             response.headers.get('Content-Type'), budget, fingerprint)
+                content_hash = self.content_hash(fingerprint, complete)
+                if not extract_title:
+                    page_title = None
+                elif complete:
+                    self.store_validators(url, response.headers, response.status_code, page_title, response.url)
+        finally:
+            # Прерываем передачу остатка тела (если он еще загружается)
+            await close_stream(response)
+        # Тайминги libcurl сняты при получении заголовков, чтение тела измеряется отдельно
+        phases = curl_phases(response.infos, download=time.perf_counter() - headers_received)
+
+        if validators is not None and response.status_code == 304:
+            return self.not_modified(validators, response_time, phases)
+        return ProbeResult(response.status_code, response_time, response.url, page_title, phases=phases,
+                           bot_challenge=is_bot_challenge(response.status_code, response.headers, page_title),
+                           body_truncated=budget.truncated is not None, content_hash=content_hash)
+
+    @staticmethod
+    def downloaded_counter(response) -> Optional[Callable[[], int]]:
+        """
+        Байты тела, загруженные libcurl до распаковки (включая еще не прочитанные из очереди).
+
+        Счетчик libcurl читается, только пока идет передача: по ее завершении curl_cffi
+        сбрасывает дескриптор и возвращает его в пул для других запросов, поэтому дальше
+        используется последнее снятое значение.
+        Очередь частей потокового ответа curl_cffi не ограничена, а своей функции записи
+        libcurl здесь не задать (ее занимает потоковый режим). Поэтому лимит загрузки
+        проверяется при чтении частей: он прерывает медленную или бесконечную передачу,
+        но быстрый сервер может передать тело целиком раньше, чем лимит будет проверен.
+        Объем обрабатываемых данных в любом случае ограничен лимитом распакованного тела.
+        """
+        curl = getattr(response, 'curl', None)
+        stream_task = getattr(response, 'stream_task', None)
+        if curl is None or stream_task is None:
+            return None
+        snapshot = [0]
+
+        def downloaded() -> int:
+            if not stream_task.done():
+                snapshot[0] = max(snapshot[0], int(curl.getinfo(CURLINFO_SIZE_DOWNLOAD)))
+            return snapshot[0]
+
+        return downloaded
+
+    def is_critical_error(self, error: Exception) -> bool:
+        error_msg = str(error)
+        return "Curlm" in error_msg or "curl" in error_msg.lower() or "libcurl" in error_msg.lower()
+
+
+class AiohttpProbeEngine(HttpProbeEngine):
+    """aiohttp через общую сессию с пулом соединений и кэшем DNS"""
+
+    name = 'aiohttp'
+
+    def __init__(self, sessions, user_agent: str = CHROME_USER_AGENT, connect_timeout: float = 10, **kwargs):
+        super().__init__(**kwargs)
+        self.sessions = sessions
+        self.user_agent = user_agent
+        self.connect_timeout = connect_timeout
+
+    async def probe(self, url: str, extract_title: bool = True, method: str = 'GET',
+                    fingerprint: Optional[ContentFingerprint] = None) -> ProbeResult:
+        start_time = time.time()
+        if fingerprint is None and self.use_head(url, method):
+            result = await self._request(url, 'HEAD', start_time, False, None)
+            if self.head_result(url, result.status_code):
+                return result
+        validators = self.lookup_validators(url, extract_title)
+        return await self._request(url, 'GET', start_time, extract_title, validators, fingerprint)
+
+    async def _request(self, url: str, method: str, start_time: float, extract_title: bool, validators,
+                       fingerprint: Optional[ContentFingerprint] = None) -> ProbeResult:
+        # Сжатие распаковывается самостоятельно (BodyBudget.decode), чтобы ограничить распакованный объем
+        headers = {'User-Agent': self.user_agent, 'Accept-Encoding': 'gzip, deflate'}
+        headers.update(ValidatorCache.request_headers(validators))
+        timeout = aiohttp.ClientTimeout(total=self.timeout, connect=self.connect_timeout)
+        # Отметки фаз запроса записываются через TraceConfig общей сессии
+        timer = PhaseTimer()
+        # Устанавливаем max_redirects=7 как у конкурента
+        async with self.sessions.request(method, url, headers=headers, timeout=timeout, allow_redirects=True,
+                                         max_redirects=7, trace_request_ctx=timer, auto_decompress=False) as response:
+            response_time = time.time() - start_time
+            headers_received = time.perf_counter()
+            self.record_certificate(response)
+            if validators is not None and response.status == 304:
+                return self.not_modified(validators, response_time, timer.phases())
+
+            final_url = str(response.url)
+            page_title = content_hash = None
+            budget = self.body_limits.budget()
+            if (extract_title or fingerprint is not None) and response.status < 400:
+                # Читаем только начало страницы до </title>; недочитанный ответ aiohttp
+                # при освобождении закрывает соединение, не загружая остаток
+                chunks = budget.decode(response.content.iter_chunked(8192), response.headers.get('Content-Encoding'))
+                page_title, complete = await self.read_title(url, chunks, response.headers.get('Content-Type'), budget, fingerprint)
+                content_hash = self.content_hash(fingerprint, complete)
+                if not extract_title:
+                    page_title = None
+                elif complete:
+                    self.store_validators(url, response.headers, response.status, page_title, final_url)
+            phases = timer.phases(download=time.perf_counter() - headers_received)
+            return ProbeResult(response.status, response_time, final_url, page_title, phases=phases,
+                               bot_challenge=is_bot_challenge(response.status, response.headers, page_title),
+                               body_truncated=budget.truncated is not None, content_hash=content_hash)
+
+    def record_certificate(self, response):
+        """
+        Сохраняет сертификат из TLS-соединения ответа. Ключ - хост в punycode (raw_host),
+        как в URL сайта, по которому его ищет check_ssl_certificate; url.host у IDN-доменов
+        раскодирован в Unicode.
+        """
+        if self.certificates is None or response.url.scheme != 'https':
+            return
+        transport = self.response_transport(response)
+        if transport is None:
+            return
+        info = CertificateInfo.from_ssl_object(transport.get_extra_info('ssl_object'))
+        if info is not None:
+            self.certificates.record(response.url.raw_host, response.url.port, info)
+
+    @staticmethod
+    def response_transport(response):
+        """Транспорт соединения, по которому получен ответ (None, если он уже недоступен)"""
+        connection = response.connection
+        if connection is not None and connection.transport is not None:
+            return connection.transport
+        # Если тело уже получено целиком (HEAD, 304, небольшая страница), aiohttp сразу
+        # возвращает соединение в пул, и транспорт остается только у протокола ответа -
+        # приватного ClientResponse._protocol (aiohttp 3.9, версия закреплена в requirements.txt).
+        # Если атрибута нет, сертификат получит отдельная TLS-проверка
+        protocol = getattr(response, '_protocol', None)
+        return protocol.transport if protocol is not None else None
+
+    def is_critical_error(self, error: Exception) -> bool:
+        error_msg = str(error)
+        return "ClientError" in error_msg or "ServerDisconnectedError" in error_msg or "ConnectorError" in error_msg
+
+
+class ImpersonationPins:
+    """
+    Хосты, которым нужна имперсонация браузера.
+
+    Хост закрепляется за имперсонацией, когда обычный клиент получил блокировку, а
+    имперсонирующий - нормальный ответ. Если отказ получили оба клиента (закрытый раздел,
+    сайт запрещает доступ всем), хост помечается как "имперсонация бесполезна", чтобы
+    не удваивать запросы. Через ttl секунд отметки снимаются и хост оценивается заново.
+    """
+
+    def __init__(self, ttl: float = 21600, max_hosts: int = 10000, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self._pinned: Dict[str, float] = BoundedDict(max_hosts)
+        self._futile: Dict[str, float] = BoundedDict(max_hosts)
+
+    def _active(self, marks: Dict[str, float], host: str) -> bool:
+        marked_at = marks.get(host)
+        if marked_at is None:
+            return False
+        if self.clock() - marked_at >= self.ttl:
+            del marks[host]
+            return False
+        return True
+
+    def _mark(self, marks: Dict[str, float], host: str):
+        marks[host] = self.clock()
+
+    def is_pinned(self, host: str) -> bool:
+        return self._active(self._pinned, host)
+
+    def is_futile(self, host: str) -> bool:
+        return self._active(self._futile, host)
+
+    def pin(self, host: str):
+        self._futile.pop(host, None)
+        self._mark(self._pinned, host)
+
+    def mark_futile(self, host: str):
+        self._mark(self._futile, host)
+
+    def __len__(self):
+        return len(self._pinned)
+
+
+def is_blocking_error(error: Exception) -> bool:
+    """
+    Ошибка, которой защита от ботов обрывает обычный клиент (разрыв соединения, сбой TLS
+    по отпечатку). Таймауты, DNS-ошибки и отказ в подключении сюда не относятся -
+    имперсонация их не исправит, а повторный запрос удвоил бы время проверки.
+    """
+    if isinstance(error, (aiohttp.ServerDisconnectedError, aiohttp.ClientSSLError)):
+        return True
+    return isinstance(error, aiohttp.ClientOSError) and not isinstance(error, aiohttp.ClientConnectorError)
+
+
+class AdaptiveProbeEngine(ProbeEngine):
+    """
+    Обычный клиент по умолчанию, имперсонация браузера - только для хостов с защитой от ботов.
+
+    Если обычный клиент получил 401/403, страницу-проверку или был оборван, запрос
+    повторяется имперсонирующим движком; при нормальном ответе хост закрепляется
+    за имперсонацией (ImpersonationPins) и дальше проверяется сразу им.
+    """
+
+    name = 'auto'
+
+    def __init__(self, plain: ProbeEngine, impersonating: ProbeEngine, pins: Optional[ImpersonationPins] = None):
+        self.plain = plain
+        self.impersonating = impersonating
+        self.pins = pins if pins is not None else ImpersonationPins()
+        self.plain_checks = 0
+        self.impersonated_checks = 0
+
+    async def probe(self, url: str, extract_title: bool = True, method: str = 'GET',
+                    fingerprint: Optional[ContentFingerprint] = None) -> ProbeResult:
+        host = urlparse(url).hostname or ''
+        if self.pins.is_pinned(host):
+            self.impersonated_checks += 1
+            return await self.impersonating.probe(url, extract_title=extract_title, method=method, fingerprint=fingerprint)
+
+        self.plain_checks += 1
+        plain_result = None
+        try:
+            plain_result = await self.plain.probe(url, extract_title=extract_title, method=method, fingerprint=fingerprint)
+        except Exception as plain_error:
+            if not is_blocking_error(plain_error):
+                raise
+            reason = f"ошибка обычного клиента: {plain_error}"
+        else:
+            if plain_result.status_code not in BLOCKED_STATUSES and not plain_result.bot_challenge:
+                return plain_result
+            if self.pins.is_futile(host):
+                return plain_result
+            reason = "страница-проверка защиты от ботов" if plain_result.bot_challenge else f"код {plain_result.status_code}"
+
+        logging.debug(f"Обычный клиент заблокирован для {host} ({reason}), пробуем имперсонацию браузера")
+        self.impersonated_checks += 1
+        try:
+            if fingerprint is not None:
+                # Части тела заблокированного ответа уже учтены в отпечатке
+                fingerprint = ContentFingerprint(fingerprint.rules)
+            result = await self.impersonating.probe(url, extract_title=extract_title, method=method, fingerprint=fingerprint)
+        except Exception:
+            if plain_result is None:
+                raise
+            return plain_result
+        if result.status_code not in BLOCKED_STATUSES and not result.bot_challenge:
+            logging.info(f"Хост {host} закреплен за имперсонацией браузера ({reason})")
+            self.pins.pin(host)
+            return result
+        # Имперсонация не помогла - сайт действительно отвечает отказом
+        self.pins.mark_futile(host)
+        return plain_result or result
+
+    def is_critical_error(self, error: Exception) -> bool:
+        return self.impersonating.is_critical_error(error) or self.plain.is_critical_error(error)
+
+    def take_stats(self) -> Dict[str, int]:
+        """Статистика с момента предыдущего вызова"""
+        stats = {'plain': self.plain_checks, 'impersonated': self.impersonated_checks, 'pinned_hosts': len(self.pins)}
+        self.plain_checks = self.impersonated_checks = 0
+        return stats
+
+    def summary(self) -> str:
+        stats = self.take_stats()
+        return f"обычных {stats['plain']}, с имперсонацией {stats['impersonated']}, хостов с имперсонацией {stats['pinned_hosts']}"
+
+
+class TcpProbeEngine(ProbeEngine):
+    """
+    Только TCP-подключение к порту сайта: самый дешевый движок для сайтов,
+    у которых важна лишь доступность хоста. Код ответа и заголовок не определяются:
+    status_code всегда 0, а неудача помечается check_type="tcp_down" (не DNS-ошибка HTTP-проверки).
+    """
+
+    name = 'tcp'
+
+    def __init__(self, tcp_check: Callable[[str], Awaitable[Tuple[bool, float]]]):
+        self.tcp_check = tcp_check
+
+    async def probe(self, url: str, extract_title: bool = True, method: str = 'GET',
+                    fingerprint: Optional[ContentFingerprint] = None) -> ProbeResult:
+        is_available, response_time = await self.tcp_check(url)
+        return ProbeResult(0, response_time, url, check_type="tcp_only" if is_available else "tcp_down",
+                           is_available=is_available)
+
+
+class ProbeEngineRegistry:
+    """Зарегистрированные движки и выбор движка для сайта"""
+
+    def __init__(self, default: str = 'curl'):
+        self.default = default
+        self._engines: Dict[str, ProbeEngine] = {}
+        self._default_missing_logged = False
+
+    def register(self, engine: ProbeEngine):
+        self._engines[engine.name] = engine
+
+    def names(self) -> List[str]:
+        return list(self._engines)
+
+    def get(self, name: Optional[str] = None) -> ProbeEngine:
+        """
+        Движок по имени; неизвестное или пустое имя - движок по умолчанию.
+        Если и движок по умолчанию не зарегистрирован, используется первый зарегистрированный:
+        ошибка настройки не должна делать недоступными все сайты.
+        """
+        engine = self._engines.get((name or '').lower())
+        if engine is None:
+            if name:
+                logging.debug(f"Движок проверки {name} не зарегистрирован, используется {self.default}")
+            engine = self._engines.get(self.default)
+        if engine is None:
+            engine = next(iter(self._engines.values()))
+            if not self._default_missing_logged:
+                self._default_missing_logged = True
+                logging.warning(f"Движок по умолчанию {self.default} не зарегистрирован, используется {engine.name}")
+        return engine
+
+
+async def benchmark_engine(engine: ProbeEngine, url: str, requests: int = 200, concurrency: int = 20,
+                           extract_title: bool = True) -> Dict[str, Any]:
+    """Пропускная способность движка: requests запросов к url с заданной конкурентностью"""
+    semaphore = asyncio.Semaphore(concurrency)
+    errors = 0
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            try:
+                await engine.probe(url, extract_title=extract_title)
+            except Exception:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(requests)])
+    elapsed = time.perf_counter() - started
+    return {
+        'engine': engine.name,
+        'requests': requests,
+        'errors': errors,
+        'elapsed': elapsed,
+        'rps': requests / elapsed if elapsed > 0 else 0.0,
+    }
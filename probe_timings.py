@@ -0,0 +1,145 @@
+"""
+Разбивка времени проверки по фазам: DNS, TCP-подключение, TLS-рукопожатие,
+ожидание первого байта (TTFB) и загрузка тела.
+
+В пути curl_cffi фазы считаются по таймингам libcurl (CURLINFO_*_TIME, накопительные
+от начала запроса), в пути aiohttp - по событиям TraceConfig. Значения в секундах;
+фаза, которой не было (соединение из пула, запрос без TLS), равна 0.
+"""
+
+import time
+from typing import Any, Callable, Dict, Optional
+
+import aiohttp
+
+from bounded_map import BoundedLog
+
+try:
+    from curl_cffi import CurlInfo
+    CURL_TIMING_INFOS = [
+        CurlInfo.NAMELOOKUP_TIME,
+        CurlInfo.CONNECT_TIME,
+        CurlInfo.APPCONNECT_TIME,
+        CurlInfo.PRETRANSFER_TIME,
+        CurlInfo.STARTTRANSFER_TIME,
+        CurlInfo.TOTAL_TIME,
+    ]
+except ImportError:
+    CurlInfo = None
+    CURL_TIMING_INFOS = []
+
+PHASES = ('dns', 'connect', 'tls', 'ttfb', 'download')
+
+
+def _phase_dict(dns: float, connect: float, tls: float, ttfb: float, download: float) -> Dict[str, float]:
+    values = (dns, connect, tls, ttfb, download)
+    phases = {name: round(max(0.0, value), 4) for name, value in zip(PHASES, values)}
+    phases['total'] = round(sum(phases.values()), 4)
+    return phases
+
+
+def curl_phases(infos: Dict[Any, float], download: Optional[float] = None) -> Optional[Dict[str, float]]:
+    """
+    Фазы по таймингам libcurl (response.infos сессии с curl_infos=CURL_TIMING_INFOS).
+    Для потокового ответа тайминги снимаются при получении заголовков, поэтому время
+    загрузки тела передается отдельно (download); иначе оно равно TOTAL - STARTTRANSFER.
+    """
+    if CurlInfo is None or not infos or CurlInfo.TOTAL_TIME not in infos:
+        return None
+    namelookup = infos.get(CurlInfo.NAMELOOKUP_TIME, 0.0)
+    connect = infos.get(CurlInfo.CONNECT_TIME, 0.0)
+    appconnect = infos.get(CurlInfo.APPCONNECT_TIME, 0.0)
+    pretransfer = infos.get(CurlInfo.PRETRANSFER_TIME, 0.0)
+    starttransfer = infos.get(CurlInfo.STARTTRANSFER_TIME, 0.0)
+    total = infos.get(CurlInfo.TOTAL_TIME, 0.0)
+    if download is None:
+        download = total - starttransfer
+    return _phase_dict(
+        dns=namelookup,
+        connect=connect - namelookup if connect else 0.0,
+        # APPCONNECT_TIME равен 0 без TLS (http://) и при повторном использовании соединения
+        tls=appconnect - connect if appconnect else 0.0,
+        ttfb=starttransfer - pretransfer,
+        download=download
+    )
+
+
+def curl_body_wait(infos: Dict[Any, float]) -> float:
+    """
+    Время от получения заголовков до снятия таймингов libcurl (TOTAL - STARTTRANSFER).
+    curl_cffi возвращает потоковый ответ только после первой части тела, поэтому
+    время ответа и начало загрузки тела сдвигаются на эту величину назад.
+    """
+    if CurlInfo is None or not infos or CurlInfo.TOTAL_TIME not in infos:
+        return 0.0
+    return max(0.0, infos.get(CurlInfo.TOTAL_TIME, 0.0) - infos.get(CurlInfo.STARTTRANSFER_TIME, 0.0))
+
+
+class PhaseTimer:
+    """
+    Отметки времени одного запроса aiohttp (передается как trace_request_ctx).
+    TLS-рукопожатие aiohttp не отделяет от TCP-подключения - оно входит в фазу connect.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter):
+        self.clock = clock
+        self.marks: Dict[str, float] = {}
+
+    def mark(self, name: str):
+        if name == 'request_start':
+            # При редиректе считаются фазы последнего запроса цепочки
+            self.marks.clear()
+        self.marks[name] = self.clock()
+
+    def duration(self, start: str, end: str) -> float:
+        if start in self.marks and end in self.marks:
+            return self.marks[end] - self.marks[start]
+        return 0.0
+
+    def phases(self, download: float = 0.0) -> Optional[Dict[str, float]]:
+        """Фазы запроса; download - время чтения тела, измеренное вызывающим кодом"""
+        if 'headers_received' not in self.marks:
+            return None
+        # Ожидание ответа - от готовности соединения (или начала запроса) до заголовков
+        ready = 'connection_ready' if 'connection_ready' in self.marks else 'request_start'
+        dns = self.duration('dns_start', 'dns_end')
+        return _phase_dict(
+            dns=dns,
+            # Создание соединения в aiohttp включает разрешение имени
+            connect=self.duration('connect_start', 'connect_end') - dns,
+            tls=0.0,
+            ttfb=self.duration(ready, 'headers_received'),
+            download=download
+        )
+
+
+def aiohttp_trace_config() -> aiohttp.TraceConfig:
+    """TraceConfig, записывающий отметки в PhaseTimer из trace_request_ctx запроса"""
+    trace_config = aiohttp.TraceConfig()
+
+    def marker(name: str):
+        async def on_event(session, context, params):
+            timer = context.trace_request_ctx
+            if isinstance(timer, PhaseTimer):
+                timer.mark(name)
+        return on_event
+
+    trace_config.on_request_start.append(marker('request_start'))
+    trace_config.on_dns_resolvehost_start.append(marker('dns_start'))
+    trace_config.on_dns_resolvehost_end.append(marker('dns_end'))
+    trace_config.on_connection_create_start.append(marker('connect_start'))
+    trace_config.on_connection_create_end.append(marker('connect_end'))
+    trace_config.on_connection_create_end.append(marker('connection_ready'))
+    trace_config.on_connection_reuseconn.append(marker('connection_ready'))
+    trace_config.on_request_end.append(marker('headers_received'))
+    return trace_config
+
+
+class ProbePhaseLog(BoundedLog):
+    """
+    Фазы последней проверки каждого URL.
+
+    Кортеж результата проверки используется во многих местах, поэтому фазы передаются
+    отдельно: проверка записывает их по нормализованному URL, а обработка результата
+    забирает и сохраняет вместе со статусом сайта.
+    """
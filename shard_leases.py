@@ -0,0 +1,233 @@
+"""
+Аренда шардов сайтов для нескольких узлов проверки.
+
+Сайты делятся на шарды по хешу id (см. checker_shards.shard_of). Узел проверяет только
+арендованные шарды и продлевает аренду, пока жив. Шарды упавшего узла освобождаются
+по истечении срока аренды и забираются остальными узлами. Отдельная аренда (шард -1)
+определяет единственный узел, который ведет Telegram-поллинг.
+
+Хранилища аренды:
+- SupabaseLeaseStore - таблицы и функции из add_checker_leases.sql;
+- SQLiteLeaseStore - локальная замена с той же семантикой (для тестов и одиночного хоста).
+"""
+
+import asyncio
+import logging
+import math
+import sqlite3
+import time
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from supabase import Client
+
+from checker_shards import shard_of
+from utils import safe_supabase_operation
+
+# Аренда Telegram-поллинга
+POLLER_LEASE_SHARD = -1
+
+
+class SupabaseLeaseStore:
+    """Хранилище аренды в Supabase (функции из add_checker_leases.sql)"""
+
+    def __init__(self, supabase: Client):
+        self.supabase = supabase
+
+    async def _rpc(self, name: str, params: Dict[str, Any]):
+        success, result = await safe_supabase_operation(
+            lambda: self.supabase.rpc(name, params).execute(),
+            max_retries=1,
+            operation_name=name
+        )
+        if not success:
+            raise RuntimeError(f"{name}: {result}")
+        return result.data
+
+    async def claim(self, shard: int, node_id: str, ttl: int) -> bool:
+        return bool(await self._rpc('claim_checker_lease', {'p_shard': shard, 'p_node_id': node_id, 'p_ttl_seconds': ttl}))
+
+    async def renew(self, shards: List[int], node_id: str, ttl: int) -> Set[int]:
+        rows = await self._rpc('renew_checker_leases', {'p_shards': shards, 'p_node_id': node_id, 'p_ttl_seconds': ttl})
+        return {row['shard'] for row in rows or []}
+
+    async def release(self, shard: int, node_id: str):
+        await self._rpc('release_checker_lease', {'p_shard': shard, 'p_node_id': node_id})
+
+    async def heartbeat(self, node_id: str, ttl: int):
+        await self._rpc('checker_node_heartbeat', {'p_node_id': node_id, 'p_ttl_seconds': ttl})
+
+    async def live_nodes(self) -> int:
+        return int(await self._rpc('count_live_checker_nodes', {}) or 0)
+
+    async def list_leases(self) -> List[Dict[str, Any]]:
+        return await self._rpc('list_checker_leases', {}) or []
+
+
+class SQLiteLeaseStore:
+    """
+    Локальное хранилище аренды в SQLite с той же семантикой, что и функции Postgres.
+    Время задается функцией clock (по умолчанию time.time), что позволяет тестам управлять им.
+    """
+
+    def __init__(self, path: str = ':memory:', clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self.db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS botmonitor_checker_leases (shard INTEGER PRIMARY KEY, node_id TEXT NOT NULL, expires_at REAL NOT NULL)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS botmonitor_checker_nodes (node_id TEXT PRIMARY KEY, expires_at REAL NOT NULL)")
+
+    async def claim(self, shard: int, node_id: str, ttl: int) -> bool:
+        now = self.clock()
+        cursor = self.db.execute(
+            "INSERT INTO botmonitor_checker_leases (shard, node_id, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (shard) DO UPDATE SET node_id = excluded.node_id, expires_at = excluded.expires_at "
+            "WHERE botmonitor_checker_leases.node_id = excluded.node_id OR botmonitor_checker_leases.expires_at < ?",
+            (shard, node_id, now + ttl, now)
+        )
+        return cursor.rowcount > 0
+
+    async def renew(self, shards: List[int], node_id: str, ttl: int) -> Set[int]:
+        return {shard for shard in shards if await self.claim(shard, node_id, ttl)}
+
+    async def release(self, shard: int, node_id: str):
+        self.db.execute("DELETE FROM botmonitor_checker_leases WHERE shard = ? AND node_id = ?", (shard, node_id))
+
+    async def heartbeat(self, node_id: str, ttl: int):
+        self.db.execute(
+            "INSERT INTO botmonitor_checker_nodes (node_id, expires_at) VALUES (?, ?) "
+            "ON CONFLICT (node_id) DO UPDATE SET expires_at = excluded.expires_at",
+            (node_id, self.clock() + ttl)
+        )
+
+    async def live_nodes(self) -> int:
+        return self.db.execute("SELECT count(*) FROM botmonitor_checker_nodes WHERE expires_at >= ?", (self.clock(),)).fetchone()[0]
+
+    async def list_leases(self) -> List[Dict[str, Any]]:
+        now = self.clock()
+        rows = self.db.execute("SELECT shard, node_id, expires_at FROM botmonitor_checker_leases").fetchall()
+        return [{'shard': shard, 'node_id': node_id, 'expired': expires_at < now} for shard, node_id, expires_at in rows]
+
+
+class ShardLeaseManager:
+    """
+    Аренда шардов одним узлом проверки.
+
+    Каждый такт (tick) узел продлевает свои аренды одним запросом (renew), отпускает шарды
+    сверх справедливой доли (ceil(shard_count / живые узлы)) и захватывает свободные или
+    истекшие шарды до этой доли.
+    Если хранилище недоступно дольше срока аренды, узел считает, что потерял все шарды,
+    чтобы не проверять сайты одновременно с узлом, который их забрал.
+    """
+
+    def __init__(self, store, node_id: str, shard_count: int = 64, ttl: int = 30,
+                 renew_interval: int = 10, claim_shards: bool = True, claim_leader: bool = True,
+                 clock: Callable[[], float] = time.monotonic):
+        self.store = store
+        self.node_id = node_id
+        self.shard_count = max(1, shard_count)
+        self.ttl = ttl
+        self.renew_interval = renew_interval
+        self.claim_shards = claim_shards
+        self.claim_leader = claim_leader
+        self.clock = clock
+        self.owned: Set[int] = set()
+        self.is_leader = False
+        self.version = 0
+        self._last_success: Optional[float] = None
+        self._leader_event = asyncio.Event()
+        self._follower_event = asyncio.Event()
+        self._follower_event.set()
+        self.on_leadership_lost: Optional[Callable[[], None]] = None
+
+    def owns(self, site_id: Any) -> bool:
+        """Проверяет ли этот узел сайт"""
+        return shard_of(site_id, self.shard_count) in self.owned
+
+    def filter_sites(self, sites: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [site for site in sites if self.owns(site.get('id'))]
+
+    async def wait_leader(self):
+        """Ждет, пока узел станет ведущим (аренда Telegram-поллинга)"""
+        await self._leader_event.wait()
+
+    async def wait_leadership_lost(self):
+        """Ждет, пока узел перестанет быть ведущим"""
+        await self._follower_event.wait()
+
+    def _set_owned(self, owned: Set[int]):
+        if owned != self.owned:
+            gained = owned - self.owned
+            lost = self.owned - owned
+            self.owned = owned
+            self.version += 1
+            logging.info(f"Узел {self.node_id}: шардов {len(owned)}/{self.shard_count} (получено {len(gained)}, отдано {len(lost)})")
+
+    def _set_leader(self, is_leader: bool):
+        if is_leader == self.is_leader:
+            return
+        self.is_leader = is_leader
+        if is_leader:
+            logging.info(f"Узел {self.node_id} стал ведущим (Telegram-поллинг)")
+            self._follower_event.clear()
+            self._leader_event.set()
+        else:
+            logging.warning(f"Узел {self.node_id} потерял аренду Telegram-поллинга")
+            self._leader_event.clear()
+            self._follower_event.set()
+            if self.on_leadership_lost:
+                self.on_leadership_lost()
+
+    async def _tick_shards(self):
+        await self.store.heartbeat(self.node_id, self.ttl)
+        live = max(1, await self.store.live_nodes())
+        target = math.ceil(self.shard_count / live)
+
+        owned = await self.store.renew(sorted(self.owned), self.node_id, self.ttl) if self.owned else set()
+
+        # Отдаем лишние шарды, чтобы новые узлы получили свою долю
+        for shard in sorted(owned, reverse=True)[:max(0, len(owned) - target)]:
+            await self.store.release(shard, self.node_id)
+            owned.discard(shard)
+
+        if len(owned) < target:
+            leases = {row['shard']: row for row in await self.store.list_leases()}
+            for shard in range(self.shard_count):
+                if len(owned) >= target:
+                    break
+                lease = leases.get(shard)
+                if shard in owned or (lease is not None and not lease['expired']):
+                    continue
+                if await self.store.claim(shard, self.node_id, self.ttl):
+                    owned.add(shard)
+        self._set_owned(owned)
+
+    async def tick(self):
+        """Один такт продления и перераспределения аренды"""
+        try:
+            if self.claim_shards:
+                await self._tick_shards()
+            if self.claim_leader:
+                self._set_leader(await self.store.claim(POLLER_LEASE_SHARD, self.node_id, self.ttl))
+            self._last_success = self.clock()
+        except Exception as e:
+            logging.error(f"Узел {self.node_id}: ошибка продления аренды: {e}")
+            # Аренды могли истечь - прекращаем проверки, пока связь с хранилищем не восстановится
+            if self._last_success is None or self.clock() - self._last_success >= self.ttl:
+                self._set_owned(set())
+                self._set_leader(False)
+
+    async def release_all(self):
+        """Освобождает аренды при остановке узла, чтобы другие узлы забрали шарды сразу"""
+        shards = list(self.owned) + ([POLLER_LEASE_SHARD] if self.is_leader else [])
+        for shard in shards:
+            try:
+                await self.store.release(shard, self.node_id)
+            except Exception as e:
+                logging.error(f"Узел {self.node_id}: не удалось освободить шард {shard}: {e}")
+        self._set_owned(set())
+        self._set_leader(False)
+
+    async def run(self):
+        """Фоновое продление аренды"""
+        while True:
+            await self.tick()
+            await asyncio.sleep(self.renew_interval)
@@ -0,0 +1,170 @@
+"""
+Реестр сайтов в памяти процесса с инкрементальной синхронизацией из Supabase.
+
+Полный список сайтов загружается один раз при старте. Далее из БД запрашиваются
+только строки, измененные после последней синхронизации (водяной знак по колонке
+updated_at), и удаленные сайты из таблицы botmonitor_sites_deleted.
+См. add_sites_updated_at.sql.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from supabase import Client
+
+from utils import safe_supabase_operation
+
+# Перекрытие окна синхронизации: защищает от транзакций, зафиксированных позже своего now()
+SYNC_OVERLAP_SECONDS = 5
+
+
+def _shift_timestamp(value: str, seconds: int) -> str:
+    """Сдвигает ISO-время назад на заданное количество секунд"""
+    try:
+        dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        return (dt - timedelta(seconds=seconds)).isoformat()
+    except (AttributeError, ValueError):
+        return value
+
+
+class SiteRegistry:
+    """
+    Реестр сайтов для цикла проверок.
+
+    Проверки читают сайты из памяти, поэтому задержка Supabase не попадает в критический
+    путь цикла. Результаты проверок обновляют записи реестра на месте (см. apply_local_update),
+    а триггер БД меняет updated_at только при изменении настроек сайта, поэтому собственные
+    записи статусов не вызывают повторную загрузку строк.
+    """
+
+    def __init__(self, supabase: Client, fields: str, table: str = 'botmonitor_sites',
+                 deleted_table: str = 'botmonitor_sites_deleted', full_resync_interval: int = 3600):
+        self.supabase = supabase
+        self.fields = fields
+        self.table = table
+        self.deleted_table = deleted_table
+        self.full_resync_interval = full_resync_interval
+        self.sites: Dict[Any, Dict[str, Any]] = {}
+        self.version = 0
+        self.loaded = False
+        self._updated_watermark: Optional[str] = None
+        self._deleted_watermark: Optional[str] = None
+        self._last_full_load = 0.0
+        self._lock = asyncio.Lock()
+
+    def __len__(self):
+        return len(self.sites)
+
+    def all(self) -> List[Dict[str, Any]]:
+        """Текущий список сайтов (без обращения к БД)"""
+        return list(self.sites.values())
+
+    def get(self, site_id) -> Optional[Dict[str, Any]]:
+        return self.sites.get(site_id)
+
+    def _advance_watermark(self, rows: List[Dict[str, Any]]):
+        for row in rows:
+            updated_at = row.get('updated_at')
+            if updated_at and (self._updated_watermark is None or updated_at > self._updated_watermark):
+                self._updated_watermark = updated_at
+
+    async def load(self) -> bool:
+        """Полная загрузка списка сайтов (при старте и для периодической сверки)"""
+        async with self._lock:
+            success, result = await safe_supabase_operation(
+                lambda: self.supabase.table(self.table).select(self.fields).execute(),
+                operation_name="site_registry_full_load"
+            )
+            if not success:
+                logging.error(f"Реестр сайтов: не удалось выполнить полную загрузку: {result}")
+                return False
+
+            rows = result.data or []
+            self.sites = {row['id']: row for row in rows}
+            self._updated_watermark = None
+            self._advance_watermark(rows)
+
+            # Удаления до момента полной загрузки уже учтены
+            success, deleted = await safe_supabase_operation(
+                lambda: self.supabase.table(self.deleted_table).select('deleted_at').order('deleted_at', desc=True).limit(1).execute(),
+                operation_name="site_registry_deleted_watermark"
+            )
+            if success and deleted.data:
+                self._deleted_watermark = deleted.data[0]['deleted_at']
+
+            self.loaded = True
+            self.version += 1
+            self._last_full_load = time.monotonic()
+            logging.info(f"Реестр сайтов загружен: {len(self.sites)} сайтов")
+            return True
+
+    async def sync(self) -> Tuple[int, int]:
+        """
+        Инкрементальная синхронизация: загружает только измененные и удаленные сайты.
+
+        Returns:
+            tuple: (количество добавленных/измененных, количество удаленных)
+        """
+        if not self.loaded or time.monotonic() - self._last_full_load >= self.full_resync_interval:
+            await self.load()
+            return len(self.sites), 0
+
+        async with self._lock:
+            query = self.supabase.table(self.table).select(self.fields)
+            if self._updated_watermark:
+                query = query.gte('updated_at', _shift_timestamp(self._updated_watermark, SYNC_OVERLAP_SECONDS))
+            success, result = await safe_supabase_operation(
+                lambda: query.execute(),
+                operation_name="site_registry_sync_changes"
+            )
+            if not success:
+                logging.error(f"Реестр сайтов: не удалось получить изменения: {result}")
+                return 0, 0
+
+            changed = 0
+            for row in result.data or []:
+                current = self.sites.get(row['id'])
+                if current is None or current.get('updated_at') != row.get('updated_at'):
+                    self.sites[row['id']] = row
+                    changed += 1
+            self._advance_watermark(result.data or [])
+
+            deleted_query = self.supabase.table(self.deleted_table).select('site_id, deleted_at')
+            if self._deleted_watermark:
+                deleted_query = deleted_query.gt('deleted_at', self._deleted_watermark)
+            success, deleted = await safe_supabase_operation(
+                lambda: deleted_query.execute(),
+                operation_name="site_registry_sync_deleted"
+            )
+            removed = 0
+            if success:
+                for row in deleted.data or []:
+                    if self.sites.pop(row['site_id'], None) is not None:
+                        removed += 1
+                    if self._deleted_watermark is None or row['deleted_at'] > self._deleted_watermark:
+                        self._deleted_watermark = row['deleted_at']
+            else:
+                logging.error(f"Реестр сайтов: не удалось получить удаленные сайты: {deleted}")
+
+            if changed or removed:
+                self.version += 1
+                logging.info(f"Реестр сайтов синхронизирован: изменено {changed}, удалено {removed}, всего {len(self.sites)}")
+            return changed, removed
+
+    def apply_local_update(self, site_id, fields: Dict[str, Any]):
+        """Применяет к записи реестра результат проверки, уже записанный в БД"""
+        site = self.sites.get(site_id)
+        if site is not None:
+            site.update(fields)
+
+    async def run(self, interval: int):
+        """Фоновая синхронизация реестра"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.sync()
+            except Exception as e:
+                logging.error(f"Ошибка синхронизации реестра сайтов: {e}", exc_info=True)
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки извлечения заголовка из начала страницы.
+Потоковое чтение проверяется на локальном HTTP-сервере, внешняя сеть не нужна.
+"""
+
+import asyncio
+import gzip
+import os
+import sys
+import zlib
+
+from aiohttp import web
+
+# Добавляем путь к основному файлу для импорта
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from body_reader import DECODE_CHUNK_SIZE, BodyBudget, BodyLimits, detect_charset, find_title, read_title
+from http_sessions import AiohttpSessionManager, CurlSessionPool, close_stream
+
+
+async def iterate(chunks, consumed):
+    for chunk in chunks:
+        consumed.append(chunk)
+        yield chunk
+
+
+def test_charset_detection():
+    """Кодировка берется из заголовка, затем из meta, затем из BOM"""
+    assert detect_charset('text/html; charset=windows-1251', b'') == 'cp1251'
+    assert detect_charset('text/html', b'<meta charset="koi8-r">') == 'koi8-r'
+    assert detect_charset(None, b'<meta http-equiv="Content-Type" content="text/html; charset=windows-1251">') == 'cp1251'
+    assert detect_charset('text/html; charset=unknown-x', b'\xef\xbb\xbf<html>') == 'utf-8'
+    assert detect_charset(None, b'<html>') == 'utf-8'
+
+    page = '<html><head><meta charset="windows-1251"><title> Главная </title>'.encode('cp1251')
+    assert find_title(page) == 'Главная'
+    assert find_title('<TITLE>Магазин</TITLE>'.encode('utf-8'), 'text/html; charset=utf-8') == 'Магазин'
+    assert find_title(b'<html><body>no title</body>') is None
+
+
+def test_reading_stops_after_title():
+    """Чтение прекращается на </title> или по лимиту байт"""
+    async def run():
+        consumed = []
+        chunks = [b'<html><head><ti', b'tle>Shop</ti', b'tle></head>', b'x' * 1000, b'y' * 1000]
+        assert await read_title(iterate(chunks, consumed), 'text/html') == 'Shop'
+        assert len(consumed) == 3
+
+        consumed = []
+        chunks = [b'<html><head>' + b' ' * 1000] * 100
+        assert await read_title(iterate(chunks, consumed), limit=4000) is None
+        assert len(consumed) == 4
+
+        # Страница без <title>: чтение заканчивается на <body>
+        consumed = []
+        chunks = [b'<html><head><meta charset="utf-8">', b'</head><body>', b'z' * 1000]
+        assert await read_title(iterate(chunks, consumed)) is None
+        assert len(consumed) == 2
+
+    asyncio.run(run())
+
+
+def test_body_limits():
+    """gzip-бомба распаковывается частями и останавливается на лимите; лимит загрузки обрезает тело"""
+    async def collect(chunks):
+        return [chunk async for chunk in chunks]
+
+    async def run():
+        bomb = gzip.compress(b'<html><head>' + b' ' * (32 * 1024 * 1024))
+        raw = [bomb[i:i + 8192] for i in range(0, len(bomb), 8192)]
+        consumed = []
+        budget = BodyBudget(max_download=len(bomb), max_decompressed=256 * 1024)
+        chunks = await collect(budget.decode(iterate(raw, consumed), 'gzip'))
+        assert budget.truncated == 'decompressed' and budget.decompressed == 256 * 1024
+        assert sum(map(len, chunks)) == 256 * 1024 and max(map(len, chunks)) <= DECODE_CHUNK_SIZE
+        assert len(consumed) < len(raw)
+
+        # deflate с заголовком zlib и без него; тело ровно по лимиту не считается обрезанным
+        page = b'<title>Deflate</title>' + b'.' * 1000
+        for data in (zlib.compress(page), zlib.compress(page)[2:-4]):
+            budget = BodyBudget(max_download=10000, max_decompressed=len(page))
+            assert b''.join(await collect(budget.decode(iterate([data], []), 'deflate'))) == page
+            assert budget.truncated is None
+
+        budget = BodyBudget(max_download=1500, max_decompressed=10000)
+        chunks = await collect(budget.decode(iterate([b'a' * 1000] * 5, []), None))
+        assert sum(map(len, chunks)) == 1500 and budget.truncated == 'download'
+
+        # Распакованные HTTP-клиентом части: загруженные байты берутся из его счетчика
+        downloaded = [0]
+
+        async def client_chunks():
+            for _ in range(10):
+                downloaded[0] += 100
+                yield b'b' * 1000
+
+        budget = BodyBudget(max_download=350, max_decompressed=10000, downloaded=lambda: downloaded[0])
+        assert len(await collect(budget.chunks(client_chunks()))) == 3 and budget.truncated == 'download'
+
+        limits = BodyLimits()
+        limits.record(budget)
+        assert limits.take_truncated() == {'download': 1, 'decompressed': 0}
+        assert limits.take_truncated() == {'download': 0, 'decompressed': 0}
+
+    asyncio.run(run())
+
+
+async def start_big_page_server():
+    """Страница с заголовком в начале и телом ~8 МБ, отдаваемым частями"""
+    sent = []
+
+    async def handler(request):
+        response = web.StreamResponse(headers={'Content-Type': 'text/html; charset=windows-1251'})
+        await response.prepare(request)
+        try:
+            await response.write('<html><head><title>Тяжелая страница</title></head><body>'.encode('cp1251'))
+            for _ in range(128):
+                await response.write(b'x' * 65536)
+                sent.append(65536)
+                await asyncio.sleep(0.005)
+            await response.write_eof()
+        except (ConnectionResetError, ConnectionError):
+            pass
+        return response
+
+    app = web.Application()
+    app.router.add_get('/', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/", sent
+
+
+def test_heavy_page_is_not_downloaded():
+    """Оба пути проверки получают заголовок и прерывают загрузку тяжелой страницы"""
+    async def run():
+        runner, url, sent = await start_big_page_server()
+        pool = CurlSessionPool(size=1)
+        sessions = AiohttpSessionManager()
+        try:
+            response = await pool.get(url, timeout=10, stream=True)
+            title = await read_title(response.aiter_content(), response.headers.get('Content-Type'))
+            await close_stream(response)
+            assert title == 'Тяжелая страница'
+
+            async with sessions.get(url) as aio_response:
+                title = await read_title(aio_response.content.iter_chunked(8192), aio_response.headers.get('Content-Type'))
+            assert title == 'Тяжелая страница'
+            await asyncio.sleep(0.2)
+        finally:
+            await sessions.close()
+            await pool.close()
+            await runner.cleanup()
+        print(f"Отправлено сервером до разрыва: {sum(sent)} байт")
+        assert sum(sent) < 128 * 65536
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_charset_detection()
+    test_reading_stops_after_title()
+    test_body_limits()
+    test_heavy_page_is_not_downloaded()
+    print("Все тесты извлечения заголовка пройдены")
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки словарей ограниченного размера.
+"""
+
+import os
+import sys
+
+# Добавляем путь к основному файлу для импорта
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bounded_map import BoundedDict, BoundedLog
+
+
+def test_oldest_written_keys_are_evicted():
+    """При превышении лимита удаляются ключи, записанные раньше всех; перезапись обновляет порядок"""
+    entries = BoundedDict(max_entries=2)
+    entries['a'] = 1
+    entries['b'] = 2
+    entries['a'] = 3
+    entries['c'] = 4
+    assert list(entries.items()) == [('a', 3), ('c', 4)]
+
+    # Чтение порядок не меняет
+    assert entries.get('a') == 3
+    entries['d'] = 5
+    assert list(entries) == ['c', 'd']
+
+
+def test_log_keeps_last_value():
+    """Журнал хранит последнее значение по ключу, None - тоже значение"""
+    log = BoundedLog(max_entries=2)
+    log.record('https://a.example', {'ttfb': 0.1})
+    log.record('https://a.example', None)
+    log.record('https://b.example', 'hash')
+    assert log.get('https://a.example') is None and 'https://a.example' in log
+    log.record('https://c.example', 'hash')
+    assert log.get('https://a.example') is None and 'https://a.example' not in log
+    assert len(log) == 2
+
+
+if __name__ == "__main__":
+    test_oldest_written_keys_are_evicted()
+    test_log_keeps_last_value()
+    print("Все тесты словарей ограниченного размера пройдены")
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки кэша SSL-сертификатов с расписанием по сроку действия.
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+# Добавляем путь к основному файлу для импорта
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cert_cache import MIN_REFRESH_INTERVAL, CertificateCache, refresh_interval
+from net_probes import CertificateInfo
+
+
+def certificate(days, fingerprint='aa'):
+    not_after = datetime.now(timezone.utc) + timedelta(days=days, hours=1)
+    return CertificateInfo(not_after, "Let's Encrypt", 'example.com', ['example.com'], fingerprint)
+
+
+def test_refresh_schedule_tightens():
+    """Чем ближе истечение сертификата, тем чаще повторная проверка"""
+    intervals = [refresh_interval(days) for days in (80, 30, 20, 10, 3, 0, -5)]
+    assert intervals == [86400, 86400, 6 * 3600, 3600, 900, MIN_REFRESH_INTERVAL, MIN_REFRESH_INTERVAL]
+    assert intervals == sorted(intervals, reverse=True)
+
+
+def test_cache_hits_until_refresh_or_fingerprint_change():
+    """Кэш отдает сертификат до срока повторной проверки; смена отпечатка делает запись устаревшей"""
+    now = [0.0]
+    cache = CertificateCache(clock=lambda: now[0])
+    assert cache.get('example.com') is None
+
+    assert not cache.store('Example.com', 443, certificate(80))
+    assert cache.get('example.com').fingerprint == 'aa'
+    assert cache.get('example.com', fingerprint='aa') is not None
+    assert cache.get('example.com', fingerprint='bb') is None
+    assert cache.get('example.com', 8443) is None
+
+    now[0] = 86400 - 1
+    assert cache.get('example.com') is not None
+    now[0] = 86400
+    assert cache.get('example.com') is None
+
+    # Перевыпущенный сертификат со сроком 3 дня проверяется каждые 15 минут
+    assert cache.store('example.com', 443, certificate(3, fingerprint='bb'))
+    assert cache.next_refresh('example.com') == 900
+    assert cache.take_stats() == {'hits': 3, 'inspections': 2, 'changes': 1, 'hosts': 1}
+
+    # Сертификат, истекающий раньше срока по расписанию, проверяется к моменту истечения
+    cache = CertificateCache(schedule=((0, 10 * 86400),), clock=lambda: now[0])
+    cache.store('short.example', 443, certificate(2))
+    assert cache.next_refresh('short.example') == 2 * 86400
+
+
+if __name__ == "__main__":
+    test_refresh_schedule_tightens()
+    test_cache_hits_until_refresh_or_fingerprint_change()
+    print("Все тесты кэша сертификатов пройдены")
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки пула воркеров (CheckWorkerPool).
+Имитирует проверки сайтов с разной длительностью без сетевых запросов.
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+# Добавляем путь к основному файлу для импорта
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from check_pool import CheckWorkerPool
+
+
+def test_cycle_time_follows_slowest_site():
+    """Время цикла определяется самым медленным сайтом, а не суммой"""
+    sites = [{'url': f'https://site{i}.example', 'delay': 0.2} for i in range(10)]
+    sites.append({'url': 'https://slow.example', 'delay': 0.5})
+
+    async def fake_check(site):
+        await asyncio.sleep(site['delay'])
+
+    async def run():
+        pool = CheckWorkerPool(concurrency=20, per_host_limit=2)
+        return await pool.run_cycle(sites, fake_check, host_func=lambda s: s['url'], key_func=lambda s: s['url'])
+
+    stats = asyncio.run(run())
+    print(f"Статистика: {stats.summary()}")
+    assert stats.total == 11
+    assert stats.succeeded == 11
+    assert stats.slowest_key == 'https://slow.example'
+    assert stats.elapsed < 1.0
+
+
+def test_global_and_per_host_limits():
+    """Глобальный лимит и лимит на хост соблюдаются"""
+    active = {'total': 0, 'max_total': 0, 'per_host': {}, 'max_per_host': 0}
+    sites = [{'host': f'host{i % 3}'} for i in range(30)]
+
+    async def fake_check(site):
+        host = site['host']
+        active['total'] += 1
+        active['per_host'][host] = active['per_host'].get(host, 0) + 1
+        active['max_total'] = max(active['max_total'], active['total'])
+        active['max_per_host'] = max(active['max_per_host'], active['per_host'][host])
+        await asyncio.sleep(0.01)
+        active['total'] -= 1
+        active['per_host'][host] -= 1
+
+    async def run():
+        pool = CheckWorkerPool(concurrency=5, per_host_limit=1)
+        return await pool.run_cycle(sites, fake_check, host_func=lambda s: s['host'])
+
+    stats = asyncio.run(run())
+    print(f"Максимум одновременно: {active['max_total']}, на хост: {active['max_per_host']}")
+    assert stats.total == 30
+    assert active['max_total'] <= 5
+    assert active['max_per_host'] == 1
+
+
+def test_errors_are_isolated():
+    """Ошибка одной проверки не останавливает остальные; обработанная ошибка (False) тоже считается"""
+    async def fake_check(site):
+        if site == 'bad':
+            raise RuntimeError("boom")
+        if site == 'handled':
+            return False
+
+    async def run():
+        pool = CheckWorkerPool(concurrency=2)
+        return await pool.run_cycle(['a', 'bad', 'b', 'handled'], fake_check, host_func=lambda s: s)
+
+    stats = asyncio.run(run())
+    assert stats.succeeded == 2
+    assert stats.failed == 2
+
+
+def test_busy_host_does_not_hold_global_slots():
+    """Проверки, ждущие занятого хоста, не занимают глобальные слоты"""
+    finished = {}
+    sites = [{'host': 'busy', 'delay': 0.2} for _ in range(6)] + [{'host': f'free{i}', 'delay': 0.01} for i in range(4)]
+
+    async def fake_check(site):
+        await asyncio.sleep(site['delay'])
+        finished[id(site)] = time.monotonic()
+
+    async def run():
+        pool = CheckWorkerPool(concurrency=3, per_host_limit=1)
+        started = time.monotonic()
+        await pool.run_cycle(sites, fake_check, host_func=lambda s: s['host'])
+        return started
+
+    started = asyncio.run(run())
+    # Хосты free* проверяются, пока busy обрабатывает первую запись
+    assert all(finished[id(site)] - started < 0.15 for site in sites[6:])
+
+
+if __name__ == "__main__":
+    started = time.time()
+    test_cycle_time_follows_slowest_site()
+    test_global_and_per_host_limits()
+    test_errors_are_isolated()
+    test_busy_host_does_not_hold_global_slots()
+    print(f"Все тесты пула воркеров пройдены за {time.time() - started:.2f}с")
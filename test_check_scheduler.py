@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки планировщика проверок (SiteScheduler).
+Использует искусственное время, сетевые запросы не выполняются.
+"""
+
+import os
+import sys
+from datetime import datetime, timezone
+
+# Добавляем путь к основному файлу для импорта
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from check_scheduler import (
+    SiteScheduler, AdaptiveIntervalPolicy, LoadShedder, phase_fraction,
+    SHED_NONE, SHED_RESERVE, SHED_ENRICHMENT, SHED_SLOW
+)
+
+
+def test_only_due_sites_are_dispatched():
+    """Выдаются только сайты, у которых подошло время проверки"""
+    scheduler = SiteScheduler(default_interval=300)
+    scheduler.sync([
+        {'id': 1, 'url': 'https://shop.example', 'check_interval': 30},
+        {'id': 2, 'url': 'https://landing.example', 'check_interval': 3600},
+    ], now=0)
+
+    # Новые сайты без last_check проверяются сразу
+    assert {s['id'] for s in scheduler.pop_due(now=0)} == {1, 2}
+    scheduler.complete(1, now=1)
+    scheduler.complete(2, now=1)
+
+    dispatched = {1: 0, 2: 0}
+    for now in range(2, 3601):
+        for site in scheduler.pop_due(now=now):
+            dispatched[site['id']] += 1
+            scheduler.complete(site['id'], now=now)
+
+    print(f"За час: критичный сайт проверен {dispatched[1]} раз, лендинг {dispatched[2]} раз")
+    assert dispatched[1] == 120
+    assert dispatched[2] == 1
+
+
+def test_in_flight_site_is_not_redispatched():
+    """Сайт не выдается повторно, пока его проверка не завершена"""
+    scheduler = SiteScheduler(default_interval=60)
+    scheduler.sync([{'id': 1, 'url': 'https://a.example'}], now=0)
+    assert len(scheduler.pop_due(now=0)) == 1
+    assert scheduler.pop_due(now=1000) == []
+    assert scheduler.seconds_until_next(now=1000) is None
+    scheduler.complete(1, now=1000)
+    assert scheduler.seconds_until_next(now=1000) == 0.0
+
+
+def test_sync_keeps_record_of_site_being_checked():
+    """Строка из БД не подменяет запись сайта, в которую идущая проверка пишет результат"""
+    scheduler = SiteScheduler(default_interval=30)
+    scheduler.sync([{'id': 1, 'url': 'https://a.example', 'is_up': True, 'total_checks': 5}], now=0)
+    site = scheduler.pop_due(now=0)[0]
+    scheduler.sync([{'id': 1, 'url': 'https://a.example', 'is_up': True, 'total_checks': 5}], now=1)
+    # Результат проверки записывается в запись сайта (как process_site_check_result)
+    site.update({'is_up': False, 'total_checks': 6})
+    scheduler.complete(1, now=2)
+    again = scheduler.pop_due(now=100)[0]
+    assert again is site and again['is_up'] is False and again['total_checks'] == 6
+
+    # После завершения проверки синхронизация снова берет строку из БД
+    scheduler.complete(1, now=100)
+    scheduler.sync([{'id': 1, 'url': 'https://b.example', 'is_up': False, 'total_checks': 7}], now=101)
+    assert scheduler.pop_due(now=200)[0]['url'] == 'https://b.example'
+
+
+def test_last_check_is_respected_on_start():
+    """После перезапуска сайт не проверяется раньше своего интервала"""
+    scheduler = SiteScheduler(default_interval=300)
+    scheduler.sync([{'id': 1, 'url': 'https://a.example', 'last_check': '1970-01-01T00:01:40+00:00'}], now=200)
+    assert scheduler.pop_due(now=200) == []
+    assert scheduler.seconds_until_next(now=200) == 200
+
+
+def test_removed_and_updated_sites():
+    """Удаленные сайты исчезают из расписания, изменение интервала учитывается"""
+    scheduler = SiteScheduler(default_interval=300)
+    scheduler.sync([{'id': 1, 'url': 'https://a.example'}, {'id': 2, 'url': 'https://b.example'}], now=0)
+    for site in scheduler.pop_due(now=0):
+        scheduler.complete(site['id'], now=0)
+
+    scheduler.sync([{'id': 1, 'url': 'https://a.example', 'check_interval': 60}], now=10)
+    assert 2 not in scheduler
+    assert scheduler.seconds_until_next(now=10) == 50
+    assert [s['id'] for s in scheduler.pop_due(now=60)] == [1]
+
+
+def test_smoothing_spreads_checks_evenly():
+    """В режиме сглаживания проверки распределены по интервалу, а не идут пачкой"""
+    interval = 300
+    scheduler = SiteScheduler(default_interval=interval, smoothing=True)
+    scheduler.sync([{'id': i, 'url': f'https://site{i}.example'} for i in range(600)], now=0)
+
+    per_minute = [0] * (2 * interval // 60)
+    for now in range(0, 2 * interval):
+        for site in scheduler.pop_due(now=now):
+            per_minute[now // 60] += 1
+            scheduler.complete(site['id'], now=now)
+
+    print(f"Проверок по минутам: {per_minute}")
+    # 600 сайтов с интервалом 5 минут - около 120 проверок в минуту, без всплесков
+    assert sum(per_minute) >= 1190
+    assert max(per_minute) < 170
+    assert min(per_minute) > 80
+
+
+def test_phase_is_stable():
+    """Сдвиг фазы сайта не меняется между запусками и сохраняется после проверок"""
+    assert phase_fraction(42) == phase_fraction(42)
+    scheduler = SiteScheduler(default_interval=100, smoothing=True)
+    scheduler.sync([{'id': 42, 'url': 'https://a.example'}], now=0)
+    phase = scheduler.phase_offset(42, 100)
+    due_times = []
+    for now in range(0, 1000):
+        for site in scheduler.pop_due(now=now):
+            due_times.append(now)
+            scheduler.complete(site['id'], now=now + 3)
+    assert len(due_times) == 10
+    assert all(abs((t - phase) % 100) < 1 or abs((t - phase) % 100) > 99 for t in due_times)
+
+
+def ts(seconds):
+    return datetime.fromtimestamp(seconds, timezone.utc).isoformat()
+
+
+def test_adaptive_policy_intervals():
+    """Адаптивный интервал: чаще для проблемных сайтов, реже для стабильных, в пределах границ"""
+    policy = AdaptiveIntervalPolicy(min_interval=60, max_interval=3600, stable_after=86400)
+    now = 100 * 86400
+    base = 300
+    assert policy.interval({'is_up': False}, base, now) == 75
+    assert policy.interval({'is_up': True, 'last_status_change': ts(now - 600)}, base, now) == 150
+    assert policy.interval({'is_up': True, 'response_time': 3.0, 'avg_response_time': 1.0}, base, now) == 150
+    assert policy.interval({'is_up': True}, base, now) == 300
+    assert policy.interval({'is_up': True, 'last_status_change': ts(now - 86400)}, base, now) == 600
+    assert policy.interval({'is_up': True, 'last_status_change': ts(now - 2 * 86400)}, base, now) == 1200
+    assert policy.interval({'is_up': True, 'last_status_change': ts(now - 90 * 86400)}, base, now) == 3600
+    # Явно заданный короткий интервал не замедляется до нижней границы
+    assert policy.interval({'is_up': True}, 30, now) == 30
+    assert policy.interval({'is_up': False}, 30, now) == 30
+
+
+def test_adaptive_scheduler_reacts_to_state():
+    """После проверки, в которой сайт стал недоступен, следующая проверка наступает раньше"""
+    now = 100 * 86400
+    stable = ts(now - 90 * 86400)
+    scheduler = SiteScheduler(default_interval=300, policy=AdaptiveIntervalPolicy(min_interval=60, max_interval=3600))
+    flaky = {'id': 1, 'url': 'https://flaky.example', 'is_up': True, 'last_status_change': stable}
+    calm = {'id': 2, 'url': 'https://calm.example', 'is_up': True, 'last_status_change': stable}
+    scheduler.sync([flaky, calm], now=now)
+
+    checks = {1: 0, 2: 0}
+    for t in range(now, now + 3 * 3600):
+        for site in scheduler.pop_due(now=t):
+            checks[site['id']] += 1
+            if site['id'] == 1 and t >= now + 3600 and site['is_up']:
+                site.update({'is_up': False, 'last_status_change': ts(t)})
+            scheduler.complete(site['id'], now=t)
+
+    print(f"Проверок за 3 часа: проблемный сайт {checks[1]}, стабильный {checks[2]}")
+    assert checks[2] == 3
+    # Один час с интервалом 3600 и два часа с интервалом 75 секунд
+    assert checks[1] >= 90
+
+
+def test_lag_is_measured_against_due_time():
+    """Лаг - опоздание самой старой ожидающей проверки и запуска проверок"""
+    scheduler = SiteScheduler(default_interval=60)
+    scheduler.sync([{'id': i, 'url': f'https://site{i}.example'} for i in range(10)], now=0)
+    assert scheduler.lag(now=0) == 0.0
+    # Пул занят: за 45 секунд удалось запустить только 4 проверки
+    assert len(scheduler.pop_due(now=0, limit=2)) == 2
+    assert len(scheduler.pop_due(now=45, limit=2)) == 2
+    assert scheduler.lag(now=45) == 45
+    stats = scheduler.take_lag_stats()
+    assert stats['count'] == 4 and stats['max'] == 45 and stats['avg'] == 22.5
+    assert scheduler.take_lag_stats()['count'] == 0
+
+
+def test_load_shedding_order():
+    """Сброс нагрузки идет по уровням: резервные домены, обогащение, медленные сайты"""
+    shedder = LoadShedder(lag_threshold=30, slow_interval=900)
+    reserve = {'id': 1, 'is_reserve_domain': True}
+    slow = {'id': 2}
+    critical = {'id': 3}
+
+    assert shedder.update(10) == SHED_NONE
+    assert not shedder.should_defer(reserve, 300)
+
+    assert shedder.update(30) == SHED_RESERVE
+    assert shedder.should_defer(reserve, 300)
+    assert not shedder.skip_enrichment and not shedder.should_defer(slow, 3600)
+
+    assert shedder.update(60) == SHED_ENRICHMENT
+    assert shedder.skip_enrichment and not shedder.should_defer(slow, 3600)
+
+    assert shedder.update(500) == SHED_SLOW
+    assert shedder.should_defer(slow, 3600)
+    assert not shedder.should_defer(critical, 30)
+
+    # Гистерезис: уровень снижается только ниже половины порога
+    assert shedder.update(100) == SHED_SLOW
+    assert shedder.update(50) == SHED_ENRICHMENT
+    assert shedder.update(0) == SHED_NONE
+
+    disabled = LoadShedder(lag_threshold=30, enabled=False)
+    assert disabled.update(1000) == SHED_NONE and disabled.lag == 1000
+
+
+def test_shedding_keeps_critical_sites_on_time():
+    """При нехватке пропускной способности критичные сайты проверяются вовремя"""
+    def simulate(shedder):
+        scheduler = SiteScheduler(default_interval=300)
+        sites = [{'id': i, 'url': f'https://slow{i}.example', 'check_interval': 3600} for i in range(400)]
+        sites += [{'id': 1000 + i, 'url': f'https://shop{i}.example', 'check_interval': 60} for i in range(20)]
+        scheduler.sync(sites, now=0)
+        critical_lag = 0.0
+        # Одна проверка в секунду - меньше, чем требуется в первые минуты
+        for now in range(0, 900):
+            shedder.update(scheduler.lag(now=now))
+            while True:
+                due = scheduler.pop_due(now=now, limit=1)
+                if not due:
+                    break
+                site = due[0]
+                if shedder.should_defer(site, scheduler.interval_of(site['id'])):
+                    scheduler.complete(site['id'], now=now)
+                    continue
+                if site['id'] >= 1000:
+                    critical_lag = max(critical_lag, now - scheduler._entries[site['id']]['due'])
+                scheduler.complete(site['id'], now=now)
+                break
+        return critical_lag
+
+    without_shedding = simulate(LoadShedder(lag_threshold=30, enabled=False))
+    with_shedding = simulate(LoadShedder(lag_threshold=30, slow_interval=900))
+    print(f"Макс. опоздание критичных сайтов: без сброса {without_shedding}с, со сбросом {with_shedding}с")
+    assert with_shedding < without_shedding / 2
+
+
+def test_same_url_rows_are_grouped():
+    """Записи одного URL с разными интервалами выдаются одной группой без сглаживания"""
+    scheduler = SiteScheduler(default_interval=300, phase_key=lambda site: site['url'].rstrip('/').lower())
+    scheduler.sync([
+        {'id': 1, 'url': 'https://Shop.example/', 'check_interval': 60},
+        {'id': 2, 'url': 'https://shop.example', 'check_interval': 90},
+        {'id': 3, 'url': 'https://other.example', 'check_interval': 60},
+    ], now=0)
+
+    groups = scheduler.pop_due_groups(now=0, limit=10)
+    assert sorted(sorted(site['id'] for site in group) for group in groups) == [[1, 2], [3]]
+    for group in groups:
+        for site in group:
+            scheduler.complete(site['id'], now=1)
+
+    # Через минуту наступает время записи 1; запись 2 проверяется вместе с ней досрочно
+    assert [[site['id'] for site in group] for group in scheduler.pop_due_groups(now=61, limit=1)] == [[1, 2]]
+    scheduler.complete(1, now=62)
+    scheduler.complete(2, now=62)
+    assert scheduler.pop_due_groups(now=62) == [[scheduler._entries[3]['site']]]
+
+    # Сменивший URL сайт выходит из группы
+    scheduler.sync([
+        {'id': 1, 'url': 'https://shop.example', 'check_interval': 60},
+        {'id': 2, 'url': 'https://new.example', 'check_interval': 90},
+        {'id': 3, 'url': 'https://other.example', 'check_interval': 60},
+    ], now=62)
+    assert [[site['id'] for site in group] for group in scheduler.pop_due_groups(now=121)] == [[1]]
+    scheduler.remove(1)
+    assert 'https://shop.example' not in scheduler._members
+
+
+if __name__ == "__main__":
+    test_only_due_sites_are_dispatched()
+    test_in_flight_site_is_not_redispatched()
+    test_sync_keeps_record_of_site_being_checked()
+    test_last_check_is_respected_on_start()
+    test_removed_and_updated_sites()
+    test_smoothing_spreads_checks_evenly()
+    test_phase_is_stable()
+    test_adaptive_policy_intervals()
+    test_adaptive_scheduler_reacts_to_state()
+    test_lag_is_measured_against_due_time()
+    test_load_shedding_order()
+    test_shedding_keeps_critical_sites_on_time()
+    test_same_url_rows_are_grouped()
+    print("Все тесты планировщика пройдены")
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки многопроцессного режима проверок:
+распределение сайтов по шардам и пересылка уведомлений из процессов в процесс бота.
+"""
+
+import asyncio
+import os
+import sys
+
+# Добавляем путь к основному файлу для импорта
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from checker_shards import CheckerShardPool, ShardNotificationSink, filter_shard, shard_of
+
+
+def fake_checker(shard_index, shard_count, message_queue):
+    """Процесс-проверяльщик: сообщает о своих сайтах и завершается"""
+    sink = ShardNotificationSink(message_queue, shard_index)
+    sites = filter_shard([{'id': i} for i in range(100)], (shard_index, shard_count))
+    for site in sites:
+        sink.notify(site['id'], f"site {site['id']}")
+    sink.notify_admin(f"shard {shard_index} done")
+
+
+def test_shards_partition_sites():
+    """Каждый сайт попадает ровно в один шард, шарды примерно равны"""
+    sites = [{'id': i} for i in range(8000)]
+    shards = [filter_shard(sites, (index, 8)) for index in range(8)]
+    sizes = [len(shard) for shard in shards]
+    print(f"Размеры шардов: {sizes}")
+    assert sum(sizes) == len(sites)
+    assert len({site['id'] for shard in shards for site in shard}) == len(sites)
+    assert min(sizes) > 800 and max(sizes) < 1200
+    assert shard_of(42, 8) == shard_of(42, 8)
+    assert filter_shard(sites, None) == sites
+
+
+def test_pool_relays_notifications():
+    """Уведомления процессов-проверяльщиков доходят до процесса бота"""
+    notified = []
+    admin = []
+
+    async def on_notify(chat_id, text):
+        notified.append(chat_id)
+
+    async def on_admin(text):
+        admin.append(text)
+
+    async def run():
+        pool = CheckerShardPool(2, target=fake_checker, on_notify=on_notify, on_admin=on_admin)
+        pool.start()
+        relay = asyncio.create_task(pool.run())
+        for _ in range(300):
+            if len([text for text in admin if text.endswith('done')]) == 2:
+                break
+            await asyncio.sleep(0.1)
+        relay.cancel()
+        pool.stop()
+
+    asyncio.run(run())
+    assert sorted(notified) == list(range(100))
+    assert sorted(text for text in admin if text.endswith('done')) == ['shard 0 done', 'shard 1 done']
+
+
+if __name__ == "__main__":
+    test_shards_partition_sites()
+    test_pool_relays_notifications()
+    print("Все тесты многопроцессного режима пройдены")
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки неблокирующей очереди подтверждения недоступности.
+Сетевые запросы заменены функциями, возвращающими заданные результаты.
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+# Добавляем путь к основному файлу для импорта
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from confirmation_queue import (
+    ConfirmationQueue, RetryTracker,
+    DECISION_UP, DECISION_DOWN, DECISION_RETRY, DECISION_ALTERNATIVE
+)
+
+DOWN = (False, 503, 0.1, None, 'https://a.example', 'http')
+DNS_ERROR = (False, 0, 0.0, None, 'https://a.example', 'down')
+UP = (True, 200, 0.2, 'Title', 'https://a.example', 'http')
+
+
+def test_tracker_matches_retry_semantics():
+    """RetryTracker принимает те же решения, что и check_site_with_retries"""
+    tracker = RetryTracker('https://a.example', max_attempts=3, retry_interval=10, dns_error_multiplier=2)
+    assert tracker.record(DOWN) == DECISION_RETRY
+    assert tracker.next_interval() == 10
+    assert tracker.record(DOWN) == DECISION_RETRY
+    assert tracker.record(DOWN) == DECISION_DOWN
+    assert tracker.result() == (False, 503, 3, 0.1, None, 'https://a.example')
+
+    tracker = RetryTracker('https://a.example', max_attempts=3, retry_interval=10, dns_error_multiplier=2)
+    assert tracker.record(DNS_ERROR) == DECISION_RETRY
+    assert tracker.next_interval() == 20
+    assert tracker.record(DNS_ERROR) == DECISION_ALTERNATIVE
+    assert tracker.record_alternative(True, 'dns_success') == DECISION_UP
+    assert tracker.result()[:3] == (True, 200, 2)
+
+    # Неудача движка tcp не считается DNS-ошибкой: интервал не растет, альтернативной проверки нет
+    tracker = RetryTracker('https://a.example', max_attempts=3, retry_interval=10, dns_error_multiplier=2)
+    tcp_down = (False, 0, 0.01, None, 'https://a.example', 'tcp_down')
+    assert tracker.record(tcp_down) == DECISION_RETRY
+    assert tracker.next_interval() == 10
+    assert tracker.record(tcp_down) == DECISION_RETRY
+    assert tracker.dns_errors_count == 0
+
+
+def test_dispatcher_does_not_wait_for_confirmation():
+    """Подтверждение идет по своему таймеру, итог приходит в callback"""
+    results = {}
+    probes = {'a': [DOWN, UP], 'b': [DOWN, DOWN, DOWN]}
+
+    async def probe(url):
+        return probes[url].pop(0)
+
+    async def alternative(url):
+        return False, 'dns_failed'
+
+    async def on_complete(site, result):
+        results[site['id']] = (result, time.monotonic())
+
+    async def run():
+        queue = ConfirmationQueue(probe, alternative, on_complete)
+        queue.start()
+        started = time.monotonic()
+        for key in ('a', 'b'):
+            tracker = RetryTracker(key, max_attempts=3, retry_interval=0.1)
+            decision = tracker.record(await probe(key))
+            assert decision == DECISION_RETRY
+            assert queue.submit(key, {'id': key}, tracker, decision)
+        # Постановка в очередь не ждет повторных попыток
+        assert time.monotonic() - started < 0.05
+        assert queue.is_pending('a') and queue.is_pending('b')
+        assert not queue.submit('a', {'id': 'a'}, RetryTracker('a', 3, 0.1), DECISION_RETRY)
+        while len(queue):
+            await asyncio.sleep(0.01)
+        await queue.stop()
+        return started
+
+    started = asyncio.run(run())
+    print(f"Результаты подтверждения: {results}")
+    assert results['a'][0][0] is True and results['a'][0][2] == 2
+    assert results['b'][0][0] is False and results['b'][0][2] == 3
+    assert results['b'][1] - started >= 0.2
+
+
+def test_retries_use_probe_options():
+    """Повторные попытки выполняются с теми же методом и движком, что и первая"""
+    calls = []
+
+    async def probe(url, **options):
+        calls.append(options)
+        return UP
+
+    async def alternative(url):
+        return False, 'dns_failed'
+
+    async def on_complete(site, result):
+        pass
+
+    async def run():
+        queue = ConfirmationQueue(probe, alternative, on_complete)
+        queue.start()
+        options = {'extract_title': False, 'method': 'HEAD', 'engine': 'curl', 'fingerprint_rules': None}
+        tracker = RetryTracker('https://a.example', max_attempts=3, retry_interval=0.01, probe_options=options)
+        assert queue.submit(1, {'id': 1}, tracker, tracker.record(DOWN))
+        while len(queue):
+            await asyncio.sleep(0.01)
+        await queue.stop()
+
+    asyncio.run(run())
+    assert calls == [{'extract_title': False, 'method': 'HEAD', 'engine': 'curl', 'fingerprint_rules': None}]
+
+
+def test_deferred_retries_are_not_counted():
+    """Пока defer_func откладывает сайт, повторная попытка не выполняется и не засчитывается"""
+    calls = []
+    shedding = {'on': True}
+    results = []
+
+    async def probe(url, **options):
+        calls.append(url)
+        return UP
+
+    async def alternative(url):
+        return False, 'dns_failed'
+
+    async def on_complete(site, result):
+        results.append(result)
+
+    async def run():
+        queue = ConfirmationQueue(probe, alternative, on_complete, defer_func=lambda site: shedding['on'])
+        queue.start()
+        tracker = RetryTracker('https://a.example', max_attempts=3, retry_interval=0.01)
+        assert queue.submit(1, {'id': 1}, tracker, tracker.record(DOWN))
+        await asyncio.sleep(0.05)
+        assert calls == [] and queue.is_pending(1)
+        shedding['on'] = False
+        while len(queue):
+            await asyncio.sleep(0.01)
+        await queue.stop()
+
+    asyncio.run(run())
+    assert calls == ['https://a.example']
+    assert results[0][:3] == (True, 200, 2)
+
+
+if __name__ == "__main__":
+    test_tracker_matches_retry_semantics()
+    test_dispatcher_does_not_wait_for_confirmation()
+    test_retries_use_probe_options()
+    test_deferred_retries_are_not_counted()
+    print("Все тесты очереди подтверждения пройдены")
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки отпечатка содержимого страницы.
+Запросы идут к локальному HTTP-серверу, внешняя сеть не нужна.
+"""
+
+import asyncio
+import hashlib
+import itertools
+import os
+import sys
+
+from aiohttp import web
+
+# Добавляем путь к основному файлу для импорта
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from content_fingerprint import ContentFingerprint, FingerprintLog, StripRules
+from http_sessions import AiohttpSessionManager, CurlSessionPool
+from probe_engines import AiohttpProbeEngine, CurlProbeEngine
+
+PAGE = b'<html><head><title>Shop</title></head>\n<body>\n' + b'<p>item</p>\n' * 20000 + b'</body></html>'
+
+
+def fingerprint_of(chunks, rules=None):
+    fingerprint = ContentFingerprint(rules)
+    for chunk in chunks:
+        fingerprint.update(chunk)
+    return fingerprint.hexdigest()
+
+
+def test_fingerprint_is_incremental():
+    """Отпечаток не зависит от разбиения тела на части; правила срабатывают на границе частей"""
+    whole = hashlib.blake2b(PAGE, digest_size=16).hexdigest()
+    assert fingerprint_of([PAGE]) == whole
+    assert fingerprint_of([PAGE[i:i + 1000] for i in range(0, len(PAGE), 1000)]) == whole
+
+    rules = StripRules.parse(['csrf="[^"]*"', 'built in [0-9]+ms'])
+    first = b'<form csrf="abc123">\n<p>built in 12ms</p>\n<p>text</p>'
+    second = b'<form csrf="zzz">\n<p>built in 345ms</p>\n<p>text</p>'
+    assert fingerprint_of([first], rules) == fingerprint_of([second[:9], second[9:30], second[30:]], rules)
+    assert fingerprint_of([first], rules) != fingerprint_of([first.replace(b'text', b'hacked')], rules)
+    assert fingerprint_of([first]) != fingerprint_of([second])
+
+    # Некорректное правило пропускается, текст разбивается на правила по строкам
+    assert StripRules.parse(['(', 'ok']).patterns == ('ok',)
+    assert StripRules.parse('a+\n\nb+').key == ('a+', 'b+')
+    assert not StripRules.parse(None)
+
+    log = FingerprintLog(max_entries=1)
+    log.record(('a', ()), 'x')
+    log.record(('b', ()), 'y')
+    assert log.get(('a', ())) is None and log.get(('b', ())) == 'y'
+
+
+async def start_server():
+    counter = itertools.count()
+
+    async def page(request):
+        return web.Response(body=PAGE, content_type='text/html')
+
+    async def dynamic(request):
+        body = f'<title>Dynamic</title>\n<input name="token" value="{next(counter)}">\n<p>stable</p>'
+        return web.Response(text=body, content_type='text/html')
+
+    app = web.Application()
+    app.router.add_get('/', page)
+    app.router.add_get('/dynamic', dynamic)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+def test_engines_fingerprint_whole_body():
+    """Оба HTTP-движка хэшируют все тело (заголовок тоже извлекается) и учитывают правила очистки"""
+    async def run():
+        runner, base = await start_server()
+        curl_pool = CurlSessionPool(size=1)
+        sessions = AiohttpSessionManager()
+        rules = StripRules(['value="[0-9]+"'])
+        try:
+            for engine in (CurlProbeEngine(curl_pool), AiohttpProbeEngine(sessions)):
+                result = await engine.probe(base + '/', fingerprint=ContentFingerprint(), method='HEAD')
+                assert result.page_title == 'Shop' and result.content_hash == fingerprint_of([PAGE])
+
+                hashes = set()
+                for _ in range(2):
+                    result = await engine.probe(base + '/dynamic', fingerprint=ContentFingerprint(rules))
+                    hashes.add(result.content_hash)
+                assert len(hashes) == 1 and None not in hashes
+
+                assert (await engine.probe(base + '/')).content_hash is None
+        finally:
+            await curl_pool.close()
+            await sessions.close()
+            await runner.cleanup()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_fingerprint_is_incremental()
+    test_engines_fingerprint_whole_body()
+    print("Все тесты отпечатка содержимого пройдены")
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки общего DNS-кэша.
+Ответы DNS подменяются, время - управляемые часы; внешняя сеть не нужна.
+"""
+
+import asyncio
+import os
+import socket
+import sys
+
+from aiohttp import web
+
+# Добавляем путь к основному файлу для импорта
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from dns_cache import CachedAiohttpResolver, DnsResolverCache
+from http_sessions import AiohttpSessionManager
+from net_probes import FAILURE_DNS, tcp_probe
+
+
+class FakeDnsCache(DnsResolverCache):
+    """Кэш с подмененным разрешением: имя -> (адреса, TTL); отсутствующее имя - NXDOMAIN"""
+
+    def __init__(self, records, delay=0.0, **kwargs):
+        super().__init__(use_aiodns=False, **kwargs)
+        self.records = records
+        self.delay = delay
+        self.queries = []
+
+    async def _lookup_aiodns(self, host):
+        raise AssertionError("aiodns не должен использоваться")
+
+    async def _lookup_system(self, host):
+        self.queries.append(host)
+        await asyncio.sleep(self.delay)
+        if host not in self.records:
+            raise socket.gaierror(socket.EAI_NONAME, f"{host}: имя не найдено")
+        if self.records[host] is None:
+            raise socket.gaierror(socket.EAI_AGAIN, f"{host}: DNS-сервер не ответил")
+        return self.records[host]
+
+
+def test_ttl_and_negative_cache():
+    """Адреса живут по TTL записи, NXDOMAIN - negative_ttl, временные ошибки не кэшируются"""
+    async def run():
+        now = [0.0]
+        cache = FakeDnsCache({'short.example': ([(socket.AF_INET, '192.0.2.1')], 30),
+                              'long.example': ([(socket.AF_INET, '192.0.2.2'), (socket.AF_INET6, '2001:db8::2')], 86400),
+                              'flaky.example': None},
+                             negative_ttl=60, max_ttl=3600, clock=lambda: now[0])
+
+        assert await cache.resolve('Short.Example.') == [(socket.AF_INET, '192.0.2.1')]
+        assert await cache.getaddrinfo('short.example', 443) == [(socket.AF_INET, ('192.0.2.1', 443))]
+        now[0] = 29
+        await cache.resolve('short.example')
+        assert cache.queries == ['short.example']
+        now[0] = 30
+        await cache.resolve('short.example')
+        assert cache.queries == ['short.example'] * 2
+
+        # TTL больше max_ttl ограничивается
+        await cache.resolve('long.example')
+        now[0] = 30 + 3600
+        await cache.resolve('long.example')
+        assert cache.queries.count('long.example') == 2
+
+        for _ in range(3):
+            try:
+                await cache.resolve('missing.example')
+                assert False, "несуществующее имя должно давать ошибку"
+            except socket.gaierror as e:
+                assert e.errno == socket.EAI_NONAME
+        assert cache.queries.count('missing.example') == 1
+        now[0] += 60
+        try:
+            await cache.resolve('missing.example')
+        except socket.gaierror:
+            pass
+        assert cache.queries.count('missing.example') == 2
+
+        for _ in range(2):
+            try:
+                await cache.resolve('flaky.example')
+            except socket.gaierror as e:
+                assert e.errno == socket.EAI_AGAIN
+        assert cache.queries.count('flaky.example') == 2
+
+        # Запрос мимо кэша (альтернативная проверка) всегда идет в DNS и не меняет кэш
+        assert await cache.lookup('short.example') == [(socket.AF_INET, '192.0.2.1')]
+        assert cache.queries.count('short.example') == 3 and cache.lookups == 8
+
+        # IP-адрес не разрешается и не кэшируется
+        assert await cache.resolve('127.0.0.1') == [(socket.AF_INET, '127.0.0.1')]
+        assert await cache.resolve('::1') == [(socket.AF_INET6, '::1')]
+
+        stats = cache.take_stats()
+        assert stats['hits'] == 2 and stats['negative_hits'] == 2 and stats['lookups'] == 8
+        assert cache.take_stats()['lookups'] == 0
+
+    asyncio.run(run())
+
+
+def test_concurrent_lookups_are_coalesced():
+    """Одновременные запросы одного имени дают один DNS-запрос, в том числе при ошибке"""
+    async def run():
+        cache = FakeDnsCache({'shop.example': ([(socket.AF_INET, '192.0.2.10')], 300)}, delay=0.05)
+        results = await asyncio.gather(*(cache.resolve('shop.example') for _ in range(20)))
+        assert all(result == [(socket.AF_INET, '192.0.2.10')] for result in results)
+        assert cache.queries == ['shop.example'] and cache.coalesced == 19
+
+        results = await asyncio.gather(*(cache.resolve('gone.example') for _ in range(5)), return_exceptions=True)
+        assert all(isinstance(result, socket.gaierror) for result in results)
+        assert cache.queries.count('gone.example') == 1
+
+        # Отмена первого запросившего не отменяет запрос для остальных
+        cache.records['other.example'] = ([(socket.AF_INET, '192.0.2.20')], 300)
+        first = asyncio.ensure_future(cache.resolve('other.example'))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(cache.resolve('other.example'))
+        await asyncio.sleep(0)
+        first.cancel()
+        assert await waiter == [(socket.AF_INET, '192.0.2.20')]
+        assert first.cancelled() and not cache._inflight
+
+    asyncio.run(run())
+
+
+def test_probes_share_cache():
+    """HTTP-запросы aiohttp и TCP-проверки одного хоста разрешают имя один раз"""
+    async def run():
+        async def page(request):
+            return web.Response(text='<title>DNS</title>', content_type='text/html')
+
+        app = web.Application()
+        app.router.add_get('/', page)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        cache = FakeDnsCache({'monitored.example': ([(socket.AF_INET, '127.0.0.1')], 300)})
+        sessions = AiohttpSessionManager(resolver=CachedAiohttpResolver(cache))
+        try:
+            for _ in range(3):
+                async with sessions.get(f'http://monitored.example:{port}/') as response:
+                    assert response.status == 200
+                result = await tcp_probe('monitored.example', port, timeout=2, resolver=cache)
+                assert result.reachable and result.address == '127.0.0.1'
+            assert cache.queries == ['monitored.example']
+            assert sessions.stats()['dns_cached_hosts'] == 1
+
+            result = await tcp_probe('unknown.example', port, timeout=2, resolver=cache)
+            assert not result.reachable and result.failure == FAILURE_DNS
+        finally:
+            await sessions.close()
+            await runner.cleanup()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_ttl_and_negative_cache()
+    test_concurrent_lookups_are_coalesced()
+    test_probes_share_cache()
+    print("Все тесты DNS-кэша пройдены")
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки пула сессий curl_cffi и общей сессии aiohttp.
+Запросы идут к локальному HTTP-серверу, внешняя сеть не нужна.
+"""
+
+import asyncio
+import os
+import sys
+
+from aiohttp import web
+
+# Добавляем путь к основному файлу для импорта
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from http_sessions import AiohttpSessionManager, CurlSessionPool, ProbeMethodMemory, ValidatorCache, is_session_error
+
+
+async def start_server(connections):
+    async def handler(request):
+        connections.add(request.transport.get_extra_info('peername'))
+        return web.Response(text="<html><title>ok</title></html>", content_type='text/html')
+
+    app = web.Application()
+    app.router.add_get('/', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/"
+
+
+def test_connections_are_reused():
+    """Последовательные проверки идут через уже открытое соединение"""
+    async def run():
+        connections = set()
+        runner, url = await start_server(connections)
+        pool = CurlSessionPool(size=1, max_clients=2)
+        try:
+            for _ in range(10):
+                response = await pool.get(url, timeout=5)
+                assert response.status_code == 200
+        finally:
+            await pool.close()
+            await runner.cleanup()
+        print(f"10 запросов через {len(connections)} соединений")
+        assert len(connections) == 1
+
+    asyncio.run(run())
+
+
+def test_per_request_sessions_when_disabled():
+    """При size=0 каждая проверка открывает новое соединение (прежнее поведение)"""
+    async def run():
+        connections = set()
+        runner, url = await start_server(connections)
+        pool = CurlSessionPool(size=0)
+        try:
+            for _ in range(3):
+                await pool.get(url, timeout=5)
+        finally:
+            await runner.cleanup()
+        assert len(connections) == 3
+
+    asyncio.run(run())
+
+
+def test_broken_session_is_rebuilt():
+    """После ошибки multi-хендла сессия пересоздается, обычные ошибки запроса ее не трогают"""
+    created = []
+
+    class FakeSession:
+        def __init__(self, **kwargs):
+            self.closed = False
+            self.fail_with = None
+            created.append(self)
+
+        async def request(self, method, url, **kwargs):
+            if self.fail_with:
+                raise self.fail_with
+            return 'ok'
+
+        async def close(self):
+            self.closed = True
+
+    async def run():
+        pool = CurlSessionPool(size=1, session_factory=FakeSession)
+        assert await pool.get('https://a.example') == 'ok'
+        created[0].fail_with = RuntimeError("Failed to perform, curl: (28) Operation timed out")
+        try:
+            await pool.get('https://a.example')
+        except RuntimeError:
+            pass
+        assert len(created) == 1 and not created[0].closed
+
+        created[0].fail_with = RuntimeError("Curlm alread closed!")
+        try:
+            await pool.get('https://a.example')
+        except RuntimeError:
+            pass
+        assert created[0].closed and pool.rebuilds == 1
+        assert await pool.get('https://a.example') == 'ok'
+        assert len(created) == 2
+        await pool.close()
+        assert created[1].closed
+
+    asyncio.run(run())
+    assert is_session_error(RuntimeError("Curlm alread closed!"))
+    assert not is_session_error(RuntimeError("curl: (6) Could not resolve host"))
+
+
+def test_aiohttp_shared_session():
+    """Проверки через aiohttp идут по одному соединению, статистика пула доступна"""
+    async def run():
+        connections = set()
+        runner, url = await start_server(connections)
+        manager = AiohttpSessionManager(limit=10, limit_per_host=2, ttl_dns_cache=300)
+        try:
+            for _ in range(10):
+                async with manager.get(url) as response:
+                    assert response.status == 200
+                    await response.text()
+            stats = manager.stats()
+            print(f"Пул aiohttp: {manager.summary()}")
+            assert stats['requests'] == 10
+            assert stats['in_use'] == 0 and stats['idle'] == 1
+            assert manager.active
+        finally:
+            await manager.close()
+            await runner.cleanup()
+        assert len(connections) == 1
+        assert not manager.active
+
+    asyncio.run(run())
+
+
+def test_probe_method_memory():
+    """Хост, отклонивший HEAD, проверяется через GET до истечения ttl"""
+    now = [0.0]
+    memory = ProbeMethodMemory(ttl=100, max_hosts=2, clock=lambda: now[0])
+    assert memory.method_for('a.example') == 'HEAD'
+    memory.remember('a.example', 'GET')
+    memory.remember('b.example', 'HEAD')
+    assert memory.method_for('a.example') == 'GET'
+    assert memory.method_for('b.example') == 'HEAD'
+    assert memory.stats() == {'head': 1, 'get': 1}
+
+    now[0] = 100
+    assert memory.method_for('a.example') == 'HEAD'
+
+    # Самые старые записи вытесняются
+    memory.remember('c.example', 'GET')
+    memory.remember('d.example', 'GET')
+    assert memory.method_for('b.example') == 'HEAD' and memory.method_for('c.example') == 'GET'
+    assert len(memory.stats()) == 2 and sum(memory.stats().values()) == 2
+
+
+def test_head_requests_skip_body():
+    """HEAD через пул curl_cffi получает код ответа без тела, отказ в HEAD виден по коду"""
+    async def run():
+        async def page(request):
+            return web.Response(body=b'x' * 100000, content_type='text/html')
+
+        async def no_head(request):
+            if request.method == 'HEAD':
+                return web.Response(status=405)
+            return web.Response(text='ok')
+
+        app = web.Application()
+        app.router.add_get('/', page)
+        app.router.add_route('*', '/strict', no_head)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        pool = CurlSessionPool(size=1)
+        try:
+            response = await pool.request('HEAD', f"http://127.0.0.1:{port}/", timeout=5)
+            assert response.status_code == 200 and response.content == b''
+            response = await pool.request('HEAD', f"http://127.0.0.1:{port}/strict", timeout=5)
+            assert response.status_code == 405
+            response = await pool.get(f"http://127.0.0.1:{port}/strict", timeout=5)
+            assert response.status_code == 200
+        finally:
+            await pool.close()
+            await runner.cleanup()
+
+    asyncio.run(run())
+
+
+def test_conditional_requests():
+    """Повторная загрузка страницы с валидаторами получает 304 без тела"""
+    async def run():
+        bodies = []
+
+        async def page(request):
+            if request.headers.get('If-None-Match') == '"v1"':
+                return web.Response(status=304, headers={'ETag': '"v1"'})
+            bodies.append(1)
+            return web.Response(text='<title>Shop</title>', content_type='text/html', headers={'ETag': '"v1"'})
+
+        async def no_validators(request):
+            return web.Response(text='<title>Plain</title>', content_type='text/html')
+
+        app = web.Application()
+        app.router.add_get('/', page)
+        app.router.add_get('/plain', no_validators)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        url = f"http://127.0.0.1:{port}/"
+        cache = ValidatorCache()
+        pool = CurlSessionPool(size=1)
+        try:
+            assert ValidatorCache.request_headers(cache.lookup(url)) == {}
+            response = await pool.get(url, timeout=5)
+            cache.store(url, response.headers, response.status_code, 'Shop', response.url)
+
+            entry = cache.lookup(url)
+            assert ValidatorCache.request_headers(entry) == {'If-None-Match': '"v1"'}
+            response = await pool.get(url, timeout=5, headers=ValidatorCache.request_headers(entry))
+            assert response.status_code == 304 and response.content == b''
+            assert cache.record_not_modified(entry)['page_title'] == 'Shop'
+            assert len(bodies) == 1 and cache.take_not_modified() == 1
+
+            # Страница без валидаторов не сохраняется
+            response = await pool.get(url + 'plain', timeout=5)
+            cache.store(url + 'plain', response.headers, response.status_code, 'Plain', response.url)
+            assert cache.lookup(url + 'plain') is None
+        finally:
+            await pool.close()
+            await runner.cleanup()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_connections_are_reused()
+    test_per_request_sessions_when_disabled()
+    test_broken_session_is_rebuilt()
+    test_aiohttp_shared_session()
+    test_probe_method_memory()
+    test_head_requests_skip_body()
+    test_conditional_requests()
+    print("Все тесты пула сессий пройдены")
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки неблокирующей TCP-проверки.
+Подключения идут к локальным портам, внешняя сеть не нужна.
+"""
+
+import asyncio
+import datetime
+import ipaddress
+import os
+import socket
+import ssl
+import sys
+import tempfile
+from urllib.parse import urlparse
+
+from aiohttp import web
+from aiohttp.abc import AbstractResolver
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+# Добавляем путь к основному файлу для импорта
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from http_sessions import AiohttpSessionManager
+from net_probes import (CONFIRM_DNS_FAILED, CONFIRM_DNS_TIMEOUT, CONFIRM_TCP_FAILED, CONFIRM_TCP_SUCCESS, FAILURE_DNS,
+                        FAILURE_REFUSED, FAILURE_TIMEOUT, FAILURE_UNREACHABLE, PeerCertificateLog, classify_connect_error,
+                        confirm_host, tcp_probe, tls_probe)
+from probe_engines import AiohttpProbeEngine
+
+
+def closed_port():
+    """Порт, на котором гарантированно никто не слушает"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def test_tcp_probe_classifies_results():
+    """Успешное подключение, отказ, DNS-ошибка и перебор всех адресов хоста"""
+    async def run():
+        server = await asyncio.start_server(lambda reader, writer: writer.close(), '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            result = await tcp_probe('127.0.0.1', port, timeout=2)
+            assert result.reachable and result.address == '127.0.0.1'
+            assert 0 <= result.connect_time <= result.elapsed < 2
+
+            result = await tcp_probe('127.0.0.1', closed_port(), timeout=2)
+            assert not result.reachable and result.failure == FAILURE_REFUSED
+
+            result = await tcp_probe('no-such-host.invalid', 80, timeout=2)
+            assert not result.reachable and result.failure == FAILURE_DNS
+
+            # Первый адрес отказывает, подключение удается ко второму
+            addresses = [(socket.AF_INET, ('127.0.0.1', closed_port())), (socket.AF_INET, ('127.0.0.1', port))]
+            result = await tcp_probe('multi.example', port, timeout=2, addresses=addresses)
+            assert result.reachable and [failure for _, failure in result.attempts] == [FAILURE_REFUSED, None]
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(run())
+
+
+def test_tcp_probe_does_not_block_loop():
+    """Пока подключение к неотвечающему адресу ждет таймаута, цикл событий продолжает работать"""
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        # Очередь подключений слушающего сокета заполнена - новые SYN отбрасываются, подключение зависает
+        listener = socket.socket()
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(0)
+        port = listener.getsockname()[1]
+        filler = socket.create_connection(('127.0.0.1', port))
+        task = asyncio.create_task(ticker())
+        try:
+            result = await tcp_probe('127.0.0.1', port, timeout=0.5)
+        finally:
+            task.cancel()
+            filler.close()
+            listener.close()
+        assert not result.reachable and result.failure == FAILURE_TIMEOUT
+        assert 0.4 < result.elapsed < 1.0 and ticks >= 20
+
+    asyncio.run(run())
+
+    assert classify_connect_error(asyncio.TimeoutError()) == FAILURE_TIMEOUT
+    assert classify_connect_error(ConnectionRefusedError()) == FAILURE_REFUSED
+    assert classify_connect_error(OSError(101, 'Network is unreachable')) == FAILURE_UNREACHABLE
+    assert classify_connect_error(socket.gaierror(-2, 'Name or service not known')) == FAILURE_DNS
+
+
+def make_certificate(directory, host='localhost'):
+    """Самоподписанный сертификат хоста (по умолчанию localhost) на 30 дней: пути к сертификату и ключу"""
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, host)])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key())
+            .serial_number(1).not_valid_before(now - datetime.timedelta(days=1))
+            .not_valid_after(now + datetime.timedelta(days=30))
+            .add_extension(x509.SubjectAlternativeName([x509.DNSName(host),
+                                                        x509.IPAddress(ipaddress.ip_address('127.0.0.1'))]), False)
+            .sign(key, hashes.SHA256()))
+    cert_path, key_path = os.path.join(directory, 'cert.pem'), os.path.join(directory, 'key.pem')
+    with open(cert_path, 'wb') as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, 'wb') as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                  serialization.NoEncryption()))
+    return cert_path, key_path
+
+
+class FakeResolver:
+    """Резолвер с заданным ответом: список адресов, ошибка или зависание"""
+
+    def __init__(self, answer):
+        self.answer = answer
+
+    async def lookup(self, host):
+        if self.answer == 'hang':
+            await asyncio.sleep(10)
+        if isinstance(self.answer, BaseException):
+            raise self.answer
+        return self.answer
+
+
+class LoopbackResolver(AbstractResolver):
+    """Резолвер aiohttp, разрешающий любое имя в 127.0.0.1"""
+
+    async def resolve(self, host, port=0, family=socket.AF_INET):
+        return [{'hostname': host, 'host': '127.0.0.1', 'port': port, 'family': socket.AF_INET,
+                 'proto': 0, 'flags': socket.AI_NUMERICHOST}]
+
+    async def close(self):
+        pass
+
+
+def test_confirm_host_without_subprocesses():
+    """Подтверждение: ответ каждого резолвера и каждого порта, итог как у ping/nslookup"""
+    async def run():
+        server = await asyncio.start_server(lambda reader, writer: writer.close(), '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        nxdomain = socket.gaierror(socket.EAI_NONAME, 'not found')
+        local = [(socket.AF_INET, '127.0.0.1')]
+        try:
+            # Системный резолвер не отвечает, публичный находит адрес - хост доступен
+            result = await confirm_host('site.example', {'system': FakeResolver('hang'), '1.1.1.1': FakeResolver(local)},
+                                        ports=(closed_port(), port), timeout=2)
+            assert result.available and result.verdict == CONFIRM_TCP_SUCCESS
+            assert result.dns == {'system': 'timeout', '1.1.1.1': local}
+            assert [probe.reachable for probe in result.tcp] == [False, True]
+            assert 'DNS system: timeout' in result.describe() and 'DNS 1.1.1.1: 127.0.0.1' in result.describe()
+
+            result = await confirm_host('site.example', {'system': FakeResolver(local)}, ports=(closed_port(),), timeout=2)
+            assert not result.available and result.verdict == CONFIRM_TCP_FAILED
+            assert result.tcp[0].failure == FAILURE_REFUSED
+
+            result = await confirm_host('gone.example', {'system': FakeResolver(nxdomain), '8.8.8.8': FakeResolver([])}, timeout=2)
+            assert result.verdict == CONFIRM_DNS_FAILED and result.dns == {'system': 'nxdomain', '8.8.8.8': 'nxdomain'}
+            assert result.tcp == []
+
+            result = await confirm_host('slow.example', {'system': FakeResolver('hang')}, timeout=0.2)
+            assert not result.available and result.verdict == CONFIRM_DNS_TIMEOUT
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(run())
+
+
+def test_certificate_from_probe_and_tls_probe():
+    """Сертификат берется из соединения HTTP-проверки; отдельная TLS-проверка дает те же сведения"""
+    async def run(directory):
+        cert_path, key_path = make_certificate(directory)
+        server_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        server_context.load_cert_chain(cert_path, key_path)
+        client_context = ssl.create_default_context(cafile=cert_path)
+
+        async def page(request):
+            return web.Response(text='<title>TLS</title>', content_type='text/html')
+
+        app = web.Application()
+        app.router.add_get('/', page)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0, ssl_context=server_context)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        sessions = AiohttpSessionManager()
+        certificates = PeerCertificateLog()
+        try:
+            info = await tls_probe('localhost', port, timeout=2, context=client_context)
+            assert info.subject == 'localhost' and info.issuer == 'localhost'
+            assert info.sans == ['localhost', '127.0.0.1'] and 28 <= info.days_left() <= 30
+
+            # Без доверия к издателю сертификат не принимается
+            try:
+                await tls_probe('localhost', port, timeout=2)
+                assert False, "самоподписанный сертификат не должен пройти проверку"
+            except ssl.SSLCertVerificationError:
+                pass
+
+            engine = AiohttpProbeEngine(sessions, certificates=certificates)
+            async with sessions.get(f'https://localhost:{port}/', ssl=client_context) as response:
+                await response.read()
+                engine.record_certificate(response)
+            captured = certificates.get('LOCALHOST', port)
+            assert captured.fingerprint == info.fingerprint and captured.not_after == info.not_after
+            assert certificates.get('localhost') is None
+        finally:
+            await sessions.close()
+            await runner.cleanup()
+
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(run(directory))
+
+    now = [0.0]
+    log = PeerCertificateLog(max_age=10, clock=lambda: now[0])
+    log.record('example.com', 443, 'cert')
+    now[0] = 11
+    assert log.get('example.com') is None
+
+
+def test_certificate_of_idn_host():
+    """Сертификат IDN-домена сохраняется под punycode-именем, по которому его ищет проверка SSL"""
+    host = 'пример.испытание'
+    punycode = host.encode('idna').decode('ascii')
+
+    async def run(directory):
+        cert_path, key_path = make_certificate(directory, punycode)
+        server_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        server_context.load_cert_chain(cert_path, key_path)
+        client_context = ssl.create_default_context(cafile=cert_path)
+
+        async def page(request):
+            return web.Response(text='<title>IDN</title>', content_type='text/html')
+
+        app = web.Application()
+        app.router.add_get('/', page)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0, ssl_context=server_context)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        sessions = AiohttpSessionManager(resolver=LoopbackResolver())
+        certificates = PeerCertificateLog()
+        try:
+            engine = AiohttpProbeEngine(sessions, certificates=certificates)
+            async with sessions.get(f'https://{host}:{port}/', ssl=client_context) as response:
+                engine.record_certificate(response)
+                await response.read()
+            # Ключ совпадает с хостом, который check_ssl_certificate берет из URL сайта (punycode)
+            domain = urlparse(f'https://{punycode}:{port}/').hostname
+            assert certificates.get(domain, port).subject == punycode
+            assert certificates.get(host, port) is None
+        finally:
+            await sessions.close()
+            await runner.cleanup()
+
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(run(directory))
+
+
+if __name__ == "__main__":
+    test_tcp_probe_classifies_results()
+    test_tcp_probe_does_not_block_loop()
+    test_confirm_host_without_subprocesses()
+    test_certificate_from_probe_and_tls_probe()
+    test_certificate_of_idn_host()
+    print("Все тесты TCP-проверки пройдены")
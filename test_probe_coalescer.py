@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки дедупликации проверок одного URL.
+Сетевые запросы заменены функцией с задержкой и счетчиком вызовов.
+"""
+
+import asyncio
+import os
+import sys
+
+# Добавляем путь к основному файлу для импорта
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from probe_coalescer import ProbeCoalescer, ProbeGroup, group_sites, normalize_url
+from check_scheduler import SiteScheduler
+
+
+def test_normalize_url():
+    """Варианты записи одного адреса дают один ключ"""
+    assert normalize_url('HTTPS://Example.COM/') == 'https://example.com'
+    assert normalize_url('https://example.com:443') == 'https://example.com'
+    assert normalize_url('https://example.com#top') == 'https://example.com'
+    assert normalize_url('https://example.com:8443/shop?x=1') == 'https://example.com:8443/shop?x=1'
+    assert normalize_url('http://example.com') != normalize_url('https://example.com')
+
+
+def test_concurrent_probes_are_coalesced():
+    """Одновременные проверки одного URL выполняются одним запросом, результат получают все"""
+    calls = []
+
+    async def probe(url):
+        calls.append(url)
+        await asyncio.sleep(0.05)
+        return (True, 200, 0.05, 'Title', url, 'http')
+
+    async def run():
+        coalescer = ProbeCoalescer(ttl=30)
+        urls = ['https://a.example', 'https://A.example/', 'https://b.example'] * 5
+        results = await asyncio.gather(*[coalescer.run(normalize_url(url), lambda url=url: probe(url)) for url in urls])
+        assert len(calls) == 2
+        assert all(result[0] for result in results)
+
+        # Повторный запрос в пределах TTL берется из кэша
+        await coalescer.run(normalize_url('https://a.example'), lambda: probe('https://a.example'))
+        assert len(calls) == 2
+        stats = coalescer.take_stats()
+        print(f"Статистика дедупликации: {stats}")
+        assert stats == {'probes': 2, 'joined': 13, 'cache_hits': 1, 'shared': 0}
+
+    asyncio.run(run())
+
+
+def test_errors_are_not_cached():
+    """Ошибка проверки передается всем ожидающим, но не кэшируется"""
+    attempts = []
+
+    async def failing():
+        attempts.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("сбой")
+
+    async def run():
+        coalescer = ProbeCoalescer(ttl=30)
+        results = await asyncio.gather(coalescer.run('k', failing), coalescer.run('k', failing), return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        await asyncio.gather(coalescer.run('k', failing), return_exceptions=True)
+        assert len(attempts) == 2
+
+    asyncio.run(run())
+
+
+def test_duplicates_share_schedule_slot():
+    """Записи одного URL из разных чатов попадают в один слот расписания"""
+    scheduler = SiteScheduler(default_interval=300, smoothing=True,
+                              phase_key=lambda site: normalize_url(site['url']))
+    scheduler.sync([
+        {'id': 1, 'url': 'https://shop.example', 'chat_id': 100},
+        {'id': 2, 'url': 'https://SHOP.example/', 'chat_id': 200},
+    ], now=0)
+    assert scheduler.phase_offset(1, 300) == scheduler.phase_offset(2, 300)
+
+
+def test_group_is_probed_once_sequentially():
+    """Записи одного URL группируются до запуска и проверяются одним запросом даже без TTL"""
+    calls = []
+
+    async def probe(url):
+        calls.append(url)
+        await asyncio.sleep(0.01)
+        return (True, 200, 0.01, 'Title', url, 'http')
+
+    async def run():
+        sites = [
+            {'id': 1, 'url': 'https://shop.example'},
+            {'id': 2, 'url': 'https://other.example'},
+            {'id': 3, 'url': 'https://SHOP.example/'},
+        ]
+        groups = group_sites(sites, lambda site: normalize_url(site['url']))
+        assert [[site['id'] for site in group] for group in groups] == [[1, 3], [2]]
+        assert group_sites(sites) == [[site] for site in sites]
+
+        # Кэш по времени выключен: объединение не зависит от того, сколько шла проверка
+        coalescer = ProbeCoalescer(ttl=0, enabled=False)
+        for group in groups:
+            probes = ProbeGroup(coalescer)
+            for site in group:
+                result = await probes.run(normalize_url(site['url']), lambda site=site: probe(site['url']))
+                assert result[0]
+        assert calls == ['https://shop.example', 'https://other.example']
+        assert coalescer.take_stats()['shared'] == 1
+        coalescer.shared = 1
+        assert coalescer.summary() == "запросов 0, объединено 1"
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_normalize_url()
+    test_concurrent_probes_are_coalesced()
+    test_errors_are_not_cached()
+    test_duplicates_share_schedule_slot()
+    test_group_is_probed_once_sequentially()
+    print("Все тесты дедупликации проверок пройдены")
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки движков проверки сайтов (curl, aiohttp, tcp).
+Запросы идут к локальному HTTP-серверу, внешняя сеть не нужна.
+"""
+
+import asyncio
+import gzip
+import os
+import sys
+
+from aiohttp import web
+
+# Добавляем путь к основному файлу для импорта
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from body_reader import BodyLimits
+from http_sessions import AiohttpSessionManager, CurlSessionPool, ProbeMethodMemory, ValidatorCache
+from probe_engines import (AdaptiveProbeEngine, AiohttpProbeEngine, CurlProbeEngine, ImpersonationPins,
+                           ProbeEngineRegistry, ProbeResult, TcpProbeEngine, benchmark_engine, is_bot_challenge)
+from probe_timings import CURL_TIMING_INFOS, aiohttp_trace_config
+
+
+async def start_server():
+    async def page(request):
+        if request.headers.get('If-None-Match') == '"v1"':
+            return web.Response(status=304)
+        return web.Response(text='<html><title>Главная</title></html>', content_type='text/html',
+                            headers={'ETag': '"v1"'})
+
+    async def no_head(request):
+        if request.method == 'HEAD':
+            return web.Response(status=405)
+        return web.Response(text='<title>GET only</title>', content_type='text/html')
+
+    async def forbidden(request):
+        return web.Response(status=403)
+
+    async def protected(request):
+        # Защита от ботов пропускает только запросы с заголовками браузера
+        if 'sec-ch-ua' not in request.headers:
+            return web.Response(status=403, headers={'cf-mitigated': 'challenge'},
+                                text='<title>Just a moment...</title>', content_type='text/html')
+        return web.Response(text='<title>Магазин</title>', content_type='text/html')
+
+    async def bomb(request):
+        # 32 МБ пробелов без заголовка, сжатые в ~32 КБ
+        body = gzip.compress(b'<html><head>' + b' ' * (32 * 1024 * 1024))
+        return web.Response(body=body, headers={'Content-Type': 'text/html', 'Content-Encoding': 'gzip'})
+
+    async def slow_body(request):
+        # Заголовки отправляются сразу, тело - через полсекунды
+        response = web.StreamResponse(headers={'Content-Type': 'text/html'})
+        await response.prepare(request)
+        await asyncio.sleep(0.5)
+        await response.write(b'<html><title>Slow</title></html>')
+        await response.write_eof()
+        return response
+
+    async def large(request):
+        # 2 МБ без сжатия, передаются частями с паузами
+        response = web.StreamResponse(headers={'Content-Type': 'text/html'})
+        await response.prepare(request)
+        for _ in range(32):
+            await response.write(b' ' * 65536)
+            await asyncio.sleep(0.01)
+        await response.write_eof()
+        return response
+
+    app = web.Application()
+    app.router.add_get('/', page)
+    app.router.add_get('/large', large)
+    app.router.add_get('/slow', slow_body)
+    app.router.add_get('/bomb', bomb)
+    app.router.add_route('*', '/strict', no_head)
+    app.router.add_get('/forbidden', forbidden)
+    app.router.add_get('/protected', protected)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+def test_http_engines_share_result_format():
+    """Оба HTTP-движка дают одинаковый результат: код, заголовок, 304, возврат к GET после отказа в HEAD"""
+    async def run():
+        runner, base = await start_server()
+        curl_pool = CurlSessionPool(size=1, curl_infos=CURL_TIMING_INFOS)
+        sessions = AiohttpSessionManager(trace_configs=[aiohttp_trace_config()])
+        engines = [
+            CurlProbeEngine(curl_pool, validators=ValidatorCache(), methods=ProbeMethodMemory()),
+            AiohttpProbeEngine(sessions, validators=ValidatorCache(), methods=ProbeMethodMemory()),
+        ]
+        try:
+            for engine in engines:
+                result = await engine.probe(base + '/')
+                assert isinstance(result, ProbeResult)
+                assert result.as_tuple()[:2] == (True, 200)
+                assert result.page_title == 'Главная' and result.phases is not None
+
+                # Повторная проверка - условный запрос и 304 с прежним заголовком
+                result = await engine.probe(base + '/')
+                assert result.not_modified and result.status_code == 200 and result.page_title == 'Главная'
+
+                result = await engine.probe(base + '/strict', extract_title=False, method='HEAD')
+                assert result.status_code == 200 and result.page_title is None
+                assert engine.methods.method_for('127.0.0.1') == 'GET'
+
+                result = await engine.probe(base + '/forbidden')
+                assert result.status_code == 403 and not result.is_available
+        finally:
+            await curl_pool.close()
+            await sessions.close()
+            await runner.cleanup()
+
+    asyncio.run(run())
+
+
+def test_response_time_excludes_body():
+    """Время ответа измеряется до заголовков в обоих движках, чтение тела учитывается в фазах"""
+    async def run():
+        runner, base = await start_server()
+        curl_pool = CurlSessionPool(size=1, curl_infos=CURL_TIMING_INFOS)
+        sessions = AiohttpSessionManager(trace_configs=[aiohttp_trace_config()])
+        try:
+            for engine in (CurlProbeEngine(curl_pool), AiohttpProbeEngine(sessions)):
+                result = await engine.probe(base + '/slow')
+                assert result.page_title == 'Slow'
+                assert result.response_time < 0.4, (engine.name, result.response_time)
+        finally:
+            await curl_pool.close()
+            await sessions.close()
+            await runner.cleanup()
+
+    asyncio.run(run())
+
+
+def test_curl_counter_is_not_read_after_transfer():
+    """После окончания передачи счетчик загрузки не читает дескриптор, отданный другому запросу"""
+    async def run():
+        runner, base = await start_server()
+        curl_pool = CurlSessionPool(size=1, max_clients=1)
+        try:
+            first = await curl_pool.get(base + '/', stream=True)
+            counter = CurlProbeEngine.downloaded_counter(first)
+            await first.stream_task
+            chunks = [chunk async for chunk in first.aiter_content()]
+            before = counter()
+            assert before <= sum(len(chunk) for chunk in chunks)
+
+            # Освобожденный дескриптор (max_clients=1) загружает другой ответ
+            second = await curl_pool.get(base + '/large', stream=True)
+            other = CurlProbeEngine.downloaded_counter(second)
+            async for _ in second.aiter_content():
+                assert counter() == before
+                other()
+            assert 0 < other() <= 2 * 1024 * 1024
+        finally:
+            await curl_pool.close()
+            await runner.cleanup()
+
+    asyncio.run(run())
+
+
+def test_body_limits_abort_download():
+    """gzip-бомба не распаковывается целиком: сайт доступен, тело отмечено как обрезанное"""
+    async def run():
+        runner, base = await start_server()
+        curl_pool = CurlSessionPool(size=1)
+        sessions = AiohttpSessionManager()
+        limits = BodyLimits(max_download=1024 * 1024, max_decompressed=512 * 1024)
+        options = {'title_limit': 16 * 1024 * 1024, 'body_limits': limits}
+        try:
+            for engine in (CurlProbeEngine(curl_pool, **options), AiohttpProbeEngine(sessions, **options)):
+                result = await engine.probe(base + '/bomb')
+                assert result.as_tuple()[:2] == (True, 200)
+                assert result.body_truncated and result.page_title is None
+                result = await engine.probe(base + '/')
+                assert result.page_title == 'Главная' and not result.body_truncated
+            assert limits.take_truncated() == {'download': 0, 'decompressed': 2}
+        finally:
+            await curl_pool.close()
+            await sessions.close()
+            await runner.cleanup()
+
+    asyncio.run(run())
+
+
+def test_tcp_engine_and_registry():
+    """Движок tcp не делает HTTP-запрос; неизвестный движок заменяется движком по умолчанию"""
+    calls = []
+
+    async def tcp_check(url):
+        calls.append(url)
+        return url.endswith('up'), 0.01
+
+    async def run():
+        engine = TcpProbeEngine(tcp_check)
+        assert (await engine.probe('https://a.example/up')).as_tuple() == (True, 0, 0.01, None, 'https://a.example/up', 'tcp_only')
+        assert (await engine.probe('https://a.example/down')).check_type == 'tcp_down'
+
+        registry = ProbeEngineRegistry(default='tcp')
+        registry.register(engine)
+        assert registry.get('TCP') is engine and registry.get(None) is engine and registry.get('quic') is engine
+        assert registry.names() == ['tcp']
+
+        # Неизвестный движок по умолчанию (опечатка в настройке) не приводит к KeyError
+        registry = ProbeEngineRegistry(default='curll')
+        registry.register(engine)
+        assert registry.get(None) is engine and registry.get('aiohttp') is engine
+
+        stats = await benchmark_engine(engine, 'https://a.example/up', requests=20, concurrency=5)
+        assert stats['requests'] == 20 and stats['errors'] == 0 and stats['rps'] > 0
+
+    asyncio.run(run())
+    assert len(calls) == 22
+
+
+def test_adaptive_impersonation():
+    """Имперсонация включается только для хоста с защитой от ботов и закрепляется за ним"""
+    async def run():
+        runner, base = await start_server()
+        curl_pool = CurlSessionPool(size=1)
+        sessions = AiohttpSessionManager()
+        engine = AdaptiveProbeEngine(AiohttpProbeEngine(sessions), CurlProbeEngine(curl_pool))
+        try:
+            result = await engine.probe(base + '/')
+            assert result.status_code == 200
+            assert engine.take_stats() == {'plain': 1, 'impersonated': 0, 'pinned_hosts': 0}
+
+            result = await engine.probe(base + '/protected')
+            assert result.status_code == 200 and result.page_title == 'Магазин'
+            assert engine.pins.is_pinned('127.0.0.1')
+            # Закрепленный хост проверяется сразу с имперсонацией
+            await engine.probe(base + '/protected')
+            assert engine.take_stats() == {'plain': 1, 'impersonated': 2, 'pinned_hosts': 1}
+        finally:
+            await curl_pool.close()
+            await sessions.close()
+            await runner.cleanup()
+
+    asyncio.run(run())
+
+
+def test_impersonation_is_not_repeated_when_useless():
+    """Если отказывают оба клиента, имперсонация не повторяется до истечения ttl"""
+    now = [0.0]
+    calls = []
+
+    class Forbidden:
+        def __init__(self, name):
+            self.name = name
+
+        async def probe(self, url, extract_title=True, method='GET', fingerprint=None):
+            calls.append(self.name)
+            return ProbeResult(403, 0.1, url)
+
+        def is_critical_error(self, error):
+            return False
+
+    async def run():
+        pins = ImpersonationPins(ttl=100, clock=lambda: now[0])
+        engine = AdaptiveProbeEngine(Forbidden('plain'), Forbidden('curl'), pins)
+        for _ in range(3):
+            assert (await engine.probe('https://private.example/')).status_code == 403
+        assert calls == ['plain', 'curl', 'plain', 'plain']
+        assert not pins.is_pinned('private.example')
+
+        now[0] = 100
+        await engine.probe('https://private.example/')
+        assert calls[-2:] == ['plain', 'curl']
+
+    asyncio.run(run())
+
+    assert is_bot_challenge(403, {'cf-mitigated': 'challenge'})
+    assert is_bot_challenge(200, {}, 'Just a moment...')
+    assert is_bot_challenge(503, {'Server': 'ddos-guard'})
+    assert not is_bot_challenge(503, {'Server': 'nginx'})
+    assert not is_bot_challenge(200, {}, 'Главная')
+
+
+if __name__ == "__main__":
+    test_http_engines_share_result_format()
+    test_response_time_excludes_body()
+    test_curl_counter_is_not_read_after_transfer()
+    test_body_limits_abort_download()
+    test_tcp_engine_and_registry()
+    test_adaptive_impersonation()
+    test_impersonation_is_not_repeated_when_useless()
+    print("Все тесты движков проверки пройдены")
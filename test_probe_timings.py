@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки разбивки времени проверки по фазам.
+Запросы идут к локальному HTTP-серверу с задержкой ответа, внешняя сеть не нужна.
+"""
+
+import asyncio
+import os
+import sys
+
+from aiohttp import web
+
+# Добавляем путь к основному файлу для импорта
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from http_sessions import AiohttpSessionManager, CurlSessionPool
+from probe_timings import CURL_TIMING_INFOS, PHASES, PhaseTimer, ProbePhaseLog, aiohttp_trace_config, curl_phases
+
+SERVER_DELAY = 0.2
+
+
+async def start_slow_server():
+    async def handler(request):
+        await asyncio.sleep(SERVER_DELAY)
+        return web.Response(text="<html><title>slow</title></html>", content_type='text/html')
+
+    app = web.Application()
+    app.router.add_get('/', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, 'localhost', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://localhost:{port}/"
+
+
+def check_phases(phases):
+    assert phases is not None
+    assert set(phases) == set(PHASES) | {'total'}
+    # Медленный бэкенд виден как ожидание первого байта, а не как DNS или подключение
+    assert phases['ttfb'] >= SERVER_DELAY * 0.9
+    assert phases['dns'] < SERVER_DELAY and phases['connect'] < SERVER_DELAY
+    assert phases['tls'] == 0.0
+    assert abs(phases['total'] - sum(phases[name] for name in PHASES)) < 0.001
+
+
+def test_curl_phases():
+    """Фазы из таймингов libcurl для обычного и потокового ответа"""
+    async def run():
+        runner, url = await start_slow_server()
+        pool = CurlSessionPool(size=1, curl_infos=CURL_TIMING_INFOS)
+        try:
+            response = await pool.get(url, timeout=5)
+            phases = curl_phases(response.infos)
+            print(f"curl_cffi: {phases}")
+            check_phases(phases)
+
+            response = await pool.get(url, timeout=5, stream=True)
+            await response.acontent()
+            check_phases(curl_phases(response.infos, download=0.01))
+        finally:
+            await pool.close()
+            await runner.cleanup()
+
+    asyncio.run(run())
+
+
+def test_aiohttp_phases():
+    """Фазы из событий TraceConfig; у повторного запроса нет DNS и подключения"""
+    async def run():
+        runner, url = await start_slow_server()
+        sessions = AiohttpSessionManager(trace_configs=[aiohttp_trace_config()])
+        try:
+            first, second = PhaseTimer(), PhaseTimer()
+            async with sessions.get(url, trace_request_ctx=first) as response:
+                await response.text()
+            async with sessions.get(url, trace_request_ctx=second) as response:
+                await response.text()
+            print(f"aiohttp: {first.phases()}, повторно: {second.phases()}")
+            check_phases(first.phases())
+            check_phases(second.phases())
+            assert second.phases()['dns'] == 0.0 and second.phases()['connect'] == 0.0
+            # Запрос без PhaseTimer не ломает трассировку
+            async with sessions.get(url) as response:
+                assert response.status == 200
+        finally:
+            await sessions.close()
+            await runner.cleanup()
+
+    asyncio.run(run())
+
+
+def test_phase_log():
+    """Журнал хранит фазы последней проверки URL, старые записи вытесняются"""
+    log = ProbePhaseLog(max_entries=2)
+    log.record('a', {'ttfb': 1.0})
+    log.record('b', None)
+    log.record('a', {'ttfb': 2.0})
+    log.record('c', {'ttfb': 3.0})
+    assert log.get('a') == {'ttfb': 2.0}
+    assert log.get('b') is None and log.get('c') == {'ttfb': 3.0}
+    assert PhaseTimer().phases() is None
+
+
+if __name__ == "__main__":
+    test_curl_phases()
+    test_aiohttp_phases()
+    test_phase_log()
+    print("Все тесты фаз времени проверки пройдены")
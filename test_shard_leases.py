@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки аренды шардов несколькими узлами.
+Вместо Supabase используется локальное хранилище SQLite с той же семантикой аренды.
+"""
+
+import asyncio
+import os
+import sys
+
+# Добавляем путь к основному файлу для импорта
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from shard_leases import ShardLeaseManager, SQLiteLeaseStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_node(store, clock, node_id):
+    return ShardLeaseManager(store, node_id, shard_count=16, ttl=30, clock=clock)
+
+
+def test_nodes_split_shards_and_take_over():
+    """Узлы делят шарды без пересечений, шарды упавшего узла переходят живому"""
+    clock = FakeClock()
+    store = SQLiteLeaseStore(clock=clock)
+    node_a = make_node(store, clock, 'a')
+    node_b = make_node(store, clock, 'b')
+    sites = [{'id': i} for i in range(1000)]
+
+    async def run():
+        await node_a.tick()
+        assert len(node_a.owned) == 16 and node_a.is_leader
+
+        # Второй узел появляется - первый отдает половину шардов
+        for _ in range(3):
+            await node_b.tick()
+            await node_a.tick()
+            clock.now += 10
+        print(f"Шарды: a={len(node_a.owned)}, b={len(node_b.owned)}")
+        assert node_a.owned.isdisjoint(node_b.owned)
+        assert len(node_a.owned | node_b.owned) == 16
+        assert len(node_a.owned) == len(node_b.owned) == 8
+        # Каждый сайт проверяет ровно один узел
+        checked = [site['id'] for site in node_a.filter_sites(sites) + node_b.filter_sites(sites)]
+        assert sorted(checked) == list(range(1000))
+        assert node_a.is_leader and not node_b.is_leader
+
+        # Узел a падает: до истечения аренды его шарды заняты, после - переходят узлу b
+        clock.now += 10
+        await node_b.tick()
+        assert len(node_b.owned) == 8
+        clock.now += 30
+        await node_b.tick()
+        assert len(node_b.owned) == 16
+        assert node_b.is_leader
+
+    asyncio.run(run())
+
+
+def test_store_outage_drops_shards():
+    """Без связи с хранилищем дольше срока аренды узел перестает проверять сайты"""
+    clock = FakeClock()
+    store = SQLiteLeaseStore(clock=clock)
+    node = make_node(store, clock, 'a')
+
+    async def run():
+        await node.tick()
+        assert len(node.owned) == 16
+
+        async def broken(*args):
+            raise RuntimeError("нет соединения")
+
+        store.claim = broken
+        clock.now += 10
+        await node.tick()
+        assert len(node.owned) == 16
+        clock.now += 30
+        await node.tick()
+        assert not node.owned and not node.is_leader
+
+    asyncio.run(run())
+
+
+class CountingStore(SQLiteLeaseStore):
+    """Хранилище, считающее обращения (каждое - отдельный RPC в Supabase)"""
+
+    def __init__(self, clock):
+        super().__init__(clock=clock)
+        self.calls = []
+
+    async def claim(self, shard, node_id, ttl):
+        self.calls.append('claim')
+        return await super().claim(shard, node_id, ttl)
+
+    async def renew(self, shards, node_id, ttl):
+        self.calls.append('renew')
+        return {shard for shard in shards if await SQLiteLeaseStore.claim(self, shard, node_id, ttl)}
+
+
+def test_renewal_is_one_call_per_tick():
+    """Продление всех шардов узла - один запрос за такт, а не по запросу на шард"""
+    clock = FakeClock()
+    store = CountingStore(clock)
+    node = ShardLeaseManager(store, 'a', shard_count=64, ttl=30, clock=clock)
+
+    async def run():
+        await node.tick()
+        assert len(node.owned) == 64
+        store.calls.clear()
+        clock.now += 10
+        await node.tick()
+        # Продление шардов и аренда поллинга
+        assert store.calls == ['renew', 'claim'] and len(node.owned) == 64
+
+        # Шард, перехваченный после истечения аренды, при продлении не возвращается
+        await store.release(5, 'a')
+        await SQLiteLeaseStore.claim(store, 5, 'b', 30)
+        clock.now += 10
+        await node.tick()
+        assert 5 not in node.owned
+
+    asyncio.run(run())
+
+
+def test_leadership_events():
+    """Ожидание потери и возврата аренды поллинга (остановка и перезапуск WHOIS Watchdog)"""
+    clock = FakeClock()
+    store = SQLiteLeaseStore(clock=clock)
+    node_a = make_node(store, clock, 'a')
+    node_b = make_node(store, clock, 'b')
+
+    async def run():
+        await node_a.tick()
+        await node_b.tick()
+        lost = asyncio.ensure_future(node_a.wait_leadership_lost())
+        await asyncio.sleep(0)
+        assert not lost.done()
+
+        # Узел a не продлевал аренду дольше срока - поллинг забирает узел b
+        clock.now += 31
+        await node_b.tick()
+        await node_a.tick()
+        await asyncio.wait_for(lost, 1)
+        assert node_b.is_leader and not node_a.is_leader
+
+        await node_b.release_all()
+        await node_a.tick()
+        await asyncio.wait_for(node_a.wait_leader(), 1)
+        regained = asyncio.ensure_future(node_a.wait_leadership_lost())
+        await asyncio.sleep(0)
+        assert not regained.done()
+        regained.cancel()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_nodes_split_shards_and_take_over()
+    test_store_outage_drops_shards()
+    test_renewal_is_one_call_per_tick()
+    test_leadership_events()
+    print("Все тесты аренды шардов пройдены")
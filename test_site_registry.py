@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки инкрементальной синхронизации реестра сайтов.
+Вместо Supabase используется простая таблица в памяти с тем же интерфейсом запросов.
+"""
+
+import asyncio
+import os
+import sys
+
+# Добавляем путь к основному файлу для импорта
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from site_registry import SiteRegistry
+
+
+class FakeResult:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeQuery:
+    def __init__(self, table):
+        self.table = table
+        self.filters = []
+        self.order_desc = None
+        self.limit_count = None
+
+    def select(self, fields):
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda row: row[column] >= value)
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(lambda row: row[column] > value)
+        return self
+
+    def order(self, column, desc=False):
+        self.order_desc = (column, desc)
+        return self
+
+    def limit(self, count):
+        self.limit_count = count
+        return self
+
+    def execute(self):
+        self.table.db.queries += 1
+        rows = [dict(row) for row in self.table.rows if all(f(row) for f in self.filters)]
+        if self.order_desc:
+            column, desc = self.order_desc
+            rows.sort(key=lambda row: row[column], reverse=desc)
+        if self.limit_count is not None:
+            rows = rows[:self.limit_count]
+        self.table.db.rows_fetched += len(rows)
+        return FakeResult(rows)
+
+
+class FakeTable:
+    def __init__(self, db):
+        self.db = db
+        self.rows = []
+
+
+class FakeSupabase:
+    def __init__(self):
+        self.tables = {}
+        self.queries = 0
+        self.rows_fetched = 0
+
+    def rows(self, name):
+        if name not in self.tables:
+            self.tables[name] = FakeTable(self)
+        return self.tables[name]
+
+    def table(self, name):
+        return FakeQuery(self.rows(name))
+
+
+def ts(seconds):
+    return f"2025-01-01T00:{seconds // 60:02d}:{seconds % 60:02d}+00:00"
+
+
+def test_incremental_sync():
+    """После полной загрузки запрашиваются только измененные и удаленные сайты"""
+    db = FakeSupabase()
+    sites = db.rows('botmonitor_sites')
+    deleted = db.rows('botmonitor_sites_deleted')
+    sites.rows = [{'id': i, 'url': f'https://site{i}.example', 'updated_at': ts(i)} for i in range(1000)]
+
+    async def run():
+        registry = SiteRegistry(db, 'id, url, updated_at')
+        await registry.load()
+        assert len(registry) == 1000
+        full_rows = db.rows_fetched
+
+        # Проверка обновила статус в памяти - это не должно перезаписываться при синхронизации
+        registry.apply_local_update(1, {'is_up': True})
+
+        # Новый сайт, изменение URL и удаление
+        sites.rows.append({'id': 1000, 'url': 'https://new.example', 'updated_at': ts(1100)})
+        sites.rows[5]['url'] = 'https://moved.example'
+        sites.rows[5]['updated_at'] = ts(1101)
+        sites.rows = [row for row in sites.rows if row['id'] != 7]
+        deleted.rows.append({'site_id': 7, 'deleted_at': ts(1102)})
+
+        db.rows_fetched = 0
+        version = registry.version
+        changed, removed = await registry.sync()
+        print(f"Полная загрузка: {full_rows} строк, синхронизация: {db.rows_fetched} строк")
+        assert (changed, removed) == (2, 1)
+        # Новые и измененные строки плюс несколько строк из окна перекрытия
+        assert db.rows_fetched < 20
+        assert registry.version == version + 1
+        assert registry.get(5)['url'] == 'https://moved.example'
+        assert registry.get(7) is None
+        assert registry.get(1000) is not None
+        assert registry.get(1)['is_up'] is True
+
+        # Повторная синхронизация без изменений ничего не меняет
+        assert await registry.sync() == (0, 0)
+        assert registry.version == version + 1
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_incremental_sync()
+    print("Все тесты реестра сайтов пройдены")
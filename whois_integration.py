@@ -556,8 +556,11 @@ async def start_whois_watchdog(supabase: Client, bot: Bot):
     Args:
         supabase: Клиент Supabase
         bot: Экземпляр бота aiogram
+    
+    Returns:
+        asyncio.Task: Задача планировщика (отменяется при остановке Watchdog)
     """
     logging.info("Запуск WHOIS Watchdog...")
     
     # Запускаем планировщик ежедневных проверок
-    asyncio.create_task(schedule_daily_whois_check(supabase, bot))
\ No newline at end of file
+    return asyncio.create_task(schedule_daily_whois_check(supabase, bot))
\ No newline at end of file